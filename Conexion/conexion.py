@@ -1,6 +1,381 @@
-# Importamos la clase MySQL desde la librería Flask-MySQLdb
-from flask_mysqldb import MySQL
+# Pool de conexiones MySQL compartido por todas las rutas.
+#
+# Sustituye a Flask-MySQLdb, que abría una conexión nueva (TCP + autenticación)
+# en cada request y la cerraba en el teardown. Aquí las conexiones se reutilizan
+# entre requests: se piden al pool la primera vez que una ruta usa
+# `mysql.connection` y se devuelven al terminar el contexto de la aplicación.
+# La interfaz es la misma (`mysql.connection.cursor()`, `mysql.connection.commit()`).
+#
+# Réplicas de lectura (opcional, MYSQL_REPLICAS): las páginas de solo lectura usan
+# `mysql.lectura`, que presta una conexión de una réplica sana. Las escrituras y
+# transacciones siguen usando `mysql.connection` (siempre el servidor principal).
+# Después de un request que escribe (POST, PUT, ...), la sesión de ese usuario lee
+# del principal durante MYSQL_PEGADO_SEG segundos para que vea sus propios cambios
+# aunque las réplicas vayan atrasadas. Una réplica que no responde o va demasiado
+# atrasada se deja de usar durante MYSQL_REPLICA_ESPERA segundos y sus lecturas
+# van al principal. Para probarlo en local basta con dos instancias de
+# MySQL/MariaDB, p. ej. MYSQL_REPLICAS = ['127.0.0.1:3307'].
+import collections
+import itertools
+import os
+import threading
+import time
 
-# Creamos una instancia de la clase MySQL
-# La inicializaremos más tarde en app.py con la configuración
-mysql = MySQL()
\ No newline at end of file
+import MySQLdb
+import MySQLdb.cursors
+from flask import g, request, session
+
+METODOS_SEGUROS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+
+class PoolAgotado(Exception):
+    """No se obtuvo una conexión libre dentro de MYSQL_POOL_TIMEOUT segundos."""
+
+
+class _Entrada:
+    """Una conexión física del pool con sus marcas de tiempo."""
+    __slots__ = ('conexion', 'creada', 'ultimo_uso')
+
+    def __init__(self, conexion):
+        self.conexion = conexion
+        self.creada = time.monotonic()
+        self.ultimo_uso = self.creada
+
+
+class _Replica:
+    """Pool de una réplica con su estado de salud."""
+    __slots__ = ('pool', 'nombre', 'caida_hasta', 'proximo_chequeo', 'medir_retraso')
+
+    def __init__(self, pool, nombre):
+        self.pool = pool
+        self.nombre = nombre
+        self.caida_hasta = 0.0       # monotonic: hasta cuándo no se usa
+        self.proximo_chequeo = 0.0   # monotonic: próximo control de retraso de replicación
+        self.medir_retraso = True    # False si el usuario no tiene permiso para SHOW REPLICA STATUS
+
+
+def _separar_destino(texto):
+    # 'host' o 'host:puerto'
+    host, _, puerto = texto.partition(':')
+    return host, int(puerto) if puerto else None
+
+
+class PoolMySQL:
+    def __init__(self, app=None, destino=None):
+        self.app = None
+        self._cond = threading.Condition()
+        self._libres = collections.deque()  # Entradas libres; a la derecha las usadas más recientemente
+        self._total = 0                      # Conexiones abiertas (libres + prestadas)
+        self._pid = os.getpid()
+        self.envoltura = None                # Opcional: envuelve la conexión entregada (ver metricas.py)
+        self.destino = destino               # (host, puerto) si este pool es de una réplica
+        self.replicas = []                   # Pools de las réplicas (solo en el pool principal)
+        self._turno = itertools.count()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        # Mismas claves de configuración que usaba Flask-MySQLdb
+        app.config.setdefault('MYSQL_HOST', 'localhost')
+        app.config.setdefault('MYSQL_USER', None)
+        app.config.setdefault('MYSQL_PASSWORD', None)
+        app.config.setdefault('MYSQL_DB', None)
+        app.config.setdefault('MYSQL_PORT', 3306)
+        app.config.setdefault('MYSQL_UNIX_SOCKET', None)
+        app.config.setdefault('MYSQL_CONNECT_TIMEOUT', 10)
+        app.config.setdefault('MYSQL_READ_DEFAULT_FILE', None)
+        app.config.setdefault('MYSQL_CHARSET', 'utf8mb4')
+        app.config.setdefault('MYSQL_SQL_MODE', None)
+        app.config.setdefault('MYSQL_CURSORCLASS', None)
+        app.config.setdefault('MYSQL_AUTOCOMMIT', False)
+        # Parámetros del pool
+        app.config.setdefault('MYSQL_POOL_MIN', 2)           # Conexiones que se mantienen abiertas y se abren al calentar
+        app.config.setdefault('MYSQL_POOL_MAX', 10)          # Máximo de conexiones abiertas por proceso
+        app.config.setdefault('MYSQL_POOL_TIMEOUT', 5)       # Segundos de espera por una conexión libre
+        app.config.setdefault('MYSQL_POOL_PING', 30)         # Hacer ping al prestar si estuvo inactiva más de N segundos
+        app.config.setdefault('MYSQL_POOL_IDLE', 300)        # Cerrar conexiones sobrantes inactivas más de N segundos
+        app.config.setdefault('MYSQL_POOL_RECYCLE', 3600)    # Reemplazar conexiones con más de N segundos de vida
+        # Réplicas de lectura
+        app.config.setdefault('MYSQL_REPLICAS', [])          # ['host', 'host:puerto', ...]; vacío = todo al principal
+        app.config.setdefault('MYSQL_PEGADO_SEG', 5)         # Lecturas al principal tras una escritura del usuario
+        app.config.setdefault('MYSQL_REPLICA_ESPERA', 30)    # Segundos sin usar una réplica que falló
+        app.config.setdefault('MYSQL_REPLICA_RETRASO_MAX', 10)  # Retraso de replicación máximo aceptado (s); None = no medir
+        app.config.setdefault('MYSQL_REPLICA_CHEQUEO', 5)    # Cada cuántos segundos se mide el retraso
+
+        self.replicas = []
+        for texto in app.config['MYSQL_REPLICAS']:
+            pool = PoolMySQL(destino=_separar_destino(texto))
+            pool.app = app
+            self.replicas.append(_Replica(pool, texto))
+
+        app.teardown_appcontext(self.teardown)
+        app.after_request(self._recordar_escritura)
+
+    # --- Creación y cierre de conexiones físicas ---
+
+    def _parametros(self):
+        config = self.app.config
+        host, puerto = self.destino or (config['MYSQL_HOST'], config['MYSQL_PORT'])
+        kwargs = {
+            'host': host,
+            'port': puerto or config['MYSQL_PORT'],
+            'connect_timeout': config['MYSQL_CONNECT_TIMEOUT'],
+            'charset': config['MYSQL_CHARSET'],
+            'autocommit': config['MYSQL_AUTOCOMMIT'],
+        }
+        if config['MYSQL_USER']:
+            kwargs['user'] = config['MYSQL_USER']
+        if config['MYSQL_PASSWORD']:
+            kwargs['passwd'] = config['MYSQL_PASSWORD']
+        if config['MYSQL_DB']:
+            kwargs['db'] = config['MYSQL_DB']
+        if config['MYSQL_UNIX_SOCKET'] and self.destino is None:
+            kwargs['unix_socket'] = config['MYSQL_UNIX_SOCKET']
+        if config['MYSQL_READ_DEFAULT_FILE']:
+            kwargs['read_default_file'] = config['MYSQL_READ_DEFAULT_FILE']
+        if config['MYSQL_SQL_MODE']:
+            kwargs['sql_mode'] = config['MYSQL_SQL_MODE']
+        if config['MYSQL_CURSORCLASS']:
+            kwargs['cursorclass'] = getattr(MySQLdb.cursors, config['MYSQL_CURSORCLASS'])
+        return kwargs
+
+    def _abrir(self):
+        return _Entrada(MySQLdb.connect(**self._parametros()))
+
+    def _cerrar(self, entrada):
+        try:
+            entrada.conexion.close()
+        except MySQLdb.Error:
+            pass
+
+    def _verificar_proceso(self):
+        # Tras un fork (workers de gunicorn) las conexiones heredadas comparten el
+        # socket con el proceso padre: se olvidan sin cerrarlas y se empieza de cero.
+        if self._pid != os.getpid():
+            with self._cond:
+                if self._pid != os.getpid():
+                    self._libres = collections.deque()
+                    self._total = 0
+                    self._pid = os.getpid()
+
+    # --- Préstamo y devolución ---
+
+    def _reservar(self):
+        """Devuelve una entrada libre, o None si hay cupo para abrir una nueva."""
+        limite = time.monotonic() + self.app.config['MYSQL_POOL_TIMEOUT']
+        with self._cond:
+            while True:
+                if self._libres:
+                    return self._libres.pop()
+                if self._total < self.app.config['MYSQL_POOL_MAX']:
+                    self._total += 1
+                    return None
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    raise PoolAgotado('No hay conexiones MySQL libres en el pool.')
+                self._cond.wait(restante)
+
+    def _descartar(self, entrada):
+        self._cerrar(entrada)
+        with self._cond:
+            self._total -= 1
+            self._cond.notify()
+
+    def obtener(self):
+        """Presta una conexión sana del pool (abre una nueva si hace falta)."""
+        self._verificar_proceso()
+        config = self.app.config
+        while True:
+            entrada = self._reservar()
+            if entrada is None:
+                try:
+                    return self._abrir()
+                except Exception:
+                    with self._cond:
+                        self._total -= 1
+                        self._cond.notify()
+                    raise
+
+            ahora = time.monotonic()
+            if ahora - entrada.creada > config['MYSQL_POOL_RECYCLE']:
+                self._descartar(entrada)
+                continue
+            if ahora - entrada.ultimo_uso > config['MYSQL_POOL_PING']:
+                # Comprobación de salud: el servidor pudo cerrar la conexión por wait_timeout
+                try:
+                    entrada.conexion.ping()
+                except MySQLdb.Error:
+                    self._descartar(entrada)
+                    continue
+            return entrada
+
+    def devolver(self, entrada):
+        """Devuelve la conexión al pool deshaciendo cualquier transacción a medias."""
+        if self._pid != os.getpid():
+            return
+        try:
+            entrada.conexion.rollback()
+        except MySQLdb.Error:
+            self._descartar(entrada)
+            return
+
+        entrada.ultimo_uso = time.monotonic()
+        sobrantes = []
+        with self._cond:
+            self._libres.append(entrada)
+            # Reciclado de inactivas: a la izquierda quedan las que llevan más tiempo sin usarse
+            limite = entrada.ultimo_uso - self.app.config['MYSQL_POOL_IDLE']
+            while (self._total > self.app.config['MYSQL_POOL_MIN'] and self._libres
+                   and self._libres[0].ultimo_uso < limite):
+                sobrantes.append(self._libres.popleft())
+                self._total -= 1
+            self._cond.notify()
+        for vieja in sobrantes:
+            self._cerrar(vieja)
+
+    def calentar(self):
+        """
+        Abre MYSQL_POOL_MIN conexiones por adelantado para que los primeros
+        requests del worker no paguen el handshake. Se llama desde gunicorn.conf.py
+        después del fork; los errores se registran y no impiden arrancar.
+        """
+        self._verificar_proceso()
+        entradas = []
+        try:
+            for _ in range(self.app.config['MYSQL_POOL_MIN'] - self._total):
+                entradas.append(self.obtener())
+        except Exception as e:
+            self.app.logger.warning(f"No se pudo calentar el pool de MySQL: {e}")
+        for entrada in entradas:
+            self.devolver(entrada)
+        for replica in self.replicas:
+            replica.pool.calentar()
+
+    def estado(self):
+        with self._cond:
+            estado = {'abiertas': self._total, 'libres': len(self._libres)}
+        if self.replicas:
+            ahora = time.monotonic()
+            estado['replicas'] = {r.nombre: dict(r.pool.estado(), sana=r.caida_hasta <= ahora)
+                                  for r in self.replicas}
+        return estado
+
+    # --- Réplicas ---
+
+    def _marcar_caida(self, replica, motivo):
+        replica.caida_hasta = time.monotonic() + self.app.config['MYSQL_REPLICA_ESPERA']
+        self.app.logger.warning(f"Réplica {replica.nombre} fuera de uso: {motivo}")
+
+    def _retraso_aceptable(self, replica, entrada):
+        """Mide el retraso de replicación cada MYSQL_REPLICA_CHEQUEO segundos."""
+        maximo = self.app.config['MYSQL_REPLICA_RETRASO_MAX']
+        ahora = time.monotonic()
+        if maximo is None or not replica.medir_retraso or ahora < replica.proximo_chequeo:
+            return True
+        replica.proximo_chequeo = ahora + self.app.config['MYSQL_REPLICA_CHEQUEO']
+        cur = entrada.conexion.cursor(MySQLdb.cursors.DictCursor)
+        try:
+            try:
+                cur.execute("SHOW REPLICA STATUS")  # MySQL 8.0.22+ / MariaDB 10.5+
+            except MySQLdb.ProgrammingError:
+                cur.execute("SHOW SLAVE STATUS")
+            fila = cur.fetchone()
+        except MySQLdb.OperationalError as e:
+            # Sin permiso REPLICATION CLIENT: solo se controla que responda
+            replica.medir_retraso = False
+            self.app.logger.warning(f"No se puede medir el retraso de {replica.nombre}: {e}")
+            return True
+        finally:
+            cur.close()
+        if fila is None:
+            return True  # No es una réplica (p. ej. dos instancias independientes en pruebas)
+        retraso = fila.get('Seconds_Behind_Source', fila.get('Seconds_Behind_Master'))
+        if retraso is None or retraso > maximo:
+            self._marcar_caida(replica, f"retraso de replicación {retraso}")
+            return False
+        return True
+
+    def _obtener_lectura(self):
+        """Entrada de una réplica sana (por turnos) o None si no hay ninguna disponible."""
+        ahora = time.monotonic()
+        sanas = [r for r in self.replicas if r.caida_hasta <= ahora]
+        if not sanas:
+            return None
+        inicio = next(self._turno)
+        for i in range(len(sanas)):
+            replica = sanas[(inicio + i) % len(sanas)]
+            try:
+                entrada = replica.pool.obtener()
+            except PoolAgotado:
+                continue  # Ocupada, no caída: se prueba otra o se usa el principal
+            except MySQLdb.Error as e:
+                self._marcar_caida(replica, e)
+                continue
+            try:
+                aceptable = self._retraso_aceptable(replica, entrada)
+            except MySQLdb.Error as e:
+                replica.pool._descartar(entrada)
+                self._marcar_caida(replica, e)
+                continue
+            if not aceptable:
+                replica.pool.devolver(entrada)
+                continue
+            return replica.pool, entrada
+        return None
+
+    def _pegado_al_principal(self):
+        return session.get('_mysql_principal_hasta', 0) > time.time()
+
+    def _recordar_escritura(self, respuesta):
+        # Tras un request que escribió en el principal, las lecturas de este usuario
+        # se quedan en el principal unos segundos (leer lo que uno mismo escribió)
+        if (self.replicas and request.method not in METODOS_SEGUROS
+                and g.get('_mysql_pool_entrada') is not None):
+            session['_mysql_principal_hasta'] = time.time() + self.app.config['MYSQL_PEGADO_SEG']
+        return respuesta
+
+    # --- Integración con Flask ---
+
+    @property
+    def connection(self):
+        """Conexión prestada al contexto actual (la misma durante todo el request)."""
+        entrada = g.get('_mysql_pool_entrada')
+        if entrada is None:
+            entrada = self.obtener()
+            g._mysql_pool_entrada = entrada
+        if self.envoltura is not None:
+            return self.envoltura(entrada.conexion)
+        return entrada.conexion
+
+    @property
+    def lectura(self):
+        """
+        Conexión para consultas de solo lectura: una réplica sana si hay réplicas
+        configuradas; el principal si no las hay, si ninguna está disponible, si el
+        usuario escribió hace poco o si este request ya usa el principal.
+        """
+        lectura = g.get('_mysql_lectura')
+        if lectura is None:
+            if (not self.replicas or g.get('_mysql_pool_entrada') is not None
+                    or self._pegado_al_principal()):
+                return self.connection
+            lectura = self._obtener_lectura()
+            if lectura is None:
+                return self.connection
+            g._mysql_lectura = lectura
+        conexion = lectura[1].conexion
+        return self.envoltura(conexion) if self.envoltura is not None else conexion
+
+    def teardown(self, exception):
+        entrada = g.pop('_mysql_pool_entrada', None)
+        if entrada is not None:
+            self.devolver(entrada)
+        lectura = g.pop('_mysql_lectura', None)
+        if lectura is not None:
+            pool, entrada = lectura
+            pool.devolver(entrada)
+
+
+# Instancia única del pool; se inicializa en app.py con mysql.init_app(app)
+mysql = PoolMySQL()
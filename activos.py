@@ -0,0 +1,227 @@
+"""
+Archivos estáticos con huella de contenido, precomprimidos y con caché permanente.
+
+Paso de construcción (en el despliegue, antes de arrancar gunicorn; en Heroku
+lo corre bin/post_compile al compilar el slug):
+
+    flask construir-activos
+
+copia cada archivo de static/ a static/dist/ con el hash de su contenido en el
+nombre (styles.css -> styles.3f9a1c2b7d4e.css) y genera:
+
+- .gz (y .br si está instalado 'brotli') de los archivos de texto (css, js, svg, ...);
+- variantes WebP redimensionadas de las imágenes (ANCHOS_WEBP, si está instalado Pillow);
+- static/dist/manifest.json con la correspondencia nombre original -> archivos.
+
+En las plantillas se usa activo('images/fondo.jpg') en lugar de
+url_for('static', ...), y activo_webp('images/fondo.jpg', 1280) para una variante.
+Esas URL (/activos/...) se sirven con 'Cache-Control: immutable' de un año y con
+la versión comprimida que acepte el navegador: como el nombre cambia cuando
+cambia el contenido, en visitas repetidas el navegador no vuelve a pedirlas.
+
+Sin manifest (desarrollo sin construir) activo() devuelve la URL normal de /static.
+En producción eso dejaría los estáticos sin huella ni caché, así que con
+ACTIVOS_OBLIGATORIOS los workers de gunicorn no arrancan sin él (ver
+gunicorn.conf.py); con 'flask run' o los comandos de flask no se exige.
+Las construcciones no borran huellas anteriores: las páginas que un navegador
+todavía tenga en caché pueden seguir pidiendo los archivos viejos.
+"""
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+
+from flask import url_for, request, send_from_directory, abort
+
+try:
+    import brotli
+except ImportError:  # Opcional: sin brotli solo se genera .gz
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:  # Opcional: sin Pillow no se generan variantes WebP
+    Image = None
+
+EXTENSIONES_TEXTO = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.map')
+EXTENSIONES_IMAGEN = ('.jpg', '.jpeg', '.png')
+ANCHOS_WEBP = (640, 1280, 1920)
+CALIDAD_WEBP = 80
+CACHE_PERMANENTE = 'public, max-age=31536000, immutable'
+
+
+def _huella(datos):
+    return hashlib.sha256(datos).hexdigest()[:12]
+
+
+def _con_huella(ruta, huella, sufijo=''):
+    base, extension = os.path.splitext(ruta)
+    return f"{base}{sufijo}.{huella}{extension}"
+
+
+def _escribir(destino, ruta, datos):
+    completa = os.path.join(destino, ruta)
+    os.makedirs(os.path.dirname(completa), exist_ok=True)
+    with open(completa, 'wb') as archivo:
+        archivo.write(datos)
+
+
+def _comprimir(destino, ruta, datos):
+    """Escribe ruta.gz (y ruta.br) si salen más chicos que el original."""
+    formatos = []
+    # mtime=0: el .gz es idéntico entre construcciones del mismo contenido
+    comprimido = gzip.compress(datos, compresslevel=9, mtime=0)
+    if len(comprimido) < len(datos):
+        _escribir(destino, ruta + '.gz', comprimido)
+        formatos.append('gzip')
+    if brotli is not None:
+        comprimido = brotli.compress(datos, quality=11)
+        if len(comprimido) < len(datos):
+            _escribir(destino, ruta + '.br', comprimido)
+            formatos.append('br')
+    return formatos
+
+
+def _variantes_webp(origen_completo, destino, ruta):
+    """Variantes WebP de una imagen por ancho; no se agrandan imágenes más chicas."""
+    if Image is None:
+        return {}
+    variantes = {}
+    with Image.open(origen_completo) as imagen:
+        imagen = imagen.convert('RGB')
+        for ancho in ANCHOS_WEBP:
+            if ancho > imagen.width and variantes:
+                break
+            ancho_real = min(ancho, imagen.width)
+            alto = round(imagen.height * ancho_real / imagen.width)
+            copia = imagen.resize((ancho_real, alto), Image.LANCZOS) if ancho_real != imagen.width else imagen
+            salida = io.BytesIO()
+            copia.save(salida, 'WEBP', quality=CALIDAD_WEBP, method=6)
+            datos = salida.getvalue()
+            nombre = _con_huella(os.path.splitext(ruta)[0] + '.webp', _huella(datos), f"-{ancho_real}")
+            _escribir(destino, nombre, datos)
+            variantes[str(ancho_real)] = nombre
+    return variantes
+
+
+def construir(origen, destino):
+    """
+    Genera destino/ (archivos con huella, comprimidos y variantes) a partir de
+    origen/ y devuelve el manifest. Los archivos dentro de destino se ignoran.
+    """
+    manifest = {}
+    destino_absoluto = os.path.abspath(destino)
+    for carpeta, subcarpetas, archivos in os.walk(origen):
+        if os.path.abspath(carpeta).startswith(destino_absoluto):
+            subcarpetas[:] = []
+            continue
+        subcarpetas.sort()
+        for nombre in sorted(archivos):
+            completa = os.path.join(carpeta, nombre)
+            ruta = os.path.relpath(completa, origen).replace(os.sep, '/')
+            with open(completa, 'rb') as archivo:
+                datos = archivo.read()
+            extension = os.path.splitext(nombre)[1].lower()
+            archivo_huella = _con_huella(ruta, _huella(datos))
+            _escribir(destino, archivo_huella, datos)
+            entrada = {'archivo': archivo_huella}
+            if extension in EXTENSIONES_TEXTO:
+                entrada['comprimido'] = _comprimir(destino, archivo_huella, datos)
+            if extension in EXTENSIONES_IMAGEN:
+                entrada['webp'] = _variantes_webp(completa, destino, ruta)
+            manifest[ruta] = entrada
+
+    temporal = os.path.join(destino, 'manifest.json.tmp')
+    with open(temporal, 'w', encoding='utf-8') as archivo:
+        json.dump(manifest, archivo, indent=2, sort_keys=True)
+    os.replace(temporal, os.path.join(destino, 'manifest.json'))
+    return manifest
+
+
+class Activos:
+    def __init__(self, app=None):
+        self.app = None
+        self.manifest = {}
+        self.version = ''  # Hash del manifest: cambia con cada construcción distinta
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('ACTIVOS_DESTINO', os.path.join(app.static_folder, 'dist'))
+        app.config.setdefault('ACTIVOS_OBLIGATORIOS', True)  # gunicorn no arranca sin manifest
+        self.cargar()
+        app.add_url_rule('/activos/<path:archivo>', 'activos', self.servir)
+        app.add_template_global(self.url, 'activo')
+        app.add_template_global(self.url_webp, 'activo_webp')
+
+    def cargar(self):
+        ruta = os.path.join(self.app.config['ACTIVOS_DESTINO'], 'manifest.json')
+        try:
+            with open(ruta, 'rb') as archivo:
+                contenido = archivo.read()
+        except FileNotFoundError:
+            self.manifest, self.version = {}, ''
+            return
+        self.manifest = json.loads(contenido)
+        self.version = _huella(contenido)
+
+    # --- Helpers de plantilla ---
+
+    def url(self, ruta):
+        entrada = self.manifest.get(ruta)
+        if entrada is None:
+            return url_for('static', filename=ruta)
+        return url_for('activos', archivo=entrada['archivo'])
+
+    def url_webp(self, ruta, ancho):
+        """Variante WebP más chica con al menos 'ancho' píxeles (o la mayor), o None."""
+        variantes = (self.manifest.get(ruta) or {}).get('webp') or {}
+        if not variantes:
+            return None
+        anchos = sorted(int(a) for a in variantes)
+        elegido = next((a for a in anchos if a >= ancho), anchos[-1])
+        return url_for('activos', archivo=variantes[str(elegido)])
+
+    # --- Ruta /activos/<archivo> ---
+
+    def servir(self, archivo):
+        destino = self.app.config['ACTIVOS_DESTINO']
+        if archivo.endswith(('.gz', '.br')) or archivo == 'manifest.json':
+            abort(404)
+        mimetype = mimetypes.guess_type(archivo)[0] or 'application/octet-stream'
+        aceptadas = request.accept_encodings
+        nombre_original = os.path.basename(archivo)
+        codificacion = None
+        for extension, nombre in (('.br', 'br'), ('.gz', 'gzip')):
+            if aceptadas[nombre] and os.path.isfile(os.path.join(destino, archivo + extension)):
+                codificacion = nombre
+                archivo += extension
+                break
+        respuesta = send_from_directory(destino, archivo, mimetype=mimetype, download_name=nombre_original,
+                                        max_age=31536000)
+        if codificacion:
+            respuesta.headers['Content-Encoding'] = codificacion
+        respuesta.headers['Cache-Control'] = CACHE_PERMANENTE
+        respuesta.vary.add('Accept-Encoding')
+        return respuesta
+
+
+def construir_y_mostrar(app, echo):
+    origen = app.static_folder
+    destino = app.config['ACTIVOS_DESTINO']
+    manifest = construir(origen, destino)
+    for ruta, entrada in sorted(manifest.items()):
+        extras = entrada.get('comprimido', []) + [f"webp {a}" for a in entrada.get('webp', {})]
+        echo(f"{ruta} -> {entrada['archivo']}" + (f" ({', '.join(extras)})" if extras else ""))
+    if brotli is None:
+        echo("Aviso: 'brotli' no está instalado; solo se generó .gz")
+    if Image is None:
+        echo("Aviso: Pillow no está instalado; no se generaron variantes WebP")
+    return manifest
+
+
+# Instancia única; se inicializa en app.py con activos.init_app(app)
+activos = Activos()
@@ -0,0 +1,249 @@
+"""
+Control de admisión por worker: límites de tasa y de concurrencia con rechazo temprano.
+
+Ante un pico de tráfico es mejor rechazar rápido lo que no se va a poder atender
+que aceptar todo y que todo termine por timeout. Antes de ejecutar la vista:
+
+1. Espera en cola: si el proxy envía X-Request-Start (nginx: "t=${msec}") y el
+   request ya esperó más de ADMISION_ESPERA_COLA_MAX segundos antes de llegar al
+   worker, se responde 503 sin trabajar: el cliente probablemente ya se rindió.
+2. Tasa (cubetas de tokens): por IP (ADMISION_TASA_IP), por usuario con sesión
+   (ADMISION_TASA_USUARIO) y, para los POST de login/registro, por IP con un
+   límite mucho menor (ADMISION_TASA_LOGIN). Sin token: 429. La IP es
+   request.remote_addr: detrás de un proxy hay que indicar PROXY_SALTOS (app.py)
+   para que sea la del cliente (X-Forwarded-For) y no la del proxy.
+3. Concurrencia por clase de ruta (ADMISION_CLASES): cada clase tiene un número
+   de cupos y una cola de espera acotada en tamaño y en tiempo. Con la cola
+   llena o al agotar la espera: 503.
+
+Las respuestas 429/503 llevan Retry-After. Las rutas de ADMISION_EXENTOS (salud,
+métricas, estáticos) nunca se limitan ni se rechazan. estado() expone cupos en
+uso, esperas, rechazos y número de cubetas (ruta /admision y /metrics).
+
+Todo es por proceso: con N workers de gunicorn, cada uno aplica sus propios
+límites. Los cupos de todas las clases de un worker no deberían sumar más que
+sus hilos menos los que ocupan las conexiones en vivo (EVENTOS_MAX_CONEXIONES),
+para que una clase saturada no deje sin hilos a las demás; gunicorn.conf.py los
+dimensiona juntos y avisa al arrancar si no entran.
+"""
+import collections
+import math
+import threading
+import time
+
+from flask import request, session, g, jsonify, Response
+
+# Método + endpoint -> clase. El resto: 'lectura' si el método es seguro, 'escritura' si no
+CLASES_POR_ENDPOINT = {
+    ('POST', 'login'): 'login',
+    ('POST', 'registro'): 'login',
+    ('POST', 'registrar_compra'): 'compra',
+    ('POST', 'checkout'): 'compra',
+}
+METODOS_SEGUROS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class CubetasTokens:
+    """Una cubeta de tokens por clave (IP, usuario), con un máximo de claves recordadas."""
+
+    def __init__(self, tasa, rafaga, max_claves=100000):
+        self.tasa = tasa            # Tokens por segundo
+        self.rafaga = rafaga        # Capacidad de la cubeta
+        self.max_claves = max_claves
+        self._cubetas = collections.OrderedDict()  # clave -> [tokens, último relleno]
+        self._lock = threading.Lock()
+        self.rechazadas = 0
+
+    def tomar(self, clave):
+        """Consume un token. Devuelve 0 si había, o los segundos hasta el próximo."""
+        ahora = time.monotonic()
+        with self._lock:
+            cubeta = self._cubetas.get(clave)
+            if cubeta is None:
+                cubeta = self._cubetas[clave] = [self.rafaga, ahora]
+                if len(self._cubetas) > self.max_claves:
+                    # La más antigua sin uso: si vuelve, empieza con la cubeta llena
+                    self._cubetas.popitem(last=False)
+            else:
+                self._cubetas.move_to_end(clave)
+                cubeta[0] = min(self.rafaga, cubeta[0] + (ahora - cubeta[1]) * self.tasa)
+                cubeta[1] = ahora
+            if cubeta[0] >= 1:
+                cubeta[0] -= 1
+                return 0
+            self.rechazadas += 1
+            return (1 - cubeta[0]) / self.tasa
+
+    def estado(self):
+        with self._lock:
+            return {'tasa': self.tasa, 'rafaga': self.rafaga, 'claves': len(self._cubetas),
+                    'rechazadas': self.rechazadas}
+
+
+class Compuerta:
+    """Cupos de concurrencia de una clase de rutas con una cola de espera acotada."""
+
+    def __init__(self, concurrencia, cola, espera):
+        self.concurrencia = concurrencia
+        self.cola = cola            # Requests que pueden esperar un cupo
+        self.espera = espera        # Segundos máximos de espera por un cupo
+        self._condicion = threading.Condition()
+        self.en_curso = 0
+        self.en_espera = 0
+        self.admitidas = 0
+        self.rechazadas_cola = 0
+        self.rechazadas_espera = 0
+
+    def entrar(self):
+        """Ocupa un cupo. Devuelve None si entró, o el motivo del rechazo ('cola' o 'espera')."""
+        with self._condicion:
+            if self.en_curso < self.concurrencia:
+                self.en_curso += 1
+                self.admitidas += 1
+                return None
+            if self.en_espera >= self.cola:
+                self.rechazadas_cola += 1
+                return 'cola'
+            self.en_espera += 1
+            limite = time.monotonic() + self.espera
+            try:
+                while self.en_curso >= self.concurrencia:
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        self.rechazadas_espera += 1
+                        return 'espera'
+                    self._condicion.wait(restante)
+                self.en_curso += 1
+                self.admitidas += 1
+                return None
+            finally:
+                self.en_espera -= 1
+
+    def salir(self):
+        with self._condicion:
+            self.en_curso -= 1
+            self._condicion.notify()
+
+    def estado(self):
+        with self._condicion:
+            return {'concurrencia': self.concurrencia, 'cola': self.cola, 'espera': self.espera,
+                    'en_curso': self.en_curso, 'en_espera': self.en_espera, 'admitidas': self.admitidas,
+                    'rechazadas_cola': self.rechazadas_cola, 'rechazadas_espera': self.rechazadas_espera}
+
+
+class Admision:
+    def __init__(self, app=None):
+        self.app = None
+        self.compuertas = {}
+        self.cubetas = {}
+        self.rechazadas_espera_cola = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('ADMISION_ACTIVA', True)
+        # clase -> cupos simultáneos, requests en espera y segundos máximos de espera
+        app.config.setdefault('ADMISION_CLASES', {
+            'login': {'concurrencia': 1, 'cola': 4, 'espera': 2.0},
+            'compra': {'concurrencia': 2, 'cola': 8, 'espera': 2.0},
+            'escritura': {'concurrencia': 2, 'cola': 8, 'espera': 2.0},
+            'lectura': {'concurrencia': 4, 'cola': 16, 'espera': 1.0},
+        })
+        app.config.setdefault('ADMISION_TASA_IP', (20, 40))         # (tokens/s, ráfaga) por IP
+        app.config.setdefault('ADMISION_TASA_USUARIO', (10, 30))    # por usuario con sesión
+        app.config.setdefault('ADMISION_TASA_LOGIN', (0.2, 5))      # POST de login/registro por IP
+        app.config.setdefault('ADMISION_ESPERA_COLA_MAX', 2.0)      # Segundos según X-Request-Start
+        app.config.setdefault('ADMISION_EXENTOS', {'static', 'activos', 'metrics', 'salud', 'salud_lista'})
+        app.config.setdefault('ADMISION_MAX_CLAVES', 100000)
+
+        self.compuertas = {clase: Compuerta(**parametros) for clase, parametros in app.config['ADMISION_CLASES'].items()}
+        maximo = app.config['ADMISION_MAX_CLAVES']
+        self.cubetas = {
+            'ip': CubetasTokens(*app.config['ADMISION_TASA_IP'], max_claves=maximo),
+            'usuario': CubetasTokens(*app.config['ADMISION_TASA_USUARIO'], max_claves=maximo),
+            'login': CubetasTokens(*app.config['ADMISION_TASA_LOGIN'], max_claves=maximo),
+        }
+        if app.config['ADMISION_ACTIVA']:
+            app.before_request(self._admitir)
+            app.teardown_request(self._liberar)
+
+    @staticmethod
+    def clase(metodo, endpoint):
+        return CLASES_POR_ENDPOINT.get((metodo, endpoint)) or (
+            'lectura' if metodo in METODOS_SEGUROS else 'escritura')
+
+    # --- Hooks del request ---
+
+    def _admitir(self):
+        if request.endpoint is None or request.endpoint in self.app.config['ADMISION_EXENTOS']:
+            return None
+
+        espera_cola = self._espera_en_cola()
+        if espera_cola is not None and espera_cola > self.app.config['ADMISION_ESPERA_COLA_MAX']:
+            self.rechazadas_espera_cola += 1
+            return self._rechazo(503, 1, 'El servidor está saturado. Inténtalo de nuevo en unos segundos.')
+
+        clase = self.clase(request.method, request.endpoint)
+        ip = request.remote_addr or ''
+        usuario = session.get('_user_id')
+        claves = [('ip', ip)]
+        if usuario:
+            claves.append(('usuario', usuario))
+        if clase == 'login':
+            claves.append(('login', ip))
+        for cubeta, clave in claves:
+            reintentar = self.cubetas[cubeta].tomar(clave)
+            if reintentar:
+                return self._rechazo(429, reintentar, 'Demasiadas solicitudes. Espera un momento y vuelve a intentarlo.')
+
+        compuerta = self.compuertas.get(clase)
+        if compuerta is None:
+            return None
+        if compuerta.entrar() is not None:
+            return self._rechazo(503, compuerta.espera, 'El servidor está saturado. Inténtalo de nuevo en unos segundos.')
+        g._admision_compuerta = compuerta
+        return None
+
+    def _liberar(self, exception):
+        compuerta = g.pop('_admision_compuerta', None)
+        if compuerta is not None:
+            compuerta.salir()
+
+    @staticmethod
+    def _espera_en_cola():
+        """Segundos desde que el proxy recibió el request (X-Request-Start), o None."""
+        cabecera = request.headers.get('X-Request-Start', '')
+        valor = cabecera[2:] if cabecera.startswith('t=') else cabecera
+        try:
+            inicio = float(valor)
+        except ValueError:
+            return None
+        # nginx envía segundos con milisegundos; otros proxies, milisegundos o microsegundos
+        while inicio > 1e11:
+            inicio /= 1000
+        return time.time() - inicio
+
+    @staticmethod
+    def _rechazo(codigo, segundos, mensaje):
+        cabeceras = {'Retry-After': str(max(1, math.ceil(segundos)))}
+        if request.is_json or request.path.startswith('/api/') or request.accept_mimetypes.best == 'application/json':
+            respuesta = jsonify({'ok': False, 'error': mensaje})
+            respuesta.status_code = codigo
+            respuesta.headers.update(cabeceras)
+            return respuesta
+        return Response(mensaje + "\n", codigo, cabeceras, content_type='text/plain; charset=utf-8')
+
+    # --- Estado inspeccionable ---
+
+    def estado(self):
+        return {
+            'activa': self.app.config['ADMISION_ACTIVA'],
+            'clases': {clase: compuerta.estado() for clase, compuerta in self.compuertas.items()},
+            'tasas': {nombre: cubetas.estado() for nombre, cubetas in self.cubetas.items()},
+            'rechazadas_espera_cola': self.rechazadas_espera_cola,
+        }
+
+
+# Instancia única; se inicializa en app.py con admision.init_app(app)
+admision = Admision()
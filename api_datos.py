@@ -0,0 +1,220 @@
+"""
+API JSON de lectura para terminales de venta y servicios internos (rutas /api/v1/ en app.py).
+
+En lugar de leer el HTML de los listados, un cliente con token pide solo lo que usa:
+
+- ?ids=1,2,3 trae varios registros con una sola consulta (WHERE id IN (...));
+  los ids que no existen vuelven en 'faltantes'.
+- ?campos=id_producto,stock elige las columnas: el SELECT se arma solo con
+  ellas, y las uniones (nombre del producto o del cliente en compras) se hacen
+  únicamente si se piden. La clave siempre se incluye (la necesita el cursor).
+- Sin ids, paginación keyset como en los listados (ver paginacion.py): cada
+  respuesta trae 'siguiente' y se sigue con ?despues=<siguiente>, hasta
+  API_POR_PAGINA_MAXIMO filas por página.
+- ?forma=filas devuelve {"campos": [...], "filas": [[...], ...]} en lugar de
+  un objeto por fila, sin repetir los nombres de las columnas.
+
+El JSON va sin espacios, los precios como texto ("12.50", sin perder
+decimales) y las fechas en ISO 8601. comprimir() aplica gzip a las respuestas
+que lo aceptan, por fuera de la caché por versión (que guarda el cuerpo sin
+comprimir para todos los clientes). El cuerpo comprimido es otra
+representación y lleva otro ETag (el de la caché con SUFIJO_GZIP).
+"""
+import collections
+import datetime
+import decimal
+import functools
+import gzip
+import json
+
+import MySQLdb.cursors
+
+from cache_respuestas import SUFIJO_GZIP
+from paginacion import paginar
+from validaciones import validar_ids
+
+FORMAS = ('objetos', 'filas')
+
+# nombre -> (FROM, {campo: expresión}, {campo: JOIN que necesita}, clave primaria, campos obligatorios)
+RECURSOS = {
+    'productos': (
+        "productos",
+        {'id_producto': 'id_producto', 'nombre': 'nombre', 'precio': 'precio', 'stock': 'stock'},
+        {}, 'id_producto', ('id_producto',),
+    ),
+    'clientes': (
+        "clientes",
+        {'id_cliente': 'id_cliente', 'nombre': 'nombre', 'email': 'email', 'telefono': 'telefono'},
+        {}, 'id_cliente', ('id_cliente',),
+    ),
+    'compras': (
+        "compras co",
+        {'id_compra': 'co.id_compra', 'id_cliente': 'co.id_cliente', 'nombre_cliente': 'c.nombre',
+         'id_producto': 'co.id_producto', 'nombre_producto': 'p.nombre', 'cantidad': 'co.cantidad',
+         'precio_unitario': 'co.precio_unitario', 'fecha_compra': 'co.fecha_compra'},
+        {'nombre_cliente': "JOIN clientes c ON c.id_cliente = co.id_cliente",
+         'nombre_producto': "JOIN productos p ON p.id_producto = co.id_producto"},
+        'co.id_compra', ('id_compra', 'fecha_compra'),
+    ),
+}
+
+# Orden de las páginas: compras de un cliente por el índice (id_cliente, fecha_compra),
+# como ver_compras; el resto por clave primaria
+CLAVES_COMPRAS_CLIENTE = ('co.fecha_compra', 'co.id_compra')
+
+
+class ConsultaInvalida(ValueError):
+    pass
+
+
+# --- Parámetros ---
+
+def leer_campos(recurso, args):
+    """Campos pedidos en ?campos= (todos si no se indica), en el orden de RECURSOS."""
+    _, columnas, _, _, obligatorios = RECURSOS[recurso]
+    texto = args.get('campos', '')
+    if not texto.strip():
+        return tuple(columnas)
+    pedidos = {campo.strip() for campo in texto.split(',') if campo.strip()}
+    desconocidos = pedidos - columnas.keys()
+    if desconocidos:
+        raise ConsultaInvalida(f"Campos desconocidos: {', '.join(sorted(desconocidos))}. "
+                               f"Disponibles: {', '.join(columnas)}.")
+    pedidos.update(obligatorios)
+    return tuple(campo for campo in columnas if campo in pedidos)
+
+
+def leer_ids(args, maximo):
+    """Ids de ?ids=1,2,3 (ordenados y sin repetir), o None si no se pidieron."""
+    texto = args.get('ids')
+    if texto is None:
+        return None
+    ids, error = validar_ids([valor for valor in texto.split(',') if valor.strip()], maximo)
+    if error:
+        raise ConsultaInvalida(error)
+    return ids
+
+
+def leer_forma(args):
+    forma = args.get('forma', 'objetos')
+    if forma not in FORMAS:
+        raise ConsultaInvalida(f"'forma' debe ser {' o '.join(FORMAS)}.")
+    return forma
+
+
+def _entero(args, nombre):
+    valor = args.get(nombre)
+    if valor in (None, ''):
+        return None
+    try:
+        return int(valor)
+    except ValueError:
+        raise ConsultaInvalida(f"'{nombre}' debe ser un número entero.")
+
+
+# --- Consultas ---
+
+@functools.lru_cache(maxsize=256)
+def _consulta(recurso, campos):
+    """SELECT con solo las columnas (y uniones) de 'campos'; se arma una vez por combinación."""
+    desde, columnas, uniones, _, _ = RECURSOS[recurso]
+    joins = [uniones[campo] for campo in campos if campo in uniones]
+    return " ".join([f"SELECT {', '.join(columnas[campo] for campo in campos)} FROM {desde}"] + joins)
+
+
+@functools.lru_cache(maxsize=256)
+def _fila(campos):
+    # Una namedtuple por combinación de campos: paginar lee la clave por atributo
+    return collections.namedtuple('Fila', campos)
+
+
+def por_ids(cur, recurso, campos, ids):
+    """
+    Registros de 'ids' con una sola consulta. Devuelve (filas, faltantes), con
+    las filas en orden de id. 'cur' es un cursor de tuplas.
+    """
+    clave = RECURSOS[recurso][3]
+    marcadores = ", ".join(["%s"] * len(ids))
+    cur.execute(f"{_consulta(recurso, campos)} WHERE {clave} IN ({marcadores}) ORDER BY {clave}", ids)
+    filas = list(map(_fila(campos)._make, cur.fetchall()))
+    encontrados = {getattr(fila, clave.rsplit('.', 1)[-1]) for fila in filas}
+    return filas, [id_registro for id_registro in ids if id_registro not in encontrados]
+
+
+def pagina(cur, recurso, campos, args, por_pagina):
+    """Una página keyset de 'recurso'. En compras, ?id_cliente= limita al historial de un cliente."""
+    claves = (RECURSOS[recurso][3],)
+    filtros = []
+    parametros = []
+    if recurso == 'compras':
+        id_cliente = _entero(args, 'id_cliente')
+        if id_cliente is not None:
+            claves = CLAVES_COMPRAS_CLIENTE
+            filtros.append('co.id_cliente = %s')
+            parametros.append(id_cliente)
+    return paginar(cur, _consulta(recurso, campos), claves, args, por_pagina,
+                   filtros=filtros, parametros=parametros, clase=_fila(campos))
+
+
+def consultar(conexion, recurso, args, max_ids, por_pagina):
+    """
+    Texto JSON de la consulta de 'args' sobre 'recurso': los registros de ?ids=
+    (con 'faltantes') o una página (con los cursores 'siguiente' y 'anterior').
+    Lanza ConsultaInvalida si algún parámetro no es válido.
+    """
+    campos = leer_campos(recurso, args)
+    forma = leer_forma(args)
+    ids = leer_ids(args, max_ids)
+    # Cursor de tuplas, como en repositorios.py: cada fila pasa directo a su namedtuple
+    cur = conexion.cursor(MySQLdb.cursors.Cursor)
+    try:
+        if ids is not None:
+            filas, faltantes = por_ids(cur, recurso, campos, ids)
+            return documento(campos, filas, forma, faltantes=faltantes)
+        resultado = pagina(cur, recurso, campos, args, por_pagina)
+    finally:
+        cur.close()
+    return documento(campos, resultado.items, forma, siguiente=resultado.siguiente, anterior=resultado.anterior)
+
+
+# --- Respuesta ---
+
+def _valor_json(valor):
+    if isinstance(valor, decimal.Decimal):
+        return str(valor)
+    if isinstance(valor, (datetime.datetime, datetime.date)):
+        return valor.isoformat()
+    raise TypeError(f"{type(valor).__name__} no se puede convertir a JSON")
+
+
+def documento(campos, filas, forma, **extra):
+    """Texto JSON compacto con las filas en la 'forma' pedida y los datos de 'extra'."""
+    if forma == 'filas':
+        datos = {'campos': list(campos), 'filas': filas}
+    else:
+        datos = {'items': [fila._asdict() for fila in filas]}
+    datos.update(extra)
+    return json.dumps(datos, separators=(',', ':'), ensure_ascii=False, default=_valor_json)
+
+
+def comprimir(respuesta, acepta, minimo):
+    """
+    Comprime con gzip el cuerpo de 'respuesta' si el cliente lo acepta ('acepta'
+    es request.accept_encodings) y tiene al menos 'minimo' bytes. Un ETag
+    fuerte pasa a ser el de la representación comprimida (con SUFIJO_GZIP).
+    """
+    if (respuesta.status_code != 200 or respuesta.is_streamed or respuesta.direct_passthrough
+            or 'Content-Encoding' in respuesta.headers):
+        return respuesta
+    respuesta.vary.add('Accept-Encoding')
+    if not acepta['gzip']:
+        return respuesta
+    datos = respuesta.get_data()
+    if len(datos) < minimo:
+        return respuesta
+    respuesta.set_data(gzip.compress(datos, compresslevel=6))
+    respuesta.headers['Content-Encoding'] = 'gzip'
+    etag, debil = respuesta.get_etag()
+    if etag and not debil:
+        respuesta.set_etag(etag + SUFIJO_GZIP)
+    return respuesta
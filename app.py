@@ -1,8 +1,34 @@
-from flask import Flask, render_template, redirect, url_for, request, flash
-from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
-from flask_mysqldb import MySQL
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Flask, render_template, redirect, url_for, request, flash, jsonify, Response, stream_with_context
+from flask_login import LoginManager, login_user, login_required, logout_user, current_user
+from Conexion.conexion import mysql
+from contrasenas import contrasenas, ColaLlena, TiempoAgotado
 import datetime # Importamos datetime para el formateo de fecha en Python si fuera necesario
+from paginacion import leer_por_pagina
+from models import User, separar_id_sesion
+from cache_usuarios import CacheUsuarios
+from compras import procesar_carrito, normalizar_lineas, ResultadoCompra
+from validaciones import validar_producto, validar_cliente, validar_ids, validar_ajuste, validar_filtro_productos
+from importacion import importar, leer_filas, detectar_formato, TABLAS, FORMATOS
+import exportacion
+import api_datos
+import repositorios
+import resumenes
+from cache_respuestas import cache_respuestas
+from busqueda import buscar_clientes, buscar_productos, leer_limite
+import click
+from werkzeug.middleware.proxy_fix import ProxyFix
+import functools
+import hmac
+import os
+from metricas import metricas
+from activos import activos, construir_y_mostrar
+from plantillas import plantillas
+from cola_compras import cola_compras
+from admision import admision
+from en_vivo import difusor, publicar_recarga, purgar as purgar_eventos
+import esquema
+import asesor_indices
+import tempfile
 
 # Inicializar la aplicación Flask
 app = Flask(__name__)
@@ -15,8 +41,108 @@ app.config['MYSQL_PASSWORD'] = ''
 app.config['MYSQL_DB'] = 'desarrollo_web'
 app.config['MYSQL_CURSORCLASS'] = 'DictCursor' # Para que los resultados sean diccionarios, más fácil de usar en Jinja2
 
-# Inicializar Flask-MySQLdb y Flask-Login
-mysql = MySQL(app)
+# --- Pool de conexiones (ver Conexion/conexion.py) ---
+app.config['MYSQL_POOL_MIN'] = 2 # Conexiones abiertas al arrancar cada worker
+app.config['MYSQL_POOL_MAX'] = 10 # Máximo de conexiones por worker
+
+# --- Réplicas de lectura (ver Conexion/conexion.py) ---
+# Las páginas de solo lectura usan mysql.lectura; escrituras y transacciones van al principal
+app.config['MYSQL_REPLICAS'] = [] # Ej.: ['127.0.0.1:3307']
+app.config['MYSQL_PEGADO_SEG'] = 5 # Tras escribir, el usuario lee del principal estos segundos
+app.config['MYSQL_POOL_RECYCLE'] = 3600 # Segundos antes de reemplazar una conexión
+
+# --- Configuración de la paginación de los listados ---
+app.config['PAGINACION_POR_PAGINA'] = 50 # Filas por página si no se indica ?por_pagina=
+app.config['PAGINACION_TOTAL_APROXIMADO'] = True # Mostrar el total estimado (information_schema, sin COUNT(*))
+
+# --- Caché de usuarios autenticados ---
+# Tras un logout en otro worker, su caché puede tardar hasta este TTL en enterarse
+app.config['USUARIOS_CACHE_TTL'] = 120 # Segundos
+
+# --- Hash de contraseñas (ver contrasenas.py) ---
+# Sin costo explícito se usa el de werkzeug. Los hashes de otro algoritmo o de menor
+# costo se recalculan al iniciar sesión; los de mayor costo se dejan como están
+app.config['HASH_METODO'] = 'pbkdf2:sha256'
+app.config['HASH_PROCESOS'] = 1 # Procesos de hash por worker
+app.config['HASH_COLA_MAX'] = 8 # Logins/registros simultáneos por worker antes de responder 503
+app.config['HASH_TIMEOUT'] = 10 # Segundos
+
+# --- Importación masiva (ver importacion.py) ---
+app.config['IMPORTACION_TAM_LOTE'] = 1000 # Filas por INSERT multi-fila
+app.config['IMPORTACION_COMMIT_CADA'] = 10000 # Filas entre commits
+
+# --- Operaciones masivas de productos y clientes (ver repositorios.py) ---
+app.config['MASIVO_MAX_IDS'] = 10000 # Ids máximos por petición de borrado/ajuste
+app.config['MASIVO_TAM_BLOQUE'] = 1000 # Filas por sentencia dentro de la transacción
+
+# --- Caché de páginas por versión de tabla (ver cache_respuestas.py) ---
+app.config['CACHE_RESPUESTAS_ACTIVA'] = True
+app.config['CACHE_RESPUESTAS_MAX_BYTES'] = 32 * 1024 * 1024 # Memoria máxima por worker
+
+# --- Métricas por request y por sentencia SQL (ver metricas.py) ---
+app.config['METRICAS_ACTIVAS'] = True
+app.config['METRICAS_SQL_LENTO_MS'] = 200 # Sentencias más lentas se escriben en el log 'sql_lento'
+app.config['METRICAS_TOKEN'] = None # Bearer token del scraper de Prometheus (sin token: solo usuarios con sesión)
+app.config['METRICAS_DIR'] = None # Directorio compartido para sumar las métricas de todos los workers
+
+# --- API JSON de lectura para terminales y servicios (ver api_datos.py) ---
+app.config['API_TOKENS'] = {} # nombre del cliente -> token (Authorization: Bearer <token>); con sesión iniciada no hace falta
+app.config['API_MAX_IDS'] = 1000 # Ids por consulta ?ids=
+app.config['API_POR_PAGINA'] = 500
+app.config['API_POR_PAGINA_MAXIMO'] = 2000
+app.config['API_GZIP_MINIMO'] = 1024 # Bytes a partir de los cuales se comprime la respuesta
+
+# --- Estáticos con huella y caché permanente (ver activos.py; generar con 'flask construir-activos') ---
+app.config['ACTIVOS_DESTINO'] = os.path.join(app.static_folder, 'dist')
+app.config['ACTIVOS_OBLIGATORIOS'] = True # Sin manifest, los workers de gunicorn no arrancan (gunicorn.conf.py)
+
+# --- Plantillas en streaming y caché de bytecode de Jinja (ver plantillas.py) ---
+app.config['PLANTILLAS_BLOQUE'] = 16 * 1024 # Bytes acumulados antes de cada envío
+app.config['PLANTILLAS_CACHE_DIR'] = None # Directorio compartido por los workers (None: temporal de Jinja)
+
+# --- Cola durable de compras para ventas relámpago (ver cola_compras.py) ---
+app.config['COLA_COMPRAS_ACTIVA'] = False # True: las compras se encolan y se aplican en lotes
+app.config['COLA_COMPRAS_LOTE'] = 500 # Pedidos máximos por transacción
+
+# --- Proxy inverso ---
+# Proxies de confianza delante de la app (Heroku o nginx: 1). Con 0 no se confía en
+# X-Forwarded-For y la IP del cliente es la del socket: detrás de un proxy, todos los
+# clientes compartirían la misma IP (y las mismas cubetas de admision.py)
+app.config['PROXY_SALTOS'] = 0
+
+# --- Control de admisión: límites de tasa y de concurrencia por worker (ver admision.py) ---
+app.config['ADMISION_ACTIVA'] = True
+app.config['ADMISION_TASA_IP'] = (20, 40) # (requests por segundo, ráfaga) por IP
+app.config['ADMISION_TASA_USUARIO'] = (10, 30) # por usuario con sesión
+app.config['ADMISION_TASA_LOGIN'] = (0.2, 5) # intentos de login/registro por IP
+app.config['ADMISION_ESPERA_COLA_MAX'] = 2.0 # Segundos de espera en el proxy (X-Request-Start) antes de rechazar
+
+# --- Stock y precios en vivo con Server-Sent Events (ver en_vivo.py) ---
+app.config['EVENTOS_ACTIVOS'] = True
+app.config['EVENTOS_MAX_CONEXIONES'] = 6 # Conexiones abiertas por worker: cada una ocupa un hilo (gunicorn.conf.py)
+
+# --- Configuración por entorno ---
+# Cualquier clave anterior se puede reemplazar con una variable FLASK_<CLAVE>; el valor
+# se lee como JSON si se puede. Por ejemplo, en producción detrás de Heroku:
+#   FLASK_PROXY_SALTOS=1  FLASK_ADMISION_TASA_IP='[50, 100]'
+# y para pruebas de carga desde una sola IP (benchmarks/carga.py):
+#   FLASK_ADMISION_ACTIVA=false
+app.config.from_prefixed_env()
+if app.config['PROXY_SALTOS']:
+    saltos = app.config['PROXY_SALTOS']
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=saltos, x_proto=saltos, x_host=saltos)
+
+# Inicializar el pool de MySQL y Flask-Login
+mysql.init_app(app)
+contrasenas.init_app(app)
+cache_respuestas.init_app(app, mysql)
+metricas.init_app(app, mysql)
+admision.init_app(app) # Después de metricas: los 429/503 también se cuentan
+activos.init_app(app)
+plantillas.init_app(app)
+cola_compras.init_app(app, mysql)
+difusor.init_app(app, mysql)
+cache_respuestas.generacion = activos.version
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
@@ -25,25 +151,46 @@ login_manager.login_view = 'login'
 login_manager.login_message = 'Debes iniciar sesión para acceder a esta página.'
 login_manager.login_message_category = 'warning' 
 
-# --- Modelo de Usuario ---
-class User(UserMixin):
-    def __init__(self, id, username, password):
-        self.id = id
-        self.username = username
-        self.password = password
+# --- Modelo de Usuario (ver models.py) ---
+cache_usuarios = CacheUsuarios(ttl=app.config['USUARIOS_CACHE_TTL'])
 
 # Función para cargar el usuario
 @login_manager.user_loader
-def load_user(user_id):
+def load_user(id_sesion):
+    # El id de sesión es "id:version_sesion"; las sesiones con otro formato o con
+    # una versión antigua (logout, cambio de contraseña) ya no son válidas
+    partes = separar_id_sesion(id_sesion)
+    if partes is None:
+        return None
+    user_id, version_sesion = partes
+
+    # Caso común: el usuario ya está en la caché del proceso, cero consultas
+    user = cache_usuarios.obtener(user_id, version_sesion)
+    if user is not None:
+        return user
+
     cur = mysql.connection.cursor()
-    cur.execute("SELECT id, username, password FROM users WHERE id = %s", (user_id,))
+    cur.execute("SELECT id, username, version_sesion FROM users WHERE id = %s", (user_id,))
     user_data = cur.fetchone()
     cur.close()
-    if user_data:
+    if user_data and user_data['version_sesion'] == version_sesion:
         # Usa el nombre de la columna para acceder a los datos
-        return User(id=user_data['id'], username=user_data['username'], password=user_data['password'])
+        user = User(id=user_data['id'], username=user_data['username'], version_sesion=user_data['version_sesion'])
+        cache_usuarios.guardar(user)
+        return user
     return None
 
+def invalidar_sesiones(user_id):
+    """
+    Incrementa la versión de sesión del usuario: todas sus sesiones abiertas
+    dejan de ser válidas. Usar al cerrar sesión y al cambiar la contraseña.
+    """
+    cur = mysql.connection.cursor()
+    cur.execute("UPDATE users SET version_sesion = version_sesion + 1 WHERE id = %s", (user_id,))
+    mysql.connection.commit()
+    cur.close()
+    cache_usuarios.invalidar(user_id)
+
 # --- Rutas de Autenticación (Alertas traducidas) ---
 
 @app.route('/registro', methods=['GET', 'POST'])
@@ -78,10 +225,14 @@ def registro():
             return redirect(url_for('registro'))
         
         # HASHEAR Y GUARDAR
-        # NOTA IMPORTANTE: Usamos 'pbkdf2:sha256' como método por defecto de werkzeug si 'scrypt' 
-        # no está disponible o da problemas, ya que es más estable. Si tu entorno soporta 'scrypt' 
-        # sin problemas, puedes cambiarlo.
-        hashed_password = generate_password_hash(password, method='pbkdf2:sha256') 
+        # El hash se calcula en el pool de procesos con el método de HASH_METODO
+        # ('pbkdf2:sha256' por defecto; si tu entorno soporta 'scrypt' sin problemas, puedes cambiarlo).
+        try:
+            hashed_password = contrasenas.generar(password)
+        except (ColaLlena, TiempoAgotado):
+            cur.close()
+            flash('El servidor está ocupado en este momento. Inténtalo de nuevo en unos segundos.', 'error')
+            return render_template('registro.html'), 503, {'Retry-After': '5'}
         
         try:
             cur.execute("INSERT INTO users (username, password) VALUES (%s, %s)", (username, hashed_password))
@@ -90,7 +241,7 @@ def registro():
             flash('¡Registro exitoso! Ahora puedes iniciar sesión.', 'success')
             return redirect(url_for('login'))
         except Exception as e:
-            print(f"Error al registrar el usuario: {e}")
+            app.logger.exception(f"Error al registrar el usuario: {e}")
             cur.close()
             flash('Ocurrió un error inesperado al registrar el usuario. Inténtalo de nuevo.', 'error')
             return redirect(url_for('registro'))
@@ -108,12 +259,33 @@ def login():
         password = request.form.get('password')
         
         cur = mysql.connection.cursor()
-        cur.execute("SELECT id, username, password FROM users WHERE username = %s", (username,)) 
+        cur.execute("SELECT id, username, password, version_sesion FROM users WHERE username = %s", (username,)) 
         user_data = cur.fetchone()
         cur.close()
         
-        if user_data and check_password_hash(user_data['password'], password):
-            user = User(id=user_data['id'], username=user_data['username'], password=user_data['password'])
+        try:
+            valida = bool(user_data) and contrasenas.verificar(user_data['password'], password)
+        except (ColaLlena, TiempoAgotado):
+            # Ráfaga de logins: se rechaza rápido en lugar de dejar en cola a todo el worker
+            flash('El servidor está ocupado en este momento. Inténtalo de nuevo en unos segundos.', 'error')
+            return render_template('login.html'), 503, {'Retry-After': '5'}
+
+        if valida:
+            # Si el hash se generó con un método o costo anterior, se recalcula ahora que
+            # tenemos la contraseña en claro. Si falla, el login sigue adelante igual.
+            if contrasenas.necesita_rehash(user_data['password']):
+                try:
+                    nuevo_hash = contrasenas.generar(password)
+                    cur = mysql.connection.cursor()
+                    cur.execute("UPDATE users SET password = %s WHERE id = %s", (nuevo_hash, user_data['id']))
+                    mysql.connection.commit()
+                    cur.close()
+                except Exception as e:
+                    app.logger.warning(f"No se pudo actualizar el hash del usuario {user_data['id']}: {e}")
+
+            # El objeto User no guarda el hash: solo la identidad y la versión de sesión
+            user = User(id=user_data['id'], username=user_data['username'], version_sesion=user_data['version_sesion'])
+            cache_usuarios.guardar(user)
             login_user(user)
             flash(f'¡Bienvenido, {username}! Has iniciado sesión con éxito.', 'success')
             return redirect(url_for('leer_productos')) # Redirige a la lista de productos
@@ -126,6 +298,7 @@ def login():
 @app.route('/logout')
 @login_required
 def logout():
+    invalidar_sesiones(current_user.id)
     logout_user()
     flash('Has cerrado sesión exitosamente.', 'success')
     return redirect(url_for('login'))
@@ -142,13 +315,17 @@ def index():
 # 1. Leer Productos (Read)
 @app.route('/productos')
 @login_required
+@cache_respuestas.por_version('productos')
 def leer_productos():
-    cur = mysql.connection.cursor() 
-    cur.execute("SELECT * FROM productos ORDER BY id_producto DESC")
-    productos = cur.fetchall()
-    cur.close()
-    
-    return render_template('productos.html', productos=productos)
+    por_pagina = leer_por_pagina(request.args, app.config['PAGINACION_POR_PAGINA'])
+    args = request.args
+
+    # Paginación keyset: cada página entra por la PK a partir del cursor, sin OFFSET.
+    # La plantilla la pide después de enviar el encabezado (ver plantillas.py)
+    def cargar_pagina():
+        return repositorios.listar_productos(mysql.lectura, args, por_pagina,
+                                             con_total=app.config['PAGINACION_TOTAL_APROXIMADO'])
+    return plantillas.transmitir('productos.html', cargar_pagina=cargar_pagina)
 
 # 2. Crear Producto (Create)
 @app.route('/crear', methods=['GET', 'POST'])
@@ -159,32 +336,21 @@ def crear_producto():
         precio = request.form['precio']
         stock = request.form['stock']
 
-        # --- Validación de Datos ---
-        if not nombre or not precio or not stock:
-            flash('Todos los campos son obligatorios.', 'error')
-            return redirect(url_for('crear_producto'))
-
-        try:
-            precio_float = float(precio)
-            stock_int = int(stock)
-            if precio_float <= 0 or stock_int < 0:
-                flash('El precio debe ser positivo y el stock no puede ser negativo.', 'error')
-                return redirect(url_for('crear_producto'))
-        except ValueError:
-            flash('El precio debe ser un número decimal y el stock un entero.', 'error')
+        # --- Validación de Datos (reglas compartidas con la importación, ver validaciones.py) ---
+        datos, error = validar_producto(nombre, precio, stock)
+        if error:
+            flash(error, 'error')
             return redirect(url_for('crear_producto'))
+        nombre, precio_float, stock_int = datos
         # ---------------------------
 
         try:
-            cur = mysql.connection.cursor()
-            query = "INSERT INTO productos (nombre, precio, stock) VALUES (%s, %s, %s)"
-            cur.execute(query, (nombre, precio_float, stock_int))
-            mysql.connection.commit()
-            cur.close()
+            repositorios.crear_producto(mysql.connection, nombre, precio_float, stock_int)
+            cache_respuestas.tocar('productos')
             flash(f'Producto "{nombre}" creado exitosamente.', 'success')
             return redirect(url_for('leer_productos'))
         except Exception as e:
-            print(f"Error al insertar producto: {e}")
+            app.logger.exception(f"Error al insertar producto: {e}")
             flash('Ocurrió un error al guardar el producto. Inténtalo de nuevo.', 'error')
             return redirect(url_for('crear_producto'))
     
@@ -195,45 +361,31 @@ def crear_producto():
 @app.route('/editar/<int:id_producto>', methods=['GET', 'POST'])
 @login_required
 def editar_producto(id_producto):
-    cur = mysql.connection.cursor()
-    
     if request.method == 'POST':
         nombre = request.form['nombre']
         precio = request.form['precio']
         stock = request.form['stock']
         
-        # Validación de Datos (similar a crear)
-        if not nombre or not precio or not stock:
-            flash('Todos los campos son obligatorios.', 'error')
-            return redirect(url_for('editar_producto', id_producto=id_producto))
-        
-        try:
-            precio_float = float(precio)
-            stock_int = int(stock)
-            if precio_float <= 0 or stock_int < 0:
-                flash('El precio debe ser positivo y el stock no puede ser negativo.', 'error')
-                return redirect(url_for('editar_producto', id_producto=id_producto))
-        except ValueError:
-            flash('El precio debe ser un número decimal y el stock un entero.', 'error')
+        # Validación de Datos (igual que crear)
+        datos, error = validar_producto(nombre, precio, stock)
+        if error:
+            flash(error, 'error')
             return redirect(url_for('editar_producto', id_producto=id_producto))
+        nombre, precio_float, stock_int = datos
         # Fin de la Validación
         
         try:
-            query = "UPDATE productos SET nombre=%s, precio=%s, stock=%s WHERE id_producto=%s"
-            cur.execute(query, (nombre, precio_float, stock_int, id_producto))
-            mysql.connection.commit()
-            cur.close()
+            repositorios.actualizar_producto(mysql.connection, id_producto, nombre, precio_float, stock_int)
+            cache_respuestas.tocar('productos')
             flash(f'Producto "{nombre}" actualizado exitosamente.', 'success')
             return redirect(url_for('leer_productos'))
         except Exception as e:
-            print(f"Error al actualizar producto: {e}")
+            app.logger.exception(f"Error al actualizar producto: {e}")
             flash('Ocurrió un error al actualizar el producto. Inténtalo de nuevo.', 'error')
             return redirect(url_for('editar_producto', id_producto=id_producto))
     
     # Si es GET, se carga el producto para mostrarlo en el formulario
-    cur.execute("SELECT * FROM productos WHERE id_producto = %s", (id_producto,))
-    producto = cur.fetchone()
-    cur.close()
+    producto = repositorios.obtener_producto(mysql.connection, id_producto)
 
     if producto is None:
         flash('Producto no encontrado.', 'error')
@@ -247,24 +399,88 @@ def editar_producto(id_producto):
 @login_required
 def eliminar_producto(id_producto):
     try:
-        cur = mysql.connection.cursor()
-        query = "DELETE FROM productos WHERE id_producto = %s"
-        cur.execute(query, (id_producto,))
-        mysql.connection.commit()
-        
-        # Revisa si se eliminó alguna fila
-        if cur.rowcount > 0:
+        if repositorios.eliminar_producto(mysql.connection, id_producto):
+            # También se borran sus compras (ver repositorios._eliminar)
+            cache_respuestas.tocar('productos', 'compras')
             flash('Producto eliminado exitosamente.', 'success')
         else:
             flash('Producto no encontrado para eliminar.', 'error')
-
-        cur.close()
         return redirect(url_for('leer_productos'))
     except Exception as e:
-        print(f"Error al eliminar producto: {e}")
+        app.logger.exception(f"Error al eliminar producto: {e}")
         flash('Ocurrió un error al intentar eliminar el producto.', 'error')
         return redirect(url_for('leer_productos'))
 
+# 5. Operaciones masivas (selección múltiple de productos.html / clientes.html o JSON)
+def _datos_masivos():
+    """(datos, ids) de la petición: JSON {"ids": [...], ...} o formulario con varios 'ids'."""
+    if request.is_json:
+        datos = request.get_json(silent=True) or {}
+        return datos, datos.get('ids') or []
+    return request.form, request.form.getlist('ids')
+
+def _respuesta_masiva(endpoint, ok, mensaje, detalle=None, codigo=200):
+    if request.is_json:
+        return jsonify({'ok': ok, 'mensaje': mensaje, **(detalle or {})}), codigo
+    flash(mensaje, 'success' if ok else 'error')
+    return redirect(url_for(endpoint))
+
+@app.route('/productos/eliminar_lote', methods=['POST'])
+@login_required
+def eliminar_productos_lote():
+    """Elimina los productos seleccionados y sus compras en una sola transacción."""
+    _, ids = _datos_masivos()
+    ids, error = validar_ids(ids, app.config['MASIVO_MAX_IDS'])
+    if error:
+        return _respuesta_masiva('leer_productos', False, error, codigo=400)
+    try:
+        afectadas = repositorios.eliminar_productos(mysql.connection, ids, app.config['MASIVO_TAM_BLOQUE'])
+    except Exception as e:
+        app.logger.exception(f"Error al eliminar productos en lote: {e}")
+        return _respuesta_masiva('leer_productos', False,
+                                 'Ocurrió un error al eliminar los productos. No se eliminó ninguno.', codigo=500)
+    cache_respuestas.tocar('productos', 'compras')
+    return _respuesta_masiva('leer_productos', True,
+                             f"Se eliminaron {afectadas['productos']} productos, con {afectadas['compras']} "
+                             f"compras y {afectadas['clientes_productos']} totales por cliente.",
+                             {'afectadas': afectadas})
+
+@app.route('/productos/ajustar', methods=['POST'])
+@login_required
+def ajustar_productos():
+    """
+    Ajusta el precio o el stock por porcentaje o por cantidad, de los productos
+    seleccionados ('ids') o de todos los que cumplan el filtro (nombre, precio_min,
+    precio_max, stock_min, stock_max; sin filtro hay que enviar todos=1).
+    """
+    datos, ids = _datos_masivos()
+    ajuste, error = validar_ajuste(datos.get('campo'), datos.get('modo'), datos.get('valor'))
+    if error:
+        return _respuesta_masiva('leer_productos', False, error, codigo=400)
+    filtros = None
+    if ids:
+        ids, error = validar_ids(ids, app.config['MASIVO_MAX_IDS'])
+    else:
+        ids = None
+        filtros, error = validar_filtro_productos(datos)
+        if not error and not filtros and str(datos.get('todos')) not in ('1', 'true', 'True'):
+            error = 'Selecciona productos o indica un filtro (o confirma que el ajuste es para todos).'
+    if error:
+        return _respuesta_masiva('leer_productos', False, error, codigo=400)
+
+    campo, modo, valor = ajuste
+    try:
+        modificados = repositorios.ajustar_productos(mysql.connection, campo, modo, valor, ids=ids, filtros=filtros,
+                                                     tam_bloque=app.config['MASIVO_TAM_BLOQUE'])
+    except Exception as e:
+        app.logger.exception(f"Error al ajustar productos: {e}")
+        return _respuesta_masiva('leer_productos', False,
+                                 'Ocurrió un error al ajustar los productos. No se modificó ninguno.', codigo=500)
+    if modificados:
+        cache_respuestas.tocar('productos')
+    return _respuesta_masiva('leer_productos', True, f"Se ajustó el {campo} de {modificados} productos.",
+                             {'modificados': modificados})
+
 
 # -----------------------------------------------
 # --- NUEVAS RUTAS: CRUD de Clientes (Cliente) ---
@@ -273,14 +489,15 @@ def eliminar_producto(id_producto):
 # 1. Leer Clientes (Read)
 @app.route('/clientes')
 @login_required
+@cache_respuestas.por_version('clientes')
 def leer_clientes():
-    cur = mysql.connection.cursor() 
-    # Asegúrate de que tu tabla se llama 'clientes' o 'cliente' en la DB
-    cur.execute("SELECT * FROM clientes ORDER BY id_cliente DESC")
-    clientes = cur.fetchall()
-    cur.close()
-    
-    return render_template('clientes.html', clientes=clientes)
+    por_pagina = leer_por_pagina(request.args, app.config['PAGINACION_POR_PAGINA'])
+    args = request.args
+
+    def cargar_pagina():
+        return repositorios.listar_clientes(mysql.lectura, args, por_pagina,
+                                            con_total=app.config['PAGINACION_TOTAL_APROXIMADO'])
+    return plantillas.transmitir('clientes.html', cargar_pagina=cargar_pagina)
 
 # 2. Crear Cliente (Create)
 @app.route('/crear_cliente', methods=['GET', 'POST'])
@@ -292,22 +509,20 @@ def crear_cliente():
         telefono = request.form['telefono'] # Nuevo campo
 
         # --- Validación de Datos ---
-        if not nombre or not email or not telefono:
-            flash('Todos los campos del cliente son obligatorios.', 'error')
+        datos, error = validar_cliente(nombre, email, telefono)
+        if error:
+            flash(error, 'error')
             return redirect(url_for('crear_cliente'))
+        nombre, email, telefono = datos
         # ---------------------------
 
         try:
-            cur = mysql.connection.cursor()
-            # Asumiendo que la tabla tiene id_cliente, nombre, email, telefono
-            query = "INSERT INTO clientes (nombre, email, telefono) VALUES (%s, %s, %s)"
-            cur.execute(query, (nombre, email, telefono))
-            mysql.connection.commit()
-            cur.close()
+            repositorios.crear_cliente(mysql.connection, nombre, email, telefono)
+            cache_respuestas.tocar('clientes')
             flash(f'Cliente "{nombre}" creado exitosamente.', 'success')
             return redirect(url_for('leer_clientes'))
         except Exception as e:
-            print(f"Error al insertar cliente: {e}")
+            app.logger.exception(f"Error al insertar cliente: {e}")
             flash('Ocurrió un error al guardar el cliente. Inténtalo de nuevo.', 'error')
             return redirect(url_for('crear_cliente'))
     
@@ -318,35 +533,31 @@ def crear_cliente():
 @app.route('/editar_cliente/<int:id_cliente>', methods=['GET', 'POST'])
 @login_required
 def editar_cliente(id_cliente):
-    cur = mysql.connection.cursor()
-    
     if request.method == 'POST':
         nombre = request.form['nombre']
         email = request.form['email']
         telefono = request.form['telefono']
         
         # Validación de Datos
-        if not nombre or not email or not telefono:
-            flash('Todos los campos del cliente son obligatorios.', 'error')
+        datos, error = validar_cliente(nombre, email, telefono)
+        if error:
+            flash(error, 'error')
             return redirect(url_for('editar_cliente', id_cliente=id_cliente))
+        nombre, email, telefono = datos
         # Fin de la Validación
         
         try:
-            query = "UPDATE clientes SET nombre=%s, email=%s, telefono=%s WHERE id_cliente=%s"
-            cur.execute(query, (nombre, email, telefono, id_cliente))
-            mysql.connection.commit()
-            cur.close()
+            repositorios.actualizar_cliente(mysql.connection, id_cliente, nombre, email, telefono)
+            cache_respuestas.tocar('clientes')
             flash(f'Cliente "{nombre}" actualizado exitosamente.', 'success')
             return redirect(url_for('leer_clientes'))
         except Exception as e:
-            print(f"Error al actualizar cliente: {e}")
+            app.logger.exception(f"Error al actualizar cliente: {e}")
             flash('Ocurrió un error al actualizar el cliente. Inténtalo de nuevo.', 'error')
             return redirect(url_for('editar_cliente', id_cliente=id_cliente))
     
     # Si es GET, se carga el cliente para mostrarlo en el formulario
-    cur.execute("SELECT * FROM clientes WHERE id_cliente = %s", (id_cliente,))
-    cliente = cur.fetchone()
-    cur.close()
+    cliente = repositorios.obtener_cliente(mysql.connection, id_cliente)
 
     if cliente is None:
         flash('Cliente no encontrado.', 'error')
@@ -360,26 +571,40 @@ def editar_cliente(id_cliente):
 @login_required
 def eliminar_cliente(id_cliente):
     try:
-        cur = mysql.connection.cursor()
-        query = "DELETE FROM clientes WHERE id_cliente = %s"
-        cur.execute(query, (id_cliente,))
-        mysql.connection.commit()
-        
-        # Revisa si se eliminó alguna fila
-        if cur.rowcount > 0:
-            # Gracias al ON DELETE CASCADE en la DB, se eliminan automáticamente 
-            # las entradas de clientes_productos relacionadas.
+        if repositorios.eliminar_cliente(mysql.connection, id_cliente):
+            cache_respuestas.tocar('clientes', 'compras')
+            # También se eliminan sus compras y las entradas de clientes_productos
+            # relacionadas (ver repositorios._eliminar)
             flash('Cliente eliminado exitosamente (incluyendo su historial de compras).', 'success')
         else:
             flash('Cliente no encontrado para eliminar.', 'error')
-
-        cur.close()
         return redirect(url_for('leer_clientes'))
     except Exception as e:
-        print(f"Error al eliminar cliente: {e}")
+        app.logger.exception(f"Error al eliminar cliente: {e}")
         flash('Ocurrió un error al intentar eliminar el cliente.', 'error')
         return redirect(url_for('leer_clientes'))
 
+# 5. Eliminación masiva (selección múltiple de clientes.html o JSON)
+@app.route('/clientes/eliminar_lote', methods=['POST'])
+@login_required
+def eliminar_clientes_lote():
+    """Elimina los clientes seleccionados y su historial de compras en una sola transacción."""
+    _, ids = _datos_masivos()
+    ids, error = validar_ids(ids, app.config['MASIVO_MAX_IDS'])
+    if error:
+        return _respuesta_masiva('leer_clientes', False, error, codigo=400)
+    try:
+        afectadas = repositorios.eliminar_clientes(mysql.connection, ids, app.config['MASIVO_TAM_BLOQUE'])
+    except Exception as e:
+        app.logger.exception(f"Error al eliminar clientes en lote: {e}")
+        return _respuesta_masiva('leer_clientes', False,
+                                 'Ocurrió un error al eliminar los clientes. No se eliminó ninguno.', codigo=500)
+    cache_respuestas.tocar('clientes', 'compras')
+    return _respuesta_masiva('leer_clientes', True,
+                             f"Se eliminaron {afectadas['clientes']} clientes, con {afectadas['compras']} "
+                             f"compras y {afectadas['clientes_productos']} totales por producto.",
+                             {'afectadas': afectadas})
+
 
 # -----------------------------------------------
 # --- RUTA PARA LA RELACIÓN M:M (Compras) ---
@@ -387,54 +612,32 @@ def eliminar_cliente(id_cliente):
 
 @app.route('/compras/<int:cliente_id>')
 @login_required
+@cache_respuestas.por_version('compras', 'clientes', 'productos')
 def ver_compras(cliente_id):
     """
-    Muestra la lista de productos comprados por un cliente específico.
+    Muestra el historial de compras de un cliente, paginado por cursor.
+    Lee del libro de compras (tabla 'compras', una fila por compra) entrando por
+    el índice (id_cliente, fecha_compra), así que el costo de cada página no
+    depende de cuántas compras tenga el cliente.
     """
-    cur = mysql.connection.cursor()
+    por_pagina = leer_por_pagina(request.args, app.config['PAGINACION_POR_PAGINA'])
 
-    # 1. CONSULTA PRINCIPAL: Se mantienen las columnas de clientes_productos
-    query = """
-        SELECT 
-            c.nombre AS nombre_cliente,
-            p.nombre AS nombre_producto, 
-            cp.cantidad,
-            cp.fecha_compra AS fecha_compra_raw 
-        FROM 
-            clientes c
-        JOIN 
-            clientes_productos cp ON c.id_cliente = cp.id_cliente
-        JOIN 
-            productos p ON cp.id_producto = p.id_producto
-        WHERE 
-            c.id_cliente = %s
-        ORDER BY
-            cp.fecha_compra DESC
-    """
-    
-    cur.execute(query, (cliente_id,))
-    compras = cur.fetchall()
-    cur.close()
+    # 1. Nombre del cliente para el título de la página (búsqueda por PK)
+    cliente_info = repositorios.obtener_cliente_resumen(mysql.lectura, cliente_id)
+    nombre_cliente = cliente_info.nombre if cliente_info else "Cliente Desconocido"
 
-    # 2. Determinar el nombre del cliente para el título de la página
-    nombre_cliente = "Cliente Desconocido"
-    if compras:
-        # Si hay resultados, el nombre del cliente ya está en el primer registro
-        nombre_cliente = compras[0]['nombre_cliente']
-    else:
-        # Si no hay compras, consultamos el nombre del cliente para mostrarlo
-        cur = mysql.connection.cursor()
-        cur.execute("SELECT nombre FROM clientes WHERE id_cliente = %s", (cliente_id,))
-        cliente_info = cur.fetchone()
-        cur.close()
-        if cliente_info:
-             nombre_cliente = cliente_info['nombre']
+    # 2. Una página del historial, de la compra más reciente a la más antigua.
+    # Se consulta mientras se envía la página, después del encabezado
+    args = request.args
+
+    def cargar_pagina():
+        return repositorios.historial_compras(mysql.lectura, cliente_id, args, por_pagina)
 
-    # Renderiza la plantilla 'compras_detalle.html' con los resultados
-    return render_template('compras_detalle.html', 
-                           compras=compras, 
-                           cliente_id=cliente_id,
-                           nombre_cliente=nombre_cliente)
+    # Renderiza la plantilla 'compras_detalle.html' en streaming (ver plantillas.py)
+    return plantillas.transmitir('compras_detalle.html',
+                                 cargar_pagina=cargar_pagina,
+                                 cliente_id=cliente_id,
+                                 nombre_cliente=nombre_cliente)
 
 
 # -------------------------------------------------------------
@@ -443,15 +646,13 @@ def ver_compras(cliente_id):
 
 @app.route('/registrar_compra/<int:cliente_id_opcional>', methods=['GET', 'POST'])
 @login_required
+@cache_respuestas.por_version('clientes')
 def registrar_compra(cliente_id_opcional=None):
     """
     1. Si es GET, muestra el formulario para seleccionar producto y cantidad.
-    2. Si es POST, registra la compra en clientes_productos (usando UPDATE si ya existe), 
-       actualiza el stock y redirige.
+    2. Si es POST, registra la compra de un solo producto (ver procesar_carrito
+       en compras.py) y redirige. Para varios productos a la vez se usa /checkout.
     """
-    # Abrimos el cursor para el manejo de la transacción
-    cur = mysql.connection.cursor() 
-
     if request.method == 'POST':
         # --- Lógica de Registro (POST) ---
         id_cliente = request.form.get('id_cliente')
@@ -460,7 +661,6 @@ def registrar_compra(cliente_id_opcional=None):
 
         if not id_cliente or not id_producto or not cantidad:
             flash('Faltan datos para registrar la compra.', 'error')
-            cur.close()
             # Usamos el cliente_id_opcional para redirigir si está disponible
             redir_id = cliente_id_opcional if cliente_id_opcional else id_cliente
             return redirect(url_for('registrar_compra', cliente_id_opcional=redir_id))
@@ -472,97 +672,590 @@ def registrar_compra(cliente_id_opcional=None):
             
             if cantidad_int <= 0:
                 flash('La cantidad debe ser un número positivo.', 'error')
-                cur.close()
                 return redirect(url_for('registrar_compra', cliente_id_opcional=id_cliente_int))
         except ValueError:
             flash('El Cliente, Producto y Cantidad deben ser números enteros válidos.', 'error')
-            cur.close()
-            return redirect(url_for('leer_clientes'))
-        
-        # 1. Verificar Stock
-        cur.execute("SELECT stock, nombre FROM productos WHERE id_producto = %s", (id_producto_int,))
-        producto_info = cur.fetchone()
-
-        if not producto_info:
-            flash('Producto no encontrado.', 'error')
-            cur.close()
             return redirect(url_for('leer_clientes'))
         
-        stock_actual = producto_info['stock']
-        nombre_producto = producto_info['nombre']
-        
-        if stock_actual < cantidad_int:
-            flash(f'No hay suficiente stock para "{nombre_producto}". Stock actual: {stock_actual}.', 'error')
-            cur.close()
-            return redirect(url_for('registrar_compra', cliente_id_opcional=id_cliente_int))
+        if cola_compras.activa:
+            # Modo cola: se guarda el pedido y se aplica en el próximo lote (ver cola_compras.py)
+            clave = cola_compras.encolar(id_cliente_int, {id_producto_int: cantidad_int}, current_user.get_id())
+            return redirect(url_for('ver_pedido', clave=clave))
 
-        # 2. Registrar la compra en la tabla pivote y actualizar stock (en una sola transacción)
+        # Verificación de stock, descuento condicional y registro en una sola transacción
         try:
-            # CLAVE DEL FIX: Usamos INSERT ... ON DUPLICATE KEY UPDATE.
-            # 
-            # SI LA COMPRA (cliente_id, producto_id) EXISTE: 
-            #    Se actualiza la columna 'cantidad' sumándole la nueva cantidad. 
-            #    También actualizamos la fecha de compra a la hora actual.
-            #
-            # SI LA COMPRA NO EXISTE:
-            #    Se inserta un nuevo registro.
-            query_compra = """
-                INSERT INTO clientes_productos (id_cliente, id_producto, cantidad)
-                VALUES (%s, %s, %s)
-                ON DUPLICATE KEY UPDATE 
-                    cantidad = cantidad + VALUES(cantidad),
-                    fecha_compra = CURRENT_TIMESTAMP
-            """
-            cur.execute(query_compra, (id_cliente_int, id_producto_int, cantidad_int))
-            
-            # Actualizar el stock del producto
-            nuevo_stock = stock_actual - cantidad_int
-            query_stock = "UPDATE productos SET stock = %s WHERE id_producto = %s"
-            cur.execute(query_stock, (nuevo_stock, id_producto_int))
-            
-            # CONFIRMAMOS AMBAS OPERACIONES
-            mysql.connection.commit() 
-            
-            flash(f'Compra de {cantidad_int} unidades de "{nombre_producto}" registrada y stock actualizado.', 'success')
-            return redirect(url_for('ver_compras', cliente_id=id_cliente_int))
-            
+            resultado = procesar_carrito(mysql.connection, id_cliente_int, {id_producto_int: cantidad_int})
         except Exception as e:
-            # Manejo de errores genéricos si el problema no fuera la clave duplicada
+            # Si algo falla, procesar_carrito ya hizo rollback (deshacemos los cambios)
             flash('Ocurrió un error al registrar la compra. Inténtalo de nuevo. Se deshicieron los cambios.', 'error')
-            
-            # Si algo falla, hacemos rollback (deshacemos los cambios)
-            mysql.connection.rollback()
-            print(f"Error al registrar la compra y actualizar stock: {e}")
+            app.logger.exception(f"Error al registrar la compra y actualizar stock: {e}")
+            return redirect(url_for('registrar_compra', cliente_id_opcional=id_cliente_int))
+
+        if not resultado.ok:
+            for error in resultado.errores:
+                flash(error['motivo'], 'error')
             return redirect(url_for('registrar_compra', cliente_id_opcional=id_cliente_int))
-        finally:
-            cur.close() # Asegura que el cursor siempre se cierre si llegamos aquí
+
+        cache_respuestas.tocar('productos', 'compras')
+        nombre_producto = resultado.lineas[0]['nombre']
+        flash(f'Compra de {cantidad_int} unidades de "{nombre_producto}" registrada y stock actualizado.', 'success')
+        return redirect(url_for('ver_compras', cliente_id=id_cliente_int))
 
     # --- Lógica de Formulario (GET) ---
     # Si es GET o si el POST falló la validación, volvemos a cargar el formulario
 
-    # Cargar clientes y productos para los selectores
-    cur.execute("SELECT id_cliente, nombre FROM clientes ORDER BY nombre")
-    clientes = cur.fetchall()
-    
-    # Solo mostrar productos con stock > 0
-    cur.execute("SELECT id_producto, nombre, precio, stock FROM productos WHERE stock > 0 ORDER BY nombre")
-    productos = cur.fetchall()
-    cur.close()
-
-    # Si se pasa un cliente_id en la URL, lo usamos para preseleccionar
+    # Los clientes y productos ya no se cargan completos: el formulario los busca
+    # a medida que el usuario escribe (rutas /api/buscar/...). Solo se carga el
+    # cliente de la URL, si viene, para preseleccionarlo.
     cliente_seleccionado = None
     if cliente_id_opcional:
-        for cliente in clientes:
-            if cliente['id_cliente'] == cliente_id_opcional:
-                cliente_seleccionado = cliente
-                break
+        cliente_seleccionado = repositorios.obtener_cliente_resumen(mysql.lectura, cliente_id_opcional)
         
     return render_template('formulario_compra.html', 
-                           clientes=clientes, 
-                           productos=productos,
                            cliente_seleccionado=cliente_seleccionado)
 
 
+# --- Búsqueda para el autocompletado del formulario de compra (ver busqueda.py) ---
+
+@app.route('/api/buscar/clientes')
+@login_required
+def buscar_clientes_api():
+    """Clientes cuyo nombre o email empieza por (o contiene) ?q=. Máximo ?limite= resultados."""
+    cur = mysql.lectura.cursor()
+    clientes = buscar_clientes(cur, request.args.get('q', ''), leer_limite(request.args))
+    cur.close()
+    return jsonify(clientes)
+
+@app.route('/api/buscar/productos')
+@login_required
+def buscar_productos_api():
+    """Productos con stock cuyo nombre empieza por (o contiene) ?q=, con precio y stock."""
+    cur = mysql.lectura.cursor()
+    productos = buscar_productos(cur, request.args.get('q', ''), leer_limite(request.args),
+                                 solo_con_stock=request.args.get('con_stock', '1') != '0')
+    cur.close()
+    return jsonify(productos)
+
+
+@app.route('/checkout', methods=['POST'])
+@login_required
+def checkout():
+    """
+    Registra un carrito completo (varios productos) para un cliente en una sola
+    transacción. Acepta el formulario de formulario_compra.html (listas
+    'id_producto' y 'cantidad') o JSON:
+        {"id_cliente": 1, "lineas": [{"id_producto": 3, "cantidad": 2}, ...]}
+    Con JSON responde con el resultado por línea; con formulario redirige.
+    """
+    if request.is_json:
+        datos = request.get_json(silent=True) or {}
+        id_cliente = datos.get('id_cliente')
+        pares = [(linea.get('id_producto'), linea.get('cantidad'))
+                 for linea in datos.get('lineas') or [] if isinstance(linea, dict)]
+    else:
+        id_cliente = request.form.get('id_cliente')
+        pares = zip(request.form.getlist('id_producto'), request.form.getlist('cantidad'))
+
+    try:
+        id_cliente_int = int(id_cliente)
+    except (TypeError, ValueError):
+        if request.is_json:
+            return jsonify({'ok': False, 'lineas': [], 'errores': [
+                {'id_producto': None, 'cantidad': None, 'motivo': 'Cliente no válido.'}]}), 400
+        flash('Debes seleccionar un cliente válido.', 'error')
+        return redirect(url_for('leer_clientes'))
+
+    lineas, errores = normalizar_lineas(pares)
+    if errores:
+        resultado = ResultadoCompra(False, [], errores)
+    elif cola_compras.activa:
+        # Modo cola: se responde en cuanto el pedido está en disco; el resultado se consulta después
+        clave = cola_compras.encolar(id_cliente_int, lineas, current_user.get_id())
+        if request.is_json:
+            consultar = url_for('consultar_pedido_api', clave=clave)
+            return jsonify({'ok': None, 'estado': 'pendiente', 'clave': clave, 'consultar': consultar}), \
+                202, {'Location': consultar}
+        return redirect(url_for('ver_pedido', clave=clave))
+    else:
+        try:
+            resultado = procesar_carrito(mysql.connection, id_cliente_int, lineas)
+        except Exception as e:
+            app.logger.exception(f"Error al registrar el carrito: {e}")
+            if request.is_json:
+                return jsonify({'ok': False, 'lineas': [], 'errores': [
+                    {'id_producto': None, 'cantidad': None, 'motivo': 'Error al registrar la compra.'}]}), 500
+            flash('Ocurrió un error al registrar la compra. Inténtalo de nuevo. Se deshicieron los cambios.', 'error')
+            return redirect(url_for('registrar_compra', cliente_id_opcional=id_cliente_int))
+
+    if resultado.ok:
+        cache_respuestas.tocar('productos', 'compras')
+
+    if request.is_json:
+        return jsonify(resultado.como_dict()), (200 if resultado.ok else 409)
+
+    if not resultado.ok:
+        for error in resultado.errores:
+            flash(error['motivo'], 'error')
+        return redirect(url_for('registrar_compra', cliente_id_opcional=id_cliente_int))
+
+    unidades = sum(linea['cantidad'] for linea in resultado.lineas)
+    flash(f'Compra de {unidades} unidades en {len(resultado.lineas)} productos registrada y stock actualizado.', 'success')
+    return redirect(url_for('ver_compras', cliente_id=id_cliente_int))
+
+
+# --- Pedidos de la cola de compras (ver cola_compras.py) ---
+
+def _pedido_del_usuario(clave):
+    """El pedido de la cola si existe y lo hizo el usuario actual, o None."""
+    pedido = cola_compras.consultar(clave) if cola_compras.activa else None
+    if pedido is None or pedido['usuario'] != current_user.get_id():
+        return None
+    return pedido
+
+@app.route('/pedidos/<clave>')
+@login_required
+def ver_pedido(clave):
+    """Estado de un pedido encolado; la página se recarga sola hasta que termina."""
+    pedido = _pedido_del_usuario(clave)
+    if pedido is None:
+        flash('Pedido no encontrado.', 'error')
+        return redirect(url_for('leer_clientes'))
+    return render_template('pedido_compra.html', pedido=pedido)
+
+@app.route('/api/pedidos/<clave>')
+@login_required
+def consultar_pedido_api(clave):
+    """Estado de un pedido encolado en JSON ('resultado' es como el de /checkout)."""
+    pedido = _pedido_del_usuario(clave)
+    if pedido is None:
+        return jsonify({'error': 'Pedido no encontrado.'}), 404
+    return jsonify({campo: pedido.get(campo) for campo in ('clave', 'estado', 'resultado', 'delante')})
+
+@cola_compras.al_aplicar
+def tocar_tras_lote(resultados):
+    cache_respuestas.tocar('productos', 'compras')
+
+
+# --- Stock y precios en vivo (ver en_vivo.py) ---
+
+@app.route('/productos/eventos')
+@login_required
+def eventos_productos():
+    """Stream text/event-stream con los cambios de stock, precio y productos."""
+    if not app.config['EVENTOS_ACTIVOS']:
+        return Response("No encontrado\n", 404, content_type='text/plain')
+    return difusor.respuesta()
+
+
+# -----------------------------------------------
+# --- API JSON DE LECTURA (ver api_datos.py) ---
+# -----------------------------------------------
+
+def _cliente_api():
+    """Nombre del cliente según su token de API, o el id del usuario con sesión iniciada, o None."""
+    autorizacion = request.headers.get('Authorization', '').encode('utf-8')
+    for nombre, token in app.config['API_TOKENS'].items():
+        if token and hmac.compare_digest(autorizacion, f"Bearer {token}".encode('utf-8')):
+            return nombre
+    return current_user.get_id() if current_user.is_authenticated else None
+
+def api_autenticada(vista):
+    """Como login_required, pero responde 401 en JSON en lugar de redirigir al login."""
+    @functools.wraps(vista)
+    def envoltura(*args, **kwargs):
+        if _cliente_api() is None:
+            return jsonify({'error': 'No autorizado.'}), 401, {'WWW-Authenticate': 'Bearer'}
+        return vista(*args, **kwargs)
+    return envoltura
+
+def _api_consulta(recurso):
+    por_pagina = leer_por_pagina(request.args, app.config['API_POR_PAGINA'], app.config['API_POR_PAGINA_MAXIMO'])
+    try:
+        texto = api_datos.consultar(mysql.lectura, recurso, request.args, app.config['API_MAX_IDS'], por_pagina)
+    except api_datos.ConsultaInvalida as e:
+        return jsonify({'error': str(e)}), 400
+    return Response(texto, content_type='application/json')
+
+@app.route('/api/v1/productos')
+@api_autenticada
+@cache_respuestas.por_version('productos')
+def api_productos():
+    """Productos por ?ids= o por páginas, con ?campos= y ?forma= (ver api_datos.py)."""
+    return _api_consulta('productos')
+
+@app.route('/api/v1/clientes')
+@api_autenticada
+@cache_respuestas.por_version('clientes')
+def api_clientes():
+    """Clientes por ?ids= o por páginas, con ?campos= y ?forma= (ver api_datos.py)."""
+    return _api_consulta('clientes')
+
+@app.route('/api/v1/compras')
+@api_autenticada
+@cache_respuestas.por_version('compras', 'productos', 'clientes')
+def api_compras():
+    """Compras por ?ids=, el historial de ?id_cliente= o todo el libro, por páginas (ver api_datos.py)."""
+    return _api_consulta('compras')
+
+@app.after_request
+def comprimir_api(respuesta):
+    # Después de la caché por versión: se guarda sin comprimir y se comprime por cliente
+    if request.path.startswith('/api/v1/'):
+        return api_datos.comprimir(respuesta, request.accept_encodings, app.config['API_GZIP_MINIMO'])
+    return respuesta
+
+
+# -----------------------------------------------
+# --- IMPORTACIÓN MASIVA (CSV / JSON / NDJSON) ---
+# -----------------------------------------------
+
+@app.route('/importar', methods=['GET', 'POST'])
+@login_required
+def importar_archivo():
+    """
+    Sube un archivo de productos o clientes y lo importa fila por fila.
+    Las filas inválidas no detienen la importación: se listan en el informe.
+    """
+    if request.method == 'POST':
+        tabla = request.form.get('tabla')
+        archivo = request.files.get('archivo')
+
+        if tabla not in TABLAS or archivo is None or not archivo.filename:
+            flash('Selecciona el tipo de registro y un archivo para importar.', 'error')
+            return redirect(url_for('importar_archivo'))
+
+        formato = request.form.get('formato') or detectar_formato(archivo.filename)
+        if formato not in FORMATOS:
+            flash('Formato no soportado. Usa un archivo .csv, .json o .ndjson.', 'error')
+            return redirect(url_for('importar_archivo'))
+
+        # archivo.stream: Werkzeug guarda las subidas grandes en un archivo temporal,
+        # así que se lee del disco por bloques y no desde memoria
+        informe = importar(mysql.connection, tabla, leer_filas(archivo.stream, formato),
+                           tam_lote=app.config['IMPORTACION_TAM_LOTE'],
+                           commit_cada=app.config['IMPORTACION_COMMIT_CADA'])
+        if informe.validas:
+            cache_respuestas.tocar(tabla)
+            _publicar_importacion(tabla)
+        if informe.abortada:
+            app.logger.warning(f"Importación de {tabla} detenida: {informe.abortada}")
+        return render_template('importar.html', informe=informe, tablas=TABLAS)
+
+    return render_template('importar.html', informe=None, tablas=TABLAS)
+
+
+def _publicar_importacion(tabla):
+    # Una importación puede tocar miles de productos: las páginas abiertas recargan
+    if tabla != 'productos' or not app.config['EVENTOS_ACTIVOS']:
+        return
+    try:
+        publicar_recarga(mysql.connection)
+    except Exception as e:
+        app.logger.warning(f"No se pudo publicar la recarga de productos: {e}")
+
+
+@app.cli.command('importar')
+@click.argument('tabla', type=click.Choice(sorted(TABLAS)))
+@click.argument('ruta', type=click.Path(exists=True, dir_okay=False))
+@click.option('--formato', type=click.Choice(FORMATOS), help='Por defecto se deduce de la extensión.')
+@click.option('--lote', type=int, default=None, help='Filas por INSERT multi-fila.')
+def importar_comando(tabla, ruta, formato, lote):
+    """Importa productos o clientes desde un archivo: flask importar productos datos.csv"""
+    formato = formato or detectar_formato(ruta)
+    if formato is None:
+        raise click.UsageError('No se pudo deducir el formato; usa --formato.')
+
+    with open(ruta, 'rb') as binario:
+        informe = importar(mysql.connection, tabla, leer_filas(binario, formato),
+                           tam_lote=lote or app.config['IMPORTACION_TAM_LOTE'],
+                           commit_cada=app.config['IMPORTACION_COMMIT_CADA'])
+    if informe.validas:
+        cache_respuestas.tocar(tabla)
+        _publicar_importacion(tabla)
+
+    click.echo(f"{informe.procesadas} registros leídos, {informe.validas} importados, "
+               f"{informe.rechazadas} rechazados.")
+    for numero, motivo in informe.errores:
+        click.echo(f"  Registro {numero}: {motivo}", err=True)
+    if informe.abortada:
+        click.echo(f"Importación detenida: {informe.abortada}", err=True)
+        raise SystemExit(1)
+
+
+# -----------------------------------------------
+# --- REPORTES DE VENTAS (ver resumenes.py) ---
+# -----------------------------------------------
+
+@app.route('/reportes')
+@login_required
+@cache_respuestas.por_version('compras', 'productos', 'clientes')
+def reportes():
+    """
+    Tablero de ventas. Solo lee las tablas de resumen, que se actualizan con cada
+    compra, así que su costo no crece con el historial.
+    """
+    datos = resumenes.tablero(mysql.lectura, limite=10, dias=30)
+    return render_template('reportes.html', datos=datos)
+
+
+@app.cli.command('reconstruir-resumenes')
+def reconstruir_resumenes_comando():
+    """Recalcula los resúmenes de ventas desde el libro de compras (una sola vez o tras una migración)."""
+    totales = resumenes.reconstruir(mysql.connection)
+    cache_respuestas.tocar('compras')
+    click.echo(", ".join(f"{tabla}: {n} filas" for tabla, n in totales.items()))
+
+
+# -----------------------------------------------
+# --- EXPORTACIÓN EN STREAMING (CSV / NDJSON) ---
+# -----------------------------------------------
+
+@app.route('/exportar/<nombre>')
+@login_required
+def exportar(nombre):
+    """
+    Descarga completa de productos, clientes o compras, enviada por bloques
+    (transferencia chunked) a medida que salen del cursor del servidor.
+    Parámetros: formato=csv|ndjson, despues_id, hasta_id y, para compras,
+    desde, hasta (fechas) e id_cliente.
+    """
+    formato = request.args.get('formato', 'csv')
+    if nombre not in exportacion.EXPORTACIONES or formato not in exportacion.FORMATOS:
+        return jsonify({'error': 'Exportación o formato no válido.'}), 404
+    try:
+        consulta, parametros = exportacion.construir_consulta(nombre, request.args)
+    except exportacion.FiltroInvalido as e:
+        return jsonify({'error': str(e)}), 400
+
+    # stream_with_context mantiene el contexto (y la conexión prestada del pool)
+    # vivo mientras se envía la respuesta. La exportación es lectura pura: va a una réplica si hay
+    cuerpo = exportacion.generar(mysql.lectura, consulta, parametros, formato)
+    respuesta = Response(stream_with_context(cuerpo), content_type=exportacion.FORMATOS[formato])
+    respuesta.headers['Content-Disposition'] = f'attachment; filename="{nombre}.{formato}"'
+    respuesta.headers['X-Accel-Buffering'] = 'no'  # Que un proxy nginx no acumule la respuesta
+    return respuesta
+
+
+# --- Métricas en formato Prometheus (ver metricas.py) ---
+
+@metricas.agregar_fuente
+def metricas_pool_y_cache():
+    """Estado actual del pool de MySQL y de la caché de páginas de este worker."""
+    pool = mysql.estado()
+    replicas = pool.get('replicas', {})
+    cache = cache_respuestas.lru.estadisticas()
+    return [
+        "# HELP app_mysql_pool_connections Conexiones del pool de MySQL (este worker).",
+        "# TYPE app_mysql_pool_connections gauge",
+        f'app_mysql_pool_connections{{servidor="principal",estado="abiertas"}} {pool["abiertas"]}',
+        f'app_mysql_pool_connections{{servidor="principal",estado="libres"}} {pool["libres"]}',
+    ] + [
+        f'app_mysql_pool_connections{{servidor="{nombre}",estado="{estado}"}} {replica[estado]}'
+        for nombre, replica in replicas.items() for estado in ('abiertas', 'libres')
+    ] + [
+        "# HELP app_mysql_replica_sana 1 si la réplica se está usando para lecturas.",
+        "# TYPE app_mysql_replica_sana gauge",
+    ] + [f'app_mysql_replica_sana{{servidor="{nombre}"}} {int(replica["sana"])}'
+         for nombre, replica in replicas.items()] + [
+        "# HELP app_cache_respuestas Contadores de la caché de páginas (este worker).",
+        "# TYPE app_cache_respuestas gauge",
+    ] + [f'app_cache_respuestas{{dato="{clave}"}} {valor}' for clave, valor in cache.items()]
+
+
+@metricas.agregar_fuente
+def metricas_cola_compras():
+    """Pedidos de la cola de compras por estado (la base es compartida por los workers)."""
+    if not cola_compras.activa:
+        return []
+    estadisticas = cola_compras.estadisticas()
+    return [
+        "# HELP app_cola_compras_pedidos Pedidos en la cola de compras por estado.",
+        "# TYPE app_cola_compras_pedidos gauge",
+    ] + [f'app_cola_compras_pedidos{{estado="{estado}"}} {total}'
+         for estado, total in estadisticas['pedidos'].items()]
+
+
+@metricas.agregar_fuente
+def metricas_admision():
+    """Cupos, esperas y rechazos del control de admisión (este worker)."""
+    estado = admision.estado()
+    return [
+        "# HELP app_admision_cupos Requests en curso y en espera por clase de ruta (este worker).",
+        "# TYPE app_admision_cupos gauge",
+    ] + [f'app_admision_cupos{{clase="{clase}",estado="{estado_cupo}"}} {datos[estado_cupo]}'
+         for clase, datos in estado['clases'].items() for estado_cupo in ('en_curso', 'en_espera')] + [
+        "# HELP app_admision_rechazos Requests rechazados por motivo (este worker, desde el arranque).",
+        "# TYPE app_admision_rechazos gauge",
+    ] + [f'app_admision_rechazos{{motivo="{motivo}",clase="{clase}"}} {datos["rechazadas_" + motivo]}'
+         for clase, datos in estado['clases'].items() for motivo in ('cola', 'espera')] + [
+        f'app_admision_rechazos{{motivo="tasa",clase="{nombre}"}} {datos["rechazadas"]}'
+        for nombre, datos in estado['tasas'].items()
+    ] + [f'app_admision_rechazos{{motivo="espera_proxy",clase=""}} {estado["rechazadas_espera_cola"]}']
+
+
+@metricas.agregar_fuente
+def metricas_eventos():
+    """Conexiones de stock en vivo y mensajes enviados (este worker)."""
+    if not app.config['EVENTOS_ACTIVOS']:
+        return []
+    estado = difusor.estado()
+    return [
+        "# HELP app_eventos_conexiones Conexiones Server-Sent Events abiertas (este worker).",
+        "# TYPE app_eventos_conexiones gauge",
+        f"app_eventos_conexiones {estado['conexiones']}",
+        "# HELP app_eventos_enviados Mensajes enviados a las conexiones en vivo (este worker).",
+        "# TYPE app_eventos_enviados counter",
+        f"app_eventos_enviados {estado['enviados']}",
+        "# HELP app_eventos_rechazadas Conexiones rechazadas por EVENTOS_MAX_CONEXIONES (este worker).",
+        "# TYPE app_eventos_rechazadas counter",
+        f"app_eventos_rechazadas {estado['rechazadas']}",
+    ]
+
+
+def _autorizado_monitoreo():
+    # El scraper se autentica con METRICAS_TOKEN; sin token, se exige sesión iniciada
+    token = app.config['METRICAS_TOKEN']
+    autorizacion = request.headers.get('Authorization', '')
+    return bool(token and hmac.compare_digest(autorizacion, f"Bearer {token}")) or current_user.is_authenticated
+
+
+@app.route('/metrics')
+def metrics():
+    if not _autorizado_monitoreo():
+        return Response("No autorizado\n", 401, {'WWW-Authenticate': 'Bearer'}, content_type='text/plain')
+    return Response(metricas.texto(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.route('/admision')
+def admision_estado():
+    """Estado del control de admisión de este worker (cupos, esperas, rechazos)."""
+    if not _autorizado_monitoreo():
+        return Response("No autorizado\n", 401, {'WWW-Authenticate': 'Bearer'}, content_type='text/plain')
+    return jsonify(dict(admision.estado(), pid=os.getpid()))
+
+
+# --- Salud: nunca se limitan ni se rechazan (ADMISION_EXENTOS) ---
+
+@app.route('/salud')
+def salud():
+    """El proceso responde (liveness). No toca la base de datos."""
+    return jsonify({'ok': True})
+
+
+@app.route('/salud/lista')
+def salud_lista():
+    """El worker puede atender (readiness): la base principal responde."""
+    try:
+        cur = mysql.connection.cursor()
+        try:
+            cur.execute("SELECT 1")
+        finally:
+            cur.close()
+    except Exception as e:
+        app.logger.warning(f"Salud: la base de datos no responde: {e}")
+        return jsonify({'ok': False, 'mysql': False}), 503
+    return jsonify({'ok': True, 'mysql': True})
+
+
+# --- Stock en vivo: purga de eventos viejos (ver en_vivo.py) ---
+
+@app.cli.command('purgar-eventos')
+def purgar_eventos_comando():
+    """Borra los eventos de productos más viejos que EVENTOS_RETENCION (para cron)."""
+    borrados = purgar_eventos(mysql.connection, app.config['EVENTOS_RETENCION'])
+    click.echo(f"{borrados} eventos borrados.")
+
+
+# --- Estáticos: construcción de los archivos con huella (ver activos.py) ---
+
+@app.cli.command('construir-activos')
+def construir_activos_comando():
+    """Genera static/dist/ (archivos con huella, .gz/.br, variantes WebP y manifest.json)."""
+    construir_y_mostrar(app, click.echo)
+
+
+# --- Cola de compras: procesador en un proceso aparte (ver cola_compras.py) ---
+
+@app.cli.command('procesar-cola-compras')
+def procesar_cola_compras_comando():
+    """Aplica los pedidos de la cola en lotes hasta que se detenga el proceso (Ctrl+C)."""
+    if not cola_compras.activa:
+        raise click.ClickException("La cola de compras no está activa (COLA_COMPRAS_ACTIVA).")
+    click.echo("Esperando el candado de la cola (otro procesador puede tenerlo)...")
+    cola_compras.procesar_siempre()
+
+
+# --- Migraciones del esquema y asesor de índices (ver esquema.py y asesor_indices.py) ---
+
+@app.cli.command('migrar')
+@click.option('--hasta', type=int, default=None, help='Aplicar solo hasta esta versión.')
+@click.option('--simular', is_flag=True, help='Mostrar las migraciones pendientes sin aplicarlas.')
+def migrar_comando(hasta, simular):
+    """Aplica en orden las migraciones pendientes de migraciones/."""
+    try:
+        versiones = esquema.migrar(mysql.connection, hasta=hasta, simular=simular, echo=click.echo)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    if not versiones:
+        click.echo("El esquema está al día.")
+    elif simular:
+        click.echo(f"{len(versiones)} migraciones pendientes (no se aplicó ninguna).")
+    else:
+        # Una migración puede cambiar datos: las páginas cacheadas se invalidan
+        cache_respuestas.tocar('productos', 'clientes', 'compras')
+        click.echo(f"{len(versiones)} migraciones aplicadas.")
+
+
+@app.cli.command('estado-migraciones')
+def estado_migraciones_comando():
+    """Lista las migraciones aplicadas, pendientes y modificadas."""
+    for version, nombre, situacion in esquema.estado(mysql.connection):
+        click.echo(f"{version:04d}_{nombre}: {situacion}")
+
+
+@app.cli.command('asesor-indices')
+@click.option('--muestras', type=click.Path(exists=True, dir_okay=False),
+              help='Archivo de METRICAS_MUESTRAS_SQL de una corrida de la app (sin él se recorren las páginas).')
+@click.option('--min-filas', type=int, default=1000, show_default=True,
+              help='Filas estimadas desde las que un recorrido completo o un filesort cuenta como hallazgo.')
+def asesor_indices_comando(muestras, min_filas):
+    """EXPLAIN de las sentencias que ejecuta la app; termina con código 1 si alguna recorre tablas enteras."""
+    if not app.config['METRICAS_ACTIVAS']:
+        raise click.ClickException("El asesor toma las sentencias de metricas.py: METRICAS_ACTIVAS debe ser True.")
+    temporal = None
+    if muestras is None:
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as archivo:
+            temporal = muestras = archivo.name
+    try:
+        if temporal:
+            try:
+                codigos = asesor_indices.recorrer(app, mysql.connection, temporal)
+            except RuntimeError as e:
+                raise click.ClickException(str(e))
+            for url, codigo in codigos.items():
+                if codigo >= 400:
+                    click.echo(f"Aviso: {url} respondió {codigo}; sus sentencias pueden faltar.")
+        informe = asesor_indices.analizar(mysql.connection, asesor_indices.leer_muestras(muestras), min_filas)
+    finally:
+        if temporal:
+            os.remove(temporal)
+
+    problemas = 0
+    for entrada in informe:
+        if entrada['error']:
+            click.echo(f"? {entrada['endpoint']}: {entrada['sql']}\n    no se pudo explicar: {entrada['error']}")
+        elif entrada['hallazgos'] and entrada['aceptada']:
+            click.echo(f"~ {entrada['endpoint']}: {entrada['sql']}\n    aceptada: {entrada['aceptada']}")
+        elif entrada['hallazgos']:
+            problemas += 1
+            click.echo(f"X {entrada['endpoint']}: {entrada['sql']}")
+            for hallazgo in entrada['hallazgos']:
+                click.echo(f"    - {hallazgo}")
+    click.echo(f"{len(informe)} sentencias analizadas, {problemas} con recorridos completos o filesort.")
+    if problemas:
+        click.get_current_context().exit(1)
+
+
 # --- Rutas antiguas que ya no se usan (comentadas) ---
 # @app.route('/profile')
 # @login_required
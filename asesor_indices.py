@@ -0,0 +1,199 @@
+"""
+Asesor de índices: EXPLAIN de las sentencias que la app ejecuta de verdad.
+
+Las sentencias salen del archivo de muestras de metricas.py
+(METRICAS_MUESTRAS_SQL): cada proceso anota la primera ejecución de cada
+sentencia con sus parámetros reales. El archivo se llena de dos formas:
+  - 'flask asesor-indices' sin --muestras visita con el cliente de pruebas las
+    páginas y búsquedas de RECORRIDO (solo lecturas: no modifica la base);
+  - corriendo la app con METRICAS_MUESTRAS_SQL mientras benchmarks/carga.py
+    (u otro tráfico) ejercita también compras, ediciones y borrados, y luego
+    'flask asesor-indices --muestras <archivo>'.
+
+Cada muestra se pasa por EXPLAIN y se marcan los recorridos completos de tabla
+(type ALL) o de índice (type index), los ordenamientos sin índice (Using
+filesort) y las tablas temporales, sobre tablas con al menos 'min_filas' filas
+estimadas. El plan depende de las estadísticas, así que hay que correrlo contra
+una base con datos (benchmarks/datos.py --escala 100k): con tablas pequeñas
+MySQL prefiere recorrerlas enteras y el resultado no dice nada.
+
+Los recorridos que son a propósito (exportaciones completas, búsqueda por
+subcadena, reconstrucción de resúmenes) están en ACEPTADAS; cualquier otro
+hallazgo hace que el comando termine con código 1, para usarlo antes de desplegar.
+"""
+import itertools
+import json
+import re
+import urllib.parse
+
+import MySQLdb
+
+from exportacion import EXPORTACIONES, construir_consulta
+from metricas import normalizar_sql
+
+# Páginas que se visitan para tomar muestras (los {valores} salen de _valores_recorrido)
+RECORRIDO = (
+    '/productos',
+    '/clientes',
+    '/compras/{id_cliente}',
+    '/registrar_compra/{id_cliente}',
+    '/editar/{id_producto}',
+    '/editar_cliente/{id_cliente}',
+    '/api/buscar/clientes?q={prefijo_cliente}',
+    '/api/buscar/clientes?q={email_cliente}',       # Un solo resultado: también busca por subcadena
+    '/api/buscar/productos?q={prefijo_producto}',
+    '/api/buscar/productos?q={nombre_producto}&con_stock=0',
+    '/reportes',
+    '/exportar/compras?id_cliente={id_cliente}',
+    '/api/v1/productos?ids={id_producto}&campos=stock',
+    '/api/v1/compras?id_cliente={id_cliente}&campos=cantidad,nombre_producto',
+)
+
+EXPLICABLES = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE', '(')
+
+# Filtros de exportacion.construir_consulta, con un valor válido de ejemplo
+_FILTROS_EXPORTACION = {'despues_id': '1', 'hasta_id': '1', 'desde': '2000-01-01',
+                        'hasta': '2000-01-01', 'id_cliente': '1'}
+
+
+def _patron_exportaciones():
+    """
+    Texto normalizado exacto de cada consulta que puede armar exportacion.py
+    (cada exportación con cada combinación de filtros), y nada más.
+    """
+    textos = set()
+    for nombre in EXPORTACIONES:
+        for cantidad in range(len(_FILTROS_EXPORTACION) + 1):
+            for filtros in itertools.combinations(_FILTROS_EXPORTACION, cantidad):
+                consulta, _ = construir_consulta(nombre, {f: _FILTROS_EXPORTACION[f] for f in filtros})
+                textos.add(normalizar_sql(consulta))
+    return re.compile("^(?:" + "|".join(map(re.escape, sorted(textos))) + ")$")
+
+
+# Sentencias (texto normalizado) cuyo recorrido completo es el esperado
+ACEPTADAS = (
+    (re.compile(r"FROM clientes WHERE nombre LIKE \? OR email LIKE \? LIMIT \?$"),
+     "Búsqueda por subcadena (busqueda.py): recorre a propósito, cortada por LIMIT."),
+    (re.compile(r"FROM productos WHERE nombre LIKE \?( AND stock > \?)? LIMIT \?$"),
+     "Búsqueda por subcadena (busqueda.py): recorre a propósito, cortada por LIMIT."),
+    (_patron_exportaciones(),
+     "Exportación completa en streaming (exportacion.py), en orden de clave primaria."),
+    (re.compile(r"^INSERT INTO ventas_\w+ .* FROM compras co JOIN productos p .* GROUP BY "),
+     "Reconstrucción de los resúmenes desde el libro completo (flask reconstruir-resumenes)."),
+)
+
+
+def _valores_recorrido(conexion):
+    """Ids y textos de búsqueda reales para completar RECORRIDO, y el usuario de la sesión."""
+    cur = conexion.cursor()
+    try:
+        cur.execute("SELECT id, version_sesion FROM users ORDER BY id LIMIT 1")
+        usuario = cur.fetchone()
+        cur.execute("SELECT id_cliente, nombre, email FROM clientes ORDER BY id_cliente LIMIT 1")
+        cliente = cur.fetchone()
+        cur.execute("SELECT id_producto, nombre FROM productos ORDER BY id_producto LIMIT 1")
+        producto = cur.fetchone()
+    finally:
+        cur.close()
+    if usuario is None or cliente is None or producto is None:
+        raise RuntimeError("La base no tiene usuarios, clientes o productos: "
+                           "cargar datos con benchmarks/datos.py antes de usar el asesor.")
+    citar = urllib.parse.quote
+    return {
+        '_user_id': f"{usuario['id']}:{usuario['version_sesion']}",
+        'id_cliente': cliente['id_cliente'],
+        'id_producto': producto['id_producto'],
+        'prefijo_cliente': citar(cliente['nombre'][:3]),
+        'email_cliente': citar(cliente['email']),
+        'prefijo_producto': citar(producto['nombre'][:3]),
+        'nombre_producto': citar(producto['nombre']),
+    }
+
+
+def recorrer(app, conexion, ruta_muestras):
+    """
+    Visita RECORRIDO con el cliente de pruebas de Flask, con sesión iniciada,
+    mientras las sentencias se anotan en 'ruta_muestras'. Devuelve {url: código}.
+    """
+    valores = _valores_recorrido(conexion)
+    anterior = app.config['METRICAS_MUESTRAS_SQL']
+    app.config['METRICAS_MUESTRAS_SQL'] = ruta_muestras
+    codigos = {}
+    try:
+        cliente = app.test_client()
+        with cliente.session_transaction() as sesion:
+            sesion['_user_id'] = valores['_user_id']
+            sesion['_fresh'] = True
+        for plantilla in RECORRIDO:
+            url = plantilla.format(**valores)
+            respuesta = cliente.get(url)
+            respuesta.get_data()  # Consume las respuestas en streaming: sus consultas corren aquí
+            respuesta.close()
+            codigos[url] = respuesta.status_code
+    finally:
+        app.config['METRICAS_MUESTRAS_SQL'] = anterior
+    return codigos
+
+
+def leer_muestras(ruta):
+    """Muestras del archivo, una por sentencia normalizada (la primera que aparece)."""
+    muestras = {}
+    with open(ruta, encoding='utf-8') as archivo:
+        for linea in archivo:
+            if not linea.strip():
+                continue
+            muestra = json.loads(linea)
+            muestras.setdefault(normalizar_sql(muestra['sql']), muestra)
+    return muestras
+
+
+def explicar(conexion, sql, args):
+    """Filas de EXPLAIN de la sentencia (EXPLAIN no la ejecuta, tampoco si es una escritura)."""
+    cur = conexion.cursor()
+    try:
+        cur.execute("EXPLAIN " + sql, args)
+        return cur.fetchall()
+    finally:
+        cur.close()
+
+
+def diagnosticar(plan, min_filas):
+    """Problemas del plan en tablas con al menos 'min_filas' filas estimadas."""
+    hallazgos = []
+    for fila in plan:
+        tabla = fila.get('table') or ''
+        filas = fila.get('rows') or 0
+        if tabla.startswith('<') or filas < min_filas:
+            # <union1,2>, <derived2>: resultados intermedios ya acotados por la consulta
+            continue
+        extra = fila.get('Extra') or ''
+        if fila.get('type') == 'ALL':
+            hallazgos.append(f"recorre toda la tabla {tabla} (~{filas} filas)")
+        elif fila.get('type') == 'index':
+            hallazgos.append(f"recorre todo el índice {fila.get('key')} de {tabla} (~{filas} filas)")
+        if 'Using filesort' in extra:
+            hallazgos.append(f"ordena {tabla} sin índice (filesort, ~{filas} filas)")
+        if 'Using temporary' in extra:
+            hallazgos.append(f"usa una tabla temporal para {tabla} (~{filas} filas)")
+    return hallazgos
+
+
+def analizar(conexion, muestras, min_filas=1000):
+    """
+    EXPLAIN de cada muestra ({texto normalizado: muestra}). Devuelve una lista de
+    dicts {'sql', 'endpoint', 'hallazgos', 'aceptada', 'error'}, una por sentencia.
+    """
+    informe = []
+    for texto, muestra in sorted(muestras.items()):
+        if not texto.lstrip().upper().startswith(EXPLICABLES):
+            continue
+        entrada = {'sql': texto, 'endpoint': muestra.get('endpoint'), 'hallazgos': [],
+                   'aceptada': None, 'error': None}
+        try:
+            entrada['hallazgos'] = diagnosticar(explicar(conexion, muestra['sql'], muestra.get('args')), min_filas)
+        except MySQLdb.MySQLError as e:
+            entrada['error'] = str(e)
+        if entrada['hallazgos']:
+            entrada['aceptada'] = next((motivo for patron, motivo in ACEPTADAS if patron.search(texto)), None)
+        informe.append(entrada)
+    return informe
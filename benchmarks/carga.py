@@ -0,0 +1,261 @@
+"""
+Prueba de carga con escenarios de uso contra una instancia local de la app.
+
+Uso:
+    python benchmarks/datos.py --escala 100k            # una vez, con la misma escala
+    flask --app app construir-activos                   # estáticos con huella, como en producción
+    FLASK_ADMISION_ACTIVA=false gunicorn app:app -b 127.0.0.1:8000   # en otra terminal
+    python benchmarks/carga.py --escala 100k [--url http://127.0.0.1:8000]
+                               [--virtuales 10] [--segundos 60] [--calentamiento 5]
+                               [--semilla 42] [--salida benchmarks/resultados/x.json]
+
+Cada usuario virtual es un hilo con su propia sesión (usuario bench_NNNN de
+datos.py) que elige escenarios al azar según PESOS:
+
+    login      POST /login (después de GET /logout)
+    productos  GET /productos
+    editar     GET y POST /editar/<id>
+    comprar    POST /checkout (JSON, 1 a 3 productos)
+    historial  GET /compras/<id>
+
+Cada request se mide por separado (sin seguir redirecciones). Al terminar se
+imprime y se guarda en JSON, por ruta: requests, errores, códigos de estado,
+requests/s y latencia p50/p95/p99 en milisegundos, junto con el commit de git,
+para comparar dos corridas con benchmarks/comparar.py. Los requests del período
+de calentamiento no se cuentan.
+
+Todos los usuarios virtuales salen de la misma IP: con el control de admisión
+activo (admision.py), las cubetas por IP y de login la limitan como a un solo
+cliente y la corrida mide sobre todo rechazos. Para medir la app se arranca con
+FLASK_ADMISION_ACTIVA=false; para medir la admisión misma, se deja activa. En
+ambos casos los 429/503 se cuentan aparte ('rechazados', no 'errores') y el
+login se reintenta con espera creciente cuando lo rechazan.
+
+El cliente es Python con hilos: con muchos usuarios virtuales puede ser él el
+cuello de botella; conviene correrlo en otra máquina o con menos virtuales.
+"""
+import argparse
+import http.cookiejar
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from datos import ESCALAS, CONTRASENA, nombre_usuario, nombre_producto
+
+PESOS = {'login': 5, 'productos': 40, 'editar': 15, 'comprar': 20, 'historial': 20}
+TIMEOUT = 30
+RECHAZOS = ('429', '503')   # Control de admisión: no son errores de la app
+INTENTOS_LOGIN = 6
+
+
+class _SinRedirecciones(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None  # La redirección se mide como un request aparte (o no se sigue)
+
+
+class UsuarioVirtual:
+    def __init__(self, numero, url, n_filas, azar, registrar):
+        self.numero = numero
+        self.url = url.rstrip('/')
+        self.n_filas = n_filas
+        self.azar = azar
+        self.registrar = registrar
+        self.cliente = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _SinRedirecciones())
+
+    def pedir(self, ruta, metodo, camino, datos=None, json_datos=None):
+        cabeceras = {}
+        cuerpo = None
+        if json_datos is not None:
+            cuerpo = json.dumps(json_datos).encode('utf-8')
+            cabeceras['Content-Type'] = 'application/json'
+        elif datos is not None:
+            cuerpo = urllib.parse.urlencode(datos).encode('utf-8')
+        peticion = urllib.request.Request(self.url + camino, data=cuerpo, headers=cabeceras, method=metodo)
+        inicio = time.perf_counter()
+        try:
+            with self.cliente.open(peticion, timeout=TIMEOUT) as respuesta:
+                respuesta.read()
+                codigo = respuesta.status
+                destino = respuesta.headers.get('Location', '')
+        except urllib.error.HTTPError as e:
+            e.read()
+            codigo = e.code
+            destino = e.headers.get('Location', '')
+        except OSError:
+            codigo = 0  # Conexión rechazada, timeout, ...
+            destino = ''
+        self.registrar(f"{metodo} {ruta}", time.perf_counter() - inicio, codigo)
+        return codigo, destino
+
+    # --- Escenarios ---
+
+    def login(self):
+        for intento in range(INTENTOS_LOGIN):
+            self.pedir('/logout', 'GET', '/logout')
+            codigo, destino = self.pedir('/login', 'POST', '/login',
+                                         datos={'username': nombre_usuario(self.numero), 'password': CONTRASENA})
+            if str(codigo) not in RECHAZOS:
+                return codigo == 302 and '/login' not in destino
+            # Rechazado por la admisión: se espera cada vez más (con azar, para no volver todos juntos)
+            time.sleep(min(2 ** intento, 30) * (0.5 + self.azar.random()))
+        return False
+
+    def productos(self):
+        self.pedir('/productos', 'GET', '/productos')
+
+    def editar(self):
+        id_producto = self.azar.randint(1, self.n_filas)
+        self.pedir('/editar/<id>', 'GET', f"/editar/{id_producto}")
+        self.pedir('/editar/<id>', 'POST', f"/editar/{id_producto}", datos={
+            'nombre': nombre_producto(id_producto),
+            'precio': f"{self.azar.uniform(1, 500):.2f}",
+            'stock': self.azar.randint(10_000, 1_000_000),
+        })
+
+    def comprar(self):
+        productos = self.azar.sample(range(1, self.n_filas + 1), min(self.azar.randint(1, 3), self.n_filas))
+        self.pedir('/checkout', 'POST', '/checkout', json_datos={
+            'id_cliente': self.azar.randint(1, self.n_filas),
+            'lineas': [{'id_producto': p, 'cantidad': self.azar.randint(1, 3)} for p in productos],
+        })
+
+    def historial(self):
+        self.pedir('/compras/<id>', 'GET', f"/compras/{self.azar.randint(1, self.n_filas)}")
+
+    def correr(self, hasta):
+        if not self.login():
+            raise RuntimeError(f"No se pudo iniciar sesión como {nombre_usuario(self.numero)}; "
+                               f"¿se generaron los datos con benchmarks/datos.py? (con la admisión "
+                               f"activa, arrancar la app con FLASK_ADMISION_ACTIVA=false)")
+        escenarios = list(PESOS)
+        pesos = list(PESOS.values())
+        while time.monotonic() < hasta:
+            getattr(self, self.azar.choices(escenarios, pesos)[0])()
+
+
+def percentil(ordenados, p):
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not ordenados:
+        return None
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+def resumir(muestras, duracion):
+    rutas = {}
+    for ruta, tiempos_codigos in sorted(muestras.items()):
+        tiempos = sorted(t * 1000 for t, _ in tiempos_codigos)
+        codigos = {}
+        for _, codigo in tiempos_codigos:
+            codigos[str(codigo)] = codigos.get(str(codigo), 0) + 1
+        rutas[ruta] = {
+            'requests': len(tiempos),
+            'errores': sum(n for codigo, n in codigos.items()
+                           if codigo not in RECHAZOS and (codigo == '0' or int(codigo) >= 400)),
+            'rechazados': sum(n for codigo, n in codigos.items() if codigo in RECHAZOS),
+            'codigos': codigos,
+            'rps': round(len(tiempos) / duracion, 2),
+            'p50_ms': round(percentil(tiempos, 50), 2),
+            'p95_ms': round(percentil(tiempos, 95), 2),
+            'p99_ms': round(percentil(tiempos, 99), 2),
+            'max_ms': round(tiempos[-1], 2),
+            'media_ms': round(sum(tiempos) / len(tiempos), 2),
+        }
+    total = sum(r['requests'] for r in rutas.values())
+    return {'requests': total, 'rps': round(total / duracion, 2),
+            'errores': sum(r['errores'] for r in rutas.values()),
+            'rechazados': sum(r['rechazados'] for r in rutas.values()), 'rutas': rutas}
+
+
+def commit_actual():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+        sucio = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return commit + ('-sucio' if sucio else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconocido'
+
+
+def imprimir(resumen):
+    print(f"{'ruta':<24}{'req':>8}{'err':>6}{'rech':>6}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}  (ms)")
+    for ruta, r in resumen['rutas'].items():
+        print(f"{ruta:<24}{r['requests']:>8}{r['errores']:>6}{r['rechazados']:>6}{r['rps']:>9.1f}"
+              f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}")
+    print(f"{'total':<24}{resumen['requests']:>8}{resumen['errores']:>6}{resumen['rechazados']:>6}"
+          f"{resumen['rps']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--escala', choices=ESCALAS, default='1k', help='La misma usada en datos.py')
+    parser.add_argument('--virtuales', type=int, default=10, help='Usuarios virtuales (hilos)')
+    parser.add_argument('--segundos', type=float, default=60.0)
+    parser.add_argument('--calentamiento', type=float, default=5.0, help='Segundos iniciales que no se cuentan')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--salida', help='Archivo JSON (por defecto benchmarks/resultados/<commit>-<escala>.json)')
+    args = parser.parse_args()
+
+    commit = commit_actual()
+    muestras = {}
+    lock = threading.Lock()
+    contar_desde = time.monotonic() + args.calentamiento
+    hasta = contar_desde + args.segundos
+
+    def registrar(ruta, duracion, codigo):
+        if time.monotonic() < contar_desde:
+            return
+        with lock:
+            muestras.setdefault(ruta, []).append((duracion, codigo))
+
+    fallos = []
+
+    def correr(usuario):
+        try:
+            usuario.correr(hasta)
+        except Exception as e:
+            fallos.append(e)
+
+    # Una semilla derivada por usuario: la secuencia de cada uno no depende del orden de los hilos
+    usuarios = [UsuarioVirtual(i, args.url, ESCALAS[args.escala], random.Random(f"{args.semilla}-{i}"), registrar)
+                for i in range(1, args.virtuales + 1)]
+    hilos = [threading.Thread(target=correr, args=(u,), daemon=True) for u in usuarios]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    if fallos:
+        raise SystemExit(str(fallos[0]))
+
+    resumen = resumir(muestras, args.segundos)
+    imprimir(resumen)
+
+    resultado = {
+        'commit': commit,
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'parametros': {'url': args.url, 'escala': args.escala, 'virtuales': args.virtuales,
+                       'segundos': args.segundos, 'calentamiento': args.calentamiento,
+                       'semilla': args.semilla, 'pesos': PESOS},
+        'entorno': {'python': platform.python_version(), 'maquina': platform.node()},
+        **resumen,
+    }
+    salida = args.salida or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resultados',
+                                         f"{commit}-{args.escala}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as archivo:
+        json.dump(resultado, archivo, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {salida}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Compara dos resultados de benchmarks/carga.py (por ejemplo, de dos commits).
+
+Uso:
+    python benchmarks/comparar.py base.json nuevo.json [--umbral 10]
+
+Por cada ruta muestra requests/s y p50/p95/p99 de ambas corridas con el cambio
+en porcentaje, y marca REGRESIÓN si el p95 empeoró o los requests/s bajaron más
+de --umbral por ciento. Termina con código 1 si hubo alguna regresión, para
+poder usarlo en un script de CI.
+"""
+import argparse
+import json
+import sys
+
+
+def _cambio(antes, despues):
+    if not antes:
+        return None
+    return (despues - antes) / antes * 100
+
+
+def _formato(antes, despues):
+    cambio = _cambio(antes, despues)
+    texto = f"{antes:.1f} -> {despues:.1f}"
+    return texto + (f" ({cambio:+.0f}%)" if cambio is not None else "")
+
+
+def comparar(base, nuevo, umbral):
+    regresiones = []
+    print(f"base:  {base['commit']} ({base['parametros']['escala']}, {base['parametros']['virtuales']} virtuales)")
+    print(f"nuevo: {nuevo['commit']} ({nuevo['parametros']['escala']}, {nuevo['parametros']['virtuales']} virtuales)")
+    if base['parametros'] != nuevo['parametros']:
+        print("Aviso: las corridas usaron parámetros distintos; la comparación puede no ser válida.")
+
+    for ruta in sorted(set(base['rutas']) | set(nuevo['rutas'])):
+        a = base['rutas'].get(ruta)
+        b = nuevo['rutas'].get(ruta)
+        if a is None or b is None:
+            print(f"\n{ruta}: solo en {'nuevo' if a is None else 'base'}")
+            continue
+        marcas = []
+        cambio_p95 = _cambio(a['p95_ms'], b['p95_ms'])
+        cambio_rps = _cambio(a['rps'], b['rps'])
+        if cambio_p95 is not None and cambio_p95 > umbral:
+            marcas.append('p95')
+        if cambio_rps is not None and cambio_rps < -umbral:
+            marcas.append('req/s')
+        if b['errores'] > a['errores']:
+            marcas.append('errores')
+        if marcas:
+            regresiones.append(ruta)
+        print(f"\n{ruta}{'  <- REGRESIÓN (' + ', '.join(marcas) + ')' if marcas else ''}")
+        print(f"  req/s  {_formato(a['rps'], b['rps'])}")
+        for p in ('p50_ms', 'p95_ms', 'p99_ms'):
+            print(f"  {p[:3]:<6} {_formato(a[p], b[p])} ms")
+        print(f"  errores {a['errores']} -> {b['errores']}")
+        if a.get('rechazados') or b.get('rechazados'):
+            # Corridas con la admisión activa (429/503); las anteriores no los separaban
+            print(f"  rechazados {a.get('rechazados', 0)} -> {b.get('rechazados', 0)}")
+
+    print(f"\ntotal req/s {_formato(base['rps'], nuevo['rps'])}")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('base')
+    parser.add_argument('nuevo')
+    parser.add_argument('--umbral', type=float, default=10.0, help='Porcentaje tolerado antes de marcar regresión')
+    args = parser.parse_args()
+
+    with open(args.base, encoding='utf-8') as archivo:
+        base = json.load(archivo)
+    with open(args.nuevo, encoding='utf-8') as archivo:
+        nuevo = json.load(archivo)
+    regresiones = comparar(base, nuevo, args.umbral)
+    if regresiones:
+        print(f"\n{len(regresiones)} ruta(s) con regresión: {', '.join(regresiones)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""
+Generador de datos sintéticos para los benchmarks.
+
+Uso:
+    python benchmarks/datos.py --escala 100k [--semilla 42] [--usuarios 50]
+                               [--host localhost] [--usuario root] [--password ''] [--db desarrollo_web]
+
+Vacía y vuelve a llenar users, productos, clientes, clientes_productos y compras
+(el esquema de 'flask migrar'), y recalcula los resúmenes
+de ventas, con datos reproducibles: la
+misma semilla y la misma escala producen exactamente las mismas filas, con ids
+consecutivos desde 1, para que benchmarks/carga.py pueda elegir ids válidos sin
+consultar la base. ¡Borra los datos existentes! Usar solo en una base de pruebas.
+
+Escalas (filas de productos y de clientes; las compras son el doble):
+    1k, 100k, 1m
+
+Los usuarios se llaman bench_0001, bench_0002, ... y todos tienen la contraseña
+CONTRASENA (ver abajo).
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+ESCALAS = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+CONTRASENA = 'bench-contraseña'
+COMPRAS_POR_CLIENTE = 2
+TAM_LOTE = 5000
+FECHA_BASE = datetime.datetime(2025, 1, 1)  # Fechas fijas: los datos no dependen del día en que se generan
+
+_PALABRAS = ('Teclado', 'Mouse', 'Monitor', 'Cable', 'Disco', 'Memoria', 'Silla', 'Lámpara',
+             'Cuaderno', 'Mochila', 'Parlante', 'Cargador', 'Router', 'Cámara', 'Batería')
+_NOMBRES = ('Ana', 'Luis', 'María', 'José', 'Carmen', 'Jorge', 'Lucía', 'Pedro', 'Sofía', 'Diego')
+_APELLIDOS = ('García', 'Pérez', 'López', 'Torres', 'Ramírez', 'Flores', 'Rojas', 'Vargas')
+
+
+def nombre_usuario(i):
+    return f"bench_{i:04d}"
+
+
+def nombre_producto(i):
+    # Único por id (clave natural uq_productos_nombre); carga.py lo reutiliza al editar
+    return f"{_PALABRAS[i % len(_PALABRAS)]} {i:07d}"
+
+
+def conectar(args):
+    import MySQLdb  # Aquí y no arriba: carga.py importa este módulo sin necesitar MySQL
+    return MySQLdb.connect(host=args.host, user=args.usuario, passwd=args.password, db=args.db,
+                           port=args.puerto, charset='utf8mb4')
+
+
+def _insertar(cur, sql, filas):
+    for i in range(0, len(filas), TAM_LOTE):
+        cur.executemany(sql, filas[i:i + TAM_LOTE])
+
+
+def _por_bloques(n, generar):
+    """Genera filas en bloques para no tener 1M de tuplas en memoria a la vez."""
+    for inicio in range(1, n + 1, TAM_LOTE * 10):
+        yield [generar(i) for i in range(inicio, min(inicio + TAM_LOTE * 10, n + 1))]
+
+
+def generar(conexion, escala, semilla, usuarios, metodo):
+    n = ESCALAS[escala]
+    azar = random.Random(semilla)
+    cur = conexion.cursor()
+
+    cur.execute("SET FOREIGN_KEY_CHECKS = 0")
+    for tabla in ('eventos_productos', 'pedidos_aplicados', 'ventas_dia', 'ventas_cliente', 'ventas_producto',
+                  'compras', 'clientes_productos', 'clientes', 'productos', 'users'):
+        cur.execute(f"TRUNCATE TABLE {tabla}")
+    cur.execute("SET FOREIGN_KEY_CHECKS = 1")
+
+    # Un solo hash para todos: generar miles con el costo de werkzeug tardaría minutos
+    hash_guardado = generate_password_hash(CONTRASENA, metodo)
+    _insertar(cur, "INSERT INTO users (id, username, password) VALUES (%s, %s, %s)",
+              [(i, nombre_usuario(i), hash_guardado) for i in range(1, usuarios + 1)])
+
+    precios = [None]  # precios[id_producto], para el precio_unitario del libro de compras
+
+    def producto(i):
+        precios.append(round(azar.uniform(1, 500), 2))
+        return (i, nombre_producto(i), precios[i], azar.randint(10_000, 1_000_000))
+
+    for bloque in _por_bloques(n, producto):
+        _insertar(cur, "INSERT INTO productos (id_producto, nombre, precio, stock) VALUES (%s, %s, %s, %s)", bloque)
+    conexion.commit()
+
+    def cliente(i):
+        nombre = f"{azar.choice(_NOMBRES)} {azar.choice(_APELLIDOS)}"
+        return (i, nombre, f"cliente{i}@ejemplo.com", f"9{azar.randint(10_000_000, 99_999_999)}")
+
+    for bloque in _por_bloques(n, cliente):
+        _insertar(cur, "INSERT INTO clientes (id_cliente, nombre, email, telefono) VALUES (%s, %s, %s, %s)", bloque)
+    conexion.commit()
+
+    # Cada cliente compra COMPRAS_POR_CLIENTE productos distintos; el libro 'compras'
+    # y el acumulado 'clientes_productos' quedan consistentes entre sí
+    def compras_de(i):
+        productos = azar.sample(range(1, n + 1), min(COMPRAS_POR_CLIENTE, n))
+        return [(i, p, azar.randint(1, 5), FECHA_BASE - datetime.timedelta(seconds=azar.randint(0, 365 * 24 * 3600)))
+                for p in productos]
+
+    for bloque in _por_bloques(n, compras_de):
+        filas = [fila for compras in bloque for fila in compras]
+        _insertar(cur, "INSERT INTO compras (id_cliente, id_producto, cantidad, precio_unitario, fecha_compra) "
+                       "VALUES (%s, %s, %s, %s, %s)",
+                  [(c, p, cant, precios[p], fecha) for c, p, cant, fecha in filas])
+        _insertar(cur, "INSERT INTO clientes_productos (id_cliente, id_producto, cantidad, fecha_compra) "
+                       "VALUES (%s, %s, %s, %s)", filas)
+        conexion.commit()
+
+    # Resúmenes del tablero /reportes a partir del libro recién cargado
+    from resumenes import reconstruir  # Necesita MySQLdb: no se importa arriba (ver conectar)
+    reconstruir(conexion)
+
+    # Invalidar las páginas cacheadas de una app que ya estuviera corriendo
+    cur.execute("UPDATE versiones_tabla SET version = version + 1")
+    conexion.commit()
+    cur.close()
+    return {'usuarios': usuarios, 'productos': n, 'clientes': n, 'compras': n * min(COMPRAS_POR_CLIENTE, n)}
+
+
+def agregar_argumentos_conexion(parser):
+    parser.add_argument('--host', default=os.environ.get('MYSQL_HOST', 'localhost'))
+    parser.add_argument('--puerto', type=int, default=int(os.environ.get('MYSQL_PORT', 3306)))
+    parser.add_argument('--usuario', default=os.environ.get('MYSQL_USER', 'root'))
+    parser.add_argument('--password', default=os.environ.get('MYSQL_PASSWORD', ''))
+    parser.add_argument('--db', default=os.environ.get('MYSQL_DB', 'desarrollo_web'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--escala', choices=ESCALAS, default='1k')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--usuarios', type=int, default=50, help='Usuarios bench_NNNN (uno por usuario virtual)')
+    parser.add_argument('--metodo', default='pbkdf2:sha256', help='Igual que HASH_METODO en app.py')
+    agregar_argumentos_conexion(parser)
+    args = parser.parse_args()
+
+    conexion = conectar(args)
+    inicio = time.perf_counter()
+    try:
+        totales = generar(conexion, args.escala, args.semilla, args.usuarios, args.metodo)
+    finally:
+        conexion.close()
+    print(f"Escala {args.escala}, semilla {args.semilla}: "
+          + ", ".join(f"{n} {tabla}" for tabla, n in totales.items())
+          + f" en {time.perf_counter() - inicio:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
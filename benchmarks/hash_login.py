@@ -0,0 +1,55 @@
+"""
+Benchmark del hash de contraseñas: logins (verificaciones) por segundo y por núcleo.
+
+Uso:
+    python benchmarks/hash_login.py [--metodo pbkdf2:sha256] [--segundos 5] [--procesos N]
+
+Mide primero la verificación en un solo proceso (logins/s por núcleo) y luego
+con un pool de N procesos como el de contrasenas.py (logins/s totales), para
+dimensionar HASH_METODO, HASH_PROCESOS y el número de workers.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from werkzeug.security import generate_password_hash, check_password_hash  # noqa: E402
+
+
+def _verificar_durante(hash_guardado, segundos):
+    fin = time.perf_counter() + segundos
+    n = 0
+    while time.perf_counter() < fin:
+        check_password_hash(hash_guardado, 'contraseña-de-prueba')
+        n += 1
+    return n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--metodo', default='pbkdf2:sha256')
+    parser.add_argument('--segundos', type=float, default=5.0)
+    parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    hash_guardado = generate_password_hash('contraseña-de-prueba', args.metodo)
+    print(f"Método: {hash_guardado.split('$', 1)[0]}")
+
+    n = _verificar_durante(hash_guardado, args.segundos)
+    por_nucleo = n / args.segundos
+    print(f"1 proceso: {por_nucleo:.1f} logins/s por núcleo ({1000 / por_nucleo:.1f} ms por verificación)")
+
+    with ProcessPoolExecutor(max_workers=args.procesos) as executor:
+        inicio = time.perf_counter()
+        total = sum(executor.map(_verificar_durante, [hash_guardado] * args.procesos,
+                                 [args.segundos] * args.procesos))
+        duracion = time.perf_counter() - inicio
+    print(f"{args.procesos} procesos: {total / duracion:.1f} logins/s en total "
+          f"({total / duracion / args.procesos:.1f} por núcleo)")
+
+
+if __name__ == '__main__':
+    main()
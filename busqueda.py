@@ -0,0 +1,76 @@
+"""
+Búsqueda para el autocompletado (typeahead) del formulario de compra.
+
+Primero se busca por prefijo (LIKE 'texto%'), que MySQL resuelve como un rango
+sobre el índice de nombre (o de email para clientes). Solo si el prefijo no
+llena el límite y el texto tiene al menos MIN_SUBCADENA caracteres se completa
+con una búsqueda por subcadena (LIKE '%texto%'), que ya no usa el índice pero
+se corta en cuanto encuentra suficientes filas.
+"""
+LIMITE_DEFECTO = 10
+LIMITE_MAXIMO = 50
+MIN_SUBCADENA = 3
+
+
+def escapar_like(texto):
+    """Escapa los comodines de LIKE para que se busquen literalmente."""
+    return texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def leer_limite(args):
+    try:
+        limite = int(args.get('limite', LIMITE_DEFECTO))
+    except (TypeError, ValueError):
+        limite = LIMITE_DEFECTO
+    return max(1, min(limite, LIMITE_MAXIMO))
+
+
+def _completar(cur, consulta, parametros, encontrados, clave, limite):
+    """Ejecuta 'consulta' y agrega las filas que aún no estén en 'encontrados'."""
+    cur.execute(consulta, parametros)
+    for fila in cur.fetchall():
+        if len(encontrados) >= limite:
+            break
+        encontrados.setdefault(fila[clave], fila)
+
+
+def buscar_clientes(cur, texto, limite):
+    texto = texto.strip()
+    if not texto:
+        return []
+    prefijo = escapar_like(texto) + '%'
+    encontrados = {}
+    # Dos rangos por índice (nombre y email) unidos; cada uno acotado por el límite
+    _completar(cur, """
+        (SELECT id_cliente, nombre, email FROM clientes WHERE nombre LIKE %s ORDER BY nombre LIMIT %s)
+        UNION
+        (SELECT id_cliente, nombre, email FROM clientes WHERE email LIKE %s ORDER BY email LIMIT %s)
+        ORDER BY nombre LIMIT %s
+    """, (prefijo, limite, prefijo, limite, limite), encontrados, 'id_cliente', limite)
+
+    if len(encontrados) < limite and len(texto) >= MIN_SUBCADENA:
+        subcadena = '%' + escapar_like(texto) + '%'
+        _completar(cur, """
+            SELECT id_cliente, nombre, email FROM clientes
+            WHERE nombre LIKE %s OR email LIKE %s LIMIT %s
+        """, (subcadena, subcadena, limite), encontrados, 'id_cliente', limite)
+    return list(encontrados.values())
+
+
+def buscar_productos(cur, texto, limite, solo_con_stock=True):
+    texto = texto.strip()
+    if not texto:
+        return []
+    filtro_stock = " AND stock > 0" if solo_con_stock else ""
+    encontrados = {}
+    _completar(cur, f"""
+        SELECT id_producto, nombre, precio, stock FROM productos
+        WHERE nombre LIKE %s{filtro_stock} ORDER BY nombre LIMIT %s
+    """, (escapar_like(texto) + '%', limite), encontrados, 'id_producto', limite)
+
+    if len(encontrados) < limite and len(texto) >= MIN_SUBCADENA:
+        _completar(cur, f"""
+            SELECT id_producto, nombre, precio, stock FROM productos
+            WHERE nombre LIKE %s{filtro_stock} LIMIT %s
+        """, ('%' + escapar_like(texto) + '%', limite), encontrados, 'id_producto', limite)
+    return list(encontrados.values())
@@ -0,0 +1,207 @@
+"""
+Caché de páginas renderizadas con ETag y respuestas 304.
+
+Cada tabla tiene un contador de versión en 'versiones_tabla' que las rutas de
+escritura incrementan después de su commit (tocar()). Una página cacheada se
+identifica por la ruta, la URL completa, el usuario (la barra de navegación
+muestra su nombre) y las versiones de las tablas que lee. Así, para servir
+una vista repetida basta una consulta por clave primaria a 'versiones_tabla'
+en lugar de consultar la tabla y renderizar la plantilla:
+
+- Si el navegador ya tiene esa versión (If-None-Match), se responde 304 sin cuerpo.
+  El cuerpo comprimido con gzip (api_datos.comprimir) lleva su propio ETag, el
+  mismo con SUFIJO_GZIP, y cualquiera de los dos vale para el 304.
+- Si está en la caché del proceso, se devuelve el HTML guardado.
+- Si no, se ejecuta la vista y se guarda el resultado.
+
+La caché es LRU por proceso, limitada en bytes, con contadores de aciertos y fallos.
+Incrementar la versión después del commit (y no dentro de la transacción) evita
+que todas las escrituras se serialicen en la fila del contador; en el peor caso
+una página nueva queda guardada con la versión anterior, nunca al revés.
+"""
+import collections
+import functools
+import hashlib
+import threading
+import time
+
+from flask import request, session, make_response
+from flask_login import current_user
+
+# Sufijo del ETag de la representación comprimida con gzip de una respuesta
+SUFIJO_GZIP = '-gzip'
+
+
+class CacheLRU:
+    def __init__(self, max_bytes=32 * 1024 * 1024, ttl=300):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entradas = collections.OrderedDict()  # clave -> (etag, cuerpo, content_type, expira)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.no_modificados = 0
+        self.expulsiones = 0
+
+    def obtener(self, clave, etag):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None or entrada[0] != etag or entrada[3] < time.monotonic():
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return entrada
+
+    def guardar(self, clave, etag, cuerpo, content_type):
+        tamano = len(cuerpo)
+        if tamano > self.max_bytes // 4:
+            return  # Una sola página no debe desplazar casi toda la caché
+        with self._lock:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self._bytes -= len(anterior[1])
+            self._entradas[clave] = (etag, cuerpo, content_type, time.monotonic() + self.ttl)
+            self._bytes += tamano
+            while self._bytes > self.max_bytes and self._entradas:
+                _, expulsada = self._entradas.popitem(last=False)
+                self._bytes -= len(expulsada[1])
+                self.expulsiones += 1
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'entradas': len(self._entradas),
+                'bytes': self._bytes,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'no_modificados': self.no_modificados,
+                'expulsiones': self.expulsiones,
+            }
+
+
+class CacheRespuestas:
+    def __init__(self, app=None, mysql=None):
+        self.app = None
+        self.mysql = mysql
+        self.lru = None
+        self.generacion = ''  # Versión de los estáticos (activos.version): el HTML enlaza sus URL con huella
+        if app is not None:
+            self.init_app(app, mysql)
+
+    def init_app(self, app, mysql):
+        self.app = app
+        self.mysql = mysql
+        app.config.setdefault('CACHE_RESPUESTAS_ACTIVA', True)
+        app.config.setdefault('CACHE_RESPUESTAS_MAX_BYTES', 32 * 1024 * 1024)
+        app.config.setdefault('CACHE_RESPUESTAS_TTL', 300)  # Red de seguridad si se perdiera un tocar()
+        self.lru = CacheLRU(app.config['CACHE_RESPUESTAS_MAX_BYTES'], app.config['CACHE_RESPUESTAS_TTL'])
+
+    # --- Versiones por tabla ---
+
+    def versiones(self, tablas):
+        # Misma conexión de lectura que usará la vista: versión y datos salen del mismo servidor
+        cur = self.mysql.lectura.cursor()
+        cur.execute(
+            f"SELECT tabla, version FROM versiones_tabla WHERE tabla IN ({', '.join(['%s'] * len(tablas))})",
+            tablas
+        )
+        encontradas = {fila['tabla']: fila['version'] for fila in cur.fetchall()}
+        cur.close()
+        return [encontradas.get(tabla, 0) for tabla in tablas]
+
+    def tocar(self, *tablas):
+        """
+        Incrementa la versión de las tablas modificadas. Se llama después del
+        commit de la escritura; si falla, solo se registra (los datos ya se guardaron).
+        """
+        try:
+            cur = self.mysql.connection.cursor()
+            cur.executemany(
+                "INSERT INTO versiones_tabla (tabla, version) VALUES (%s, 1) "
+                "ON DUPLICATE KEY UPDATE version = version + 1",
+                [(tabla,) for tabla in tablas]
+            )
+            self.mysql.connection.commit()
+            cur.close()
+        except Exception as e:
+            self.app.logger.warning(f"No se pudo incrementar la versión de {tablas}: {e}")
+
+    # --- Decorador para las vistas ---
+
+    def por_version(self, *tablas):
+        """
+        Cachea la respuesta GET de la vista según la versión de 'tablas'.
+        Las peticiones con mensajes flash pendientes no se cachean (el HTML los incluye).
+        """
+        tablas = list(tablas)
+
+        def decorador(vista):
+            @functools.wraps(vista)
+            def envoltura(*args, **kwargs):
+                if (request.method != 'GET' or not self.app.config['CACHE_RESPUESTAS_ACTIVA']
+                        or session.get('_flashes')):
+                    return vista(*args, **kwargs)
+
+                usuario = current_user.get_id() if current_user.is_authenticated else ''
+                clave = (request.endpoint, request.full_path, usuario)
+                versiones = self.versiones(tablas)
+                etag = hashlib.sha1(repr((clave, versiones, self.generacion)).encode('utf-8')).hexdigest()
+
+                # Se responde con el ETag que tiene el cliente (sin comprimir o gzip)
+                conocido = next((e for e in (etag, etag + SUFIJO_GZIP) if e in request.if_none_match), None)
+                if conocido is not None:
+                    with self.lru._lock:
+                        self.lru.no_modificados += 1
+                    respuesta = make_response('', 304)
+                    return self._cabeceras(respuesta, conocido)
+
+                entrada = self.lru.obtener(clave, etag)
+                if entrada is not None:
+                    respuesta = make_response(entrada[1])
+                    respuesta.content_type = entrada[2]
+                    return self._cabeceras(respuesta, etag)
+
+                respuesta = make_response(vista(*args, **kwargs))
+                if respuesta.status_code == 200 and respuesta.is_streamed:
+                    # Vista en streaming (ver plantillas.py): se guarda al terminar de enviarse
+                    respuesta.response = self._guardar_al_terminar(
+                        respuesta.response, clave, etag, respuesta.content_type)
+                    self._cabeceras(respuesta, etag)
+                elif respuesta.status_code == 200:
+                    self.lru.guardar(clave, etag, respuesta.get_data(), respuesta.content_type)
+                    self._cabeceras(respuesta, etag)
+                return respuesta
+            return envoltura
+        return decorador
+
+    def _guardar_al_terminar(self, partes, clave, etag, content_type):
+        """
+        Reenvía las partes de una respuesta en streaming y, si se enviaron todas
+        (sin error ni cliente desconectado), guarda el cuerpo completo en la caché.
+        """
+        cuerpo = []
+        tamano = 0
+        for parte in partes:
+            if isinstance(parte, str):
+                parte = parte.encode('utf-8')
+            if cuerpo is not None:
+                cuerpo.append(parte)
+                tamano += len(parte)
+                if tamano > self.lru.max_bytes // 4:
+                    cuerpo = None  # Demasiado grande para la caché: solo se reenvía
+            yield parte
+        if cuerpo is not None:
+            self.lru.guardar(clave, etag, b''.join(cuerpo), content_type)
+
+    @staticmethod
+    def _cabeceras(respuesta, etag):
+        respuesta.set_etag(etag)
+        # private: la página depende del usuario; no-cache: el navegador revalida con If-None-Match
+        respuesta.headers['Cache-Control'] = 'private, no-cache'
+        return respuesta
+
+
+# Instancia única; se inicializa en app.py con cache_respuestas.init_app(app, mysql)
+cache_respuestas = CacheRespuestas()
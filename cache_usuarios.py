@@ -0,0 +1,43 @@
+"""
+Caché por proceso de los usuarios autenticados.
+
+Evita consultar la tabla users en cada request con @login_required. Las
+entradas se guardan por id de usuario junto con su versión de sesión y caducan
+tras un TTL; una versión distinta a la guardada se trata como fallo.
+"""
+import threading
+import time
+
+
+class CacheUsuarios:
+    def __init__(self, ttl=120, maximo=10000):
+        self.ttl = ttl
+        self.maximo = maximo
+        self._entradas = {}  # user_id -> (version_sesion, usuario, expira)
+        self._lock = threading.Lock()
+
+    def obtener(self, user_id, version_sesion):
+        entrada = self._entradas.get(user_id)
+        if entrada is None:
+            return None
+        version, usuario, expira = entrada
+        if version != version_sesion or expira < time.monotonic():
+            return None
+        return usuario
+
+    def guardar(self, usuario):
+        with self._lock:
+            if len(self._entradas) >= self.maximo and usuario.id not in self._entradas:
+                # Al llenarse se descartan primero las entradas ya caducadas y,
+                # si no basta, la más antigua (los dict conservan el orden de inserción)
+                ahora = time.monotonic()
+                for clave in [k for k, e in self._entradas.items() if e[2] < ahora]:
+                    del self._entradas[clave]
+                if len(self._entradas) >= self.maximo:
+                    del self._entradas[next(iter(self._entradas))]
+            self._entradas.pop(usuario.id, None)
+            self._entradas[usuario.id] = (usuario.version_sesion, usuario, time.monotonic() + self.ttl)
+
+    def invalidar(self, user_id):
+        with self._lock:
+            self._entradas.pop(user_id, None)
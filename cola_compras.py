@@ -0,0 +1,410 @@
+"""
+Cola durable de compras (modo opcional, COLA_COMPRAS_ACTIVA).
+
+En una venta relámpago todos los clics compiten por el bloqueo de las mismas
+filas de 'productos' y se atienden de a uno. Con la cola activa, /checkout y
+/registrar_compra solo guardan el pedido en una base SQLite local (modo WAL,
+synchronous=FULL: cuando encolar() vuelve, el pedido ya está en disco) y
+responden de inmediato con una clave para consultar el resultado
+(/pedidos/<clave> o /api/pedidos/<clave>).
+
+Un procesador en segundo plano toma los pedidos pendientes en lotes de hasta
+COLA_COMPRAS_LOTE y los aplica con compras.procesar_lote: una transacción por
+lote, un bloqueo y un descuento de stock por producto (no por clic). Lo que
+llega mientras se aplica un lote forma el siguiente, así que los lotes crecen
+solos con la carga.
+
+Solo un procesador trabaja a la vez: cada worker de gunicorn arranca el suyo
+(COLA_COMPRAS_HILO) y compiten por un candado de archivo (flock) junto a la
+base. También se puede correr aparte con 'flask procesar-cola-compras'.
+
+Estados de un pedido: pendiente -> procesando -> aplicada | rechazada | error.
+Si el proceso cae con un lote 'procesando', al retomarlo se consulta la tabla
+'pedidos_aplicados' de MySQL (escrita en la misma transacción que el lote):
+los que están se marcan con su resultado y el resto vuelve a 'pendiente'. Lo
+mismo se hace cada minuto (y enseguida si falla guardar los resultados de un
+lote ya confirmado en MySQL), así que ningún pedido queda 'procesando' para siempre.
+
+Las esperas de bloqueo y los deadlocks (BLOQUEOS) cuentan como intentos de los
+pedidos del lote: cuando alguno llega a COLA_COMPRAS_REINTENTOS el lote se
+aplica de a uno, y el pedido que siempre choca termina en 'error' en lugar de
+devolver el lote a la cola una y otra vez. Una caída de la base no cuenta: si
+la conexión se pierde durante el lote no se sabe si el COMMIT llegó, así que
+los pedidos quedan 'procesando' y _recuperar los resuelve con 'pedidos_aplicados'.
+Un pedido que ya está en 'pedidos_aplicados' (clave repetida) se trata igual.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import MySQLdb
+
+from compras import procesar_lote, resultados_aplicados, purgar_aplicados
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin gunicorn hay un solo proceso, no hace falta candado
+    fcntl = None
+
+FINALES = ('aplicada', 'rechazada', 'error')
+BLOQUEOS = (1205, 1213)  # Lock wait timeout, deadlock: los puede causar un pedido en particular
+DUPLICADO = 1062         # Clave repetida en 'pedidos_aplicados': el pedido ya se aplicó antes
+GUARDAR_INTENTOS = 3     # Intentos de escribir en SQLite los resultados de un lote confirmado
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS pedidos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    clave TEXT NOT NULL UNIQUE,
+    id_cliente INTEGER NOT NULL,
+    lineas TEXT NOT NULL,               -- JSON {id_producto: cantidad}
+    usuario TEXT,
+    estado TEXT NOT NULL DEFAULT 'pendiente',
+    intentos INTEGER NOT NULL DEFAULT 0,
+    resultado TEXT,                     -- JSON de ResultadoCompra.como_dict()
+    creado REAL NOT NULL,
+    procesado REAL
+);
+CREATE INDEX IF NOT EXISTS idx_pedidos_estado ON pedidos (estado, id);
+"""
+
+
+def _marcadores(n):
+    return ", ".join(["?"] * n)
+
+
+class ColaCompras:
+    def __init__(self, app=None, mysql=None):
+        self.app = None
+        self.mysql = mysql
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._pid = None
+        self._candado = None  # Archivo con el flock, abierto mientras este proceso procese la cola
+        self._despertar = threading.Event()
+        self._al_aplicar = []
+        self._revisar = False  # True: hay pedidos 'procesando' que resolver con _recuperar
+        self.lotes = 0
+        self.ultimo_lote = 0
+        if app is not None:
+            self.init_app(app, mysql)
+
+    def init_app(self, app, mysql):
+        self.app = app
+        self.mysql = mysql
+        app.config.setdefault('COLA_COMPRAS_ACTIVA', False)
+        app.config.setdefault('COLA_COMPRAS_RUTA', os.path.join(app.instance_path, 'cola_compras.sqlite3'))
+        app.config.setdefault('COLA_COMPRAS_LOTE', 500)         # Pedidos máximos por transacción
+        app.config.setdefault('COLA_COMPRAS_ESPERA', 0.05)      # Segundos entre consultas con la cola vacía
+        app.config.setdefault('COLA_COMPRAS_HILO', True)        # Procesador dentro de cada worker
+        app.config.setdefault('COLA_COMPRAS_REINTENTOS', 3)     # Fallos de un pedido antes de marcarlo 'error'
+        app.config.setdefault('COLA_COMPRAS_RETENCION', 24 * 3600)  # Segundos que se guardan los terminados
+        if app.config['COLA_COMPRAS_ACTIVA']:
+            os.makedirs(os.path.dirname(app.config['COLA_COMPRAS_RUTA']), exist_ok=True)
+            self._conexion().executescript(ESQUEMA)
+
+    @property
+    def activa(self):
+        return self.app.config['COLA_COMPRAS_ACTIVA']
+
+    def al_aplicar(self, funcion):
+        """
+        Decorador: registra funcion(resultados) para después de confirmar cada
+        lote ({clave: ResultadoCompra}). Se llama dentro de un contexto de la app.
+        """
+        self._al_aplicar.append(funcion)
+        return funcion
+
+    # --- Base SQLite (una conexión por hilo y por proceso) ---
+
+    def _conexion(self):
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None or self._local.pid != os.getpid():
+            # isolation_level=None: cada sentencia se confirma sola, salvo los BEGIN explícitos
+            conexion = sqlite3.connect(self.app.config['COLA_COMPRAS_RUTA'], timeout=10, isolation_level=None)
+            conexion.row_factory = sqlite3.Row
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("PRAGMA synchronous=FULL")  # fsync del WAL en cada commit: el pedido aceptado no se pierde
+            self._local.conexion = conexion
+            self._local.pid = os.getpid()
+        return conexion
+
+    # --- Lado del request ---
+
+    def encolar(self, id_cliente, lineas, usuario=None):
+        """Guarda el pedido ({id_producto: cantidad}) y devuelve su clave para consultarlo."""
+        self._asegurar_procesador()
+        clave = uuid.uuid4().hex
+        self._conexion().execute(
+            "INSERT INTO pedidos (clave, id_cliente, lineas, usuario, creado) VALUES (?, ?, ?, ?, ?)",
+            (clave, id_cliente, json.dumps(lineas), usuario, time.time())
+        )
+        self._despertar.set()
+        return clave
+
+    def consultar(self, clave):
+        """Estado del pedido como dict, o None si no existe (o ya se purgó)."""
+        self._asegurar_procesador()
+        base = self._conexion()
+        fila = base.execute(
+            "SELECT id, clave, id_cliente, usuario, estado, resultado, creado, procesado FROM pedidos WHERE clave = ?",
+            (clave,)
+        ).fetchone()
+        if fila is None:
+            return None
+        pedido = {
+            'clave': fila['clave'],
+            'id_cliente': fila['id_cliente'],
+            'usuario': fila['usuario'],
+            'estado': fila['estado'],
+            'resultado': json.loads(fila['resultado']) if fila['resultado'] else None,
+            'creado': fila['creado'],
+            'procesado': fila['procesado'],
+        }
+        if fila['estado'] == 'pendiente':
+            pedido['delante'] = base.execute(
+                "SELECT COUNT(*) FROM pedidos WHERE estado = 'pendiente' AND id < ?", (fila['id'],)
+            ).fetchone()[0]
+        return pedido
+
+    def estadisticas(self):
+        """Pedidos por estado y lotes aplicados por este proceso."""
+        conteos = dict.fromkeys(('pendiente', 'procesando') + FINALES, 0)
+        for estado, total in self._conexion().execute("SELECT estado, COUNT(*) FROM pedidos GROUP BY estado"):
+            conteos[estado] = total
+        return {'pedidos': conteos, 'lotes': self.lotes, 'ultimo_lote': self.ultimo_lote}
+
+    # --- Procesador ---
+
+    def _asegurar_procesador(self):
+        if not self.app.config['COLA_COMPRAS_HILO']:
+            return
+        if self._hilo is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._hilo is not None and self._pid == os.getpid():
+                return
+            # Después de un fork el hilo del padre no existe en el hijo: se crea uno nuevo
+            self._pid = os.getpid()
+            self._despertar = threading.Event()
+            self._hilo = threading.Thread(target=self.procesar_siempre, name='cola-compras', daemon=True)
+            self._hilo.start()
+
+    def _tomar_candado(self):
+        """Candado exclusivo entre procesos; se conserva mientras viva el proceso."""
+        if fcntl is None:
+            return True
+        archivo = open(self.app.config['COLA_COMPRAS_RUTA'] + '.candado', 'a')
+        try:
+            fcntl.flock(archivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            archivo.close()
+            return False
+        self._candado = archivo
+        return True
+
+    def procesar_siempre(self):
+        """Bucle del procesador: espera el candado y aplica lotes mientras haya pedidos."""
+        while not self._tomar_candado():
+            time.sleep(1)
+        self.app.logger.info(f"Procesador de la cola de compras activo (pid {os.getpid()})")
+        self._recuperar()
+        espera = self.app.config['COLA_COMPRAS_ESPERA']
+        proxima_purga = 0
+        while True:
+            try:
+                procesados = self.procesar_lote()
+            except MySQLdb.OperationalError as e:
+                # Base caída (el lote queda para _recuperar), deadlock o espera de bloqueo
+                self.app.logger.warning(f"Cola de compras: lote no aplicado, se reintenta: {e}")
+                time.sleep(1)
+                continue
+            except Exception as e:
+                self.app.logger.exception(f"Cola de compras: error inesperado: {e}")
+                time.sleep(1)
+                continue
+            if procesados:
+                continue
+            if self._revisar or time.monotonic() >= proxima_purga:
+                self._revisar = False
+                try:
+                    self._recuperar()
+                except Exception as e:
+                    self._revisar = True
+                    self.app.logger.warning(f"Cola de compras: no se pudieron recuperar pedidos: {e}")
+            if time.monotonic() >= proxima_purga:
+                self.purgar()
+                proxima_purga = time.monotonic() + 60
+            self._despertar.wait(espera)
+            self._despertar.clear()
+
+    def procesar_lote(self):
+        """Aplica un lote de pedidos pendientes y devuelve cuántos se procesaron."""
+        base = self._conexion()
+        base.execute("BEGIN IMMEDIATE")
+        try:
+            filas = base.execute(
+                "SELECT id, clave, id_cliente, lineas, intentos FROM pedidos "
+                "WHERE estado = 'pendiente' ORDER BY id LIMIT ?",
+                (self.app.config['COLA_COMPRAS_LOTE'],)
+            ).fetchall()
+            if filas:
+                base.execute(f"UPDATE pedidos SET estado = 'procesando' WHERE id IN ({_marcadores(len(filas))})",
+                             [fila['id'] for fila in filas])
+            base.execute("COMMIT")
+        except Exception:
+            base.execute("ROLLBACK")
+            raise
+        if not filas:
+            return 0
+
+        pedidos = [(fila['clave'], fila['id_cliente'],
+                    {int(id_producto): cantidad for id_producto, cantidad in json.loads(fila['lineas']).items()})
+                   for fila in filas]
+        intentos = {fila['clave']: fila['intentos'] for fila in filas}
+        with self.app.app_context():
+            try:
+                conexion = self.mysql.connection
+            except Exception:
+                # Sin conexión no se escribió nada: el lote vuelve tal cual a la cola
+                self._devolver(list(intentos))
+                raise
+            try:
+                resultados = procesar_lote(conexion, pedidos)
+            except MySQLdb.OperationalError as e:
+                if e.args[0] not in BLOQUEOS:
+                    # La conexión pudo caer en el COMMIT o después: no se sabe si el lote
+                    # se confirmó, así que queda 'procesando' hasta que _recuperar lo mire
+                    self._revisar = True
+                    raise
+                if max(intentos.values()) + 1 < self.app.config['COLA_COMPRAS_REINTENTOS']:
+                    self._devolver(list(intentos), fallo=True)
+                    raise
+                # Reintentos agotados: de a uno, para que solo el pedido que choca termine en 'error'
+                self.app.logger.warning(f"Cola de compras: lote de {len(pedidos)} bloqueado otra vez ({e}); "
+                                        f"se aplica de a uno")
+                resultados = self._de_a_uno(pedidos, intentos)
+            except Exception as e:
+                # Algún pedido hace fallar el lote: se aplican de a uno para aislarlo
+                self.app.logger.warning(f"Cola de compras: lote de {len(pedidos)} falló ({e}); se aplica de a uno")
+                resultados = self._de_a_uno(pedidos, intentos)
+            try:
+                self._guardar(resultados)
+            except Exception as e:
+                # El lote ya está confirmado en MySQL (pedidos_aplicados): _recuperar lo resuelve
+                self._revisar = True
+                self.app.logger.exception(f"Cola de compras: no se pudieron guardar los resultados de "
+                                          f"{len(resultados)} pedidos; se recuperan de MySQL: {e}")
+            if any(resultado.ok for resultado in resultados.values()):
+                for funcion in self._al_aplicar:
+                    funcion(resultados)
+        self.lotes += 1
+        self.ultimo_lote = len(pedidos)
+        return len(pedidos)
+
+    def _de_a_uno(self, pedidos, intentos):
+        resultados = {}
+        for pedido in pedidos:
+            clave = pedido[0]
+            try:
+                resultados.update(procesar_lote(self.mysql.connection, [pedido]))
+            except MySQLdb.OperationalError as e:
+                if e.args[0] in BLOQUEOS:
+                    self.app.logger.warning(f"Cola de compras: el pedido {clave} quedó bloqueado: {e}")
+                    self._fallo(clave, intentos[clave])
+                else:
+                    # Como en el lote: no se sabe si se confirmó, lo resuelve _recuperar
+                    self._revisar = True
+            except MySQLdb.IntegrityError as e:
+                if e.args[0] != DUPLICADO:
+                    self.app.logger.exception(f"Cola de compras: el pedido {clave} falló: {e}")
+                    self._fallo(clave, intentos[clave])
+                else:
+                    # Ya aplicado por un lote anterior: queda 'procesando' y _recuperar toma su resultado
+                    self._revisar = True
+            except Exception as e:
+                self.app.logger.exception(f"Cola de compras: el pedido {clave} falló: {e}")
+                self._fallo(clave, intentos[clave])
+        return resultados
+
+    def _fallo(self, clave, intentos):
+        """Cuenta un intento fallido del pedido; al llegar a COLA_COMPRAS_REINTENTOS queda en 'error'."""
+        if intentos + 1 >= self.app.config['COLA_COMPRAS_REINTENTOS']:
+            self._conexion().execute(
+                "UPDATE pedidos SET estado = 'error', intentos = intentos + 1, procesado = ?, resultado = ? "
+                "WHERE clave = ?",
+                (time.time(), json.dumps({'ok': False, 'lineas': [], 'errores': [
+                    {'id_producto': None, 'cantidad': None, 'motivo': 'Error al registrar la compra.'}]}),
+                 clave)
+            )
+        else:
+            self._devolver([clave], fallo=True)
+
+    def _devolver(self, claves, fallo=False):
+        self._conexion().execute(
+            f"UPDATE pedidos SET estado = 'pendiente', intentos = intentos + ? "
+            f"WHERE clave IN ({_marcadores(len(claves))})",
+            [int(fallo)] + claves
+        )
+
+    def _guardar(self, resultados):
+        """Escribe los resultados en SQLite; reintenta si la base está bloqueada u ocupada."""
+        base = self._conexion()
+        ahora = time.time()
+        filas = [('aplicada' if resultado.ok else 'rechazada', json.dumps(resultado.como_dict(), default=str),
+                  ahora, clave) for clave, resultado in resultados.items()]
+        for intento in range(GUARDAR_INTENTOS):
+            try:
+                base.execute("BEGIN IMMEDIATE")
+                try:
+                    base.executemany("UPDATE pedidos SET estado = ?, resultado = ?, procesado = ? WHERE clave = ?",
+                                     filas)
+                    base.execute("COMMIT")
+                except Exception:
+                    base.execute("ROLLBACK")
+                    raise
+                return
+            except sqlite3.OperationalError:
+                if intento + 1 == GUARDAR_INTENTOS:
+                    raise
+                time.sleep(0.5 * (intento + 1))
+
+    def _recuperar(self):
+        """Resuelve los pedidos que quedaron 'procesando' si el procesador anterior cayó."""
+        base = self._conexion()
+        claves = [fila['clave'] for fila in base.execute("SELECT clave FROM pedidos WHERE estado = 'procesando'")]
+        if not claves:
+            return
+        with self.app.app_context():
+            aplicados = resultados_aplicados(self.mysql.connection, claves)
+        ahora = time.time()
+        base.executemany(
+            "UPDATE pedidos SET estado = ?, resultado = ?, procesado = ? WHERE clave = ?",
+            [('aplicada' if resultado['ok'] else 'rechazada', json.dumps(resultado), ahora, clave)
+             for clave, resultado in aplicados.items()]
+        )
+        pendientes = [clave for clave in claves if clave not in aplicados]
+        if pendientes:
+            self._devolver(pendientes)
+        self.app.logger.warning(f"Cola de compras: {len(aplicados)} pedidos recuperados con su resultado, "
+                                f"{len(pendientes)} devueltos a pendiente")
+
+    def purgar(self):
+        """Borra los pedidos terminados más antiguos que COLA_COMPRAS_RETENCION."""
+        retencion = self.app.config['COLA_COMPRAS_RETENCION']
+        try:
+            self._conexion().execute(
+                f"DELETE FROM pedidos WHERE estado IN ({_marcadores(len(FINALES))}) AND procesado < ?",
+                FINALES + (time.time() - retencion,)
+            )
+            with self.app.app_context():
+                purgar_aplicados(self.mysql.connection, retencion)
+        except Exception as e:
+            self.app.logger.warning(f"Cola de compras: no se pudo purgar: {e}")
+
+
+# Instancia única; se inicializa en app.py con cola_compras.init_app(app, mysql)
+cola_compras = ColaCompras()
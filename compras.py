@@ -0,0 +1,290 @@
+"""
+Registro de compras: aplica un carrito completo (varias líneas producto/cantidad)
+de un cliente en una sola transacción.
+
+El número de consultas no depende del tamaño del carrito:
+  1. Se comprueba el cliente.
+  2. Se bloquean todos los productos del carrito con un único SELECT ... FOR UPDATE
+     (en orden de id para que dos carritos concurrentes no se bloqueen mutuamente).
+  3. Se descuenta el stock con un único UPDATE condicional (stock >= cantidad).
+  4. Se anotan las compras en el libro 'compras' (solo inserciones, una fila por
+     compra) y se acumulan en 'clientes_productos', cada cosa con un único
+     INSERT multi-fila.
+  5. Se suman a los resúmenes de ventas del tablero (ver resumenes.py).
+  6. Se anota el stock que quedó, para las páginas abiertas (ver en_vivo.py).
+Si alguna línea falla no se aplica ninguna y se informa el motivo de cada una.
+
+procesar_lote hace lo mismo para muchos carritos a la vez (cola de compras, ver
+cola_compras.py): cada producto se bloquea y se descuenta una sola vez por lote.
+"""
+import json
+
+from resumenes import acumular_lote
+from en_vivo import anotar_productos
+
+
+class ResultadoCompra:
+    __slots__ = ('ok', 'lineas', 'errores')
+
+    def __init__(self, ok, lineas, errores):
+        self.ok = ok
+        self.lineas = lineas    # [{'id_producto', 'nombre', 'cantidad', 'precio'}] de las líneas aplicadas
+        self.errores = errores  # [{'id_producto', 'cantidad', 'motivo'}] de las líneas rechazadas
+
+    def como_dict(self):
+        return {'ok': self.ok, 'lineas': self.lineas, 'errores': self.errores}
+
+
+def normalizar_lineas(pares):
+    """
+    Valida y agrupa las líneas del carrito. 'pares' es un iterable de
+    (id_producto, cantidad) tal como llegan del formulario o del JSON.
+    Devuelve ({id_producto: cantidad_total}, errores).
+    """
+    lineas = {}
+    errores = []
+    for id_producto, cantidad in pares:
+        try:
+            id_producto_int = int(id_producto)
+            cantidad_int = int(cantidad)
+        except (TypeError, ValueError):
+            errores.append({'id_producto': id_producto, 'cantidad': cantidad,
+                            'motivo': 'El producto y la cantidad deben ser números enteros válidos.'})
+            continue
+        if cantidad_int <= 0:
+            errores.append({'id_producto': id_producto_int, 'cantidad': cantidad_int,
+                            'motivo': 'La cantidad debe ser un número positivo.'})
+            continue
+        # El mismo producto repetido en el carrito se suma en una sola línea
+        lineas[id_producto_int] = lineas.get(id_producto_int, 0) + cantidad_int
+    return lineas, errores
+
+
+def _marcadores(n):
+    return ", ".join(["%s"] * n)
+
+
+def _descontar_stock(cur, cantidades):
+    """
+    Descuento condicional en un solo UPDATE: stock = stock - n WHERE stock >= n.
+    'cantidades' es {id_producto: n}. Devuelve True si se descontaron todos.
+    """
+    ids = sorted(cantidades)
+    caso = "CASE id_producto " + " ".join(["WHEN %s THEN %s"] * len(ids)) + " END"
+    pares = [valor for id_producto in ids for valor in (id_producto, cantidades[id_producto])]
+    cur.execute(
+        f"UPDATE productos SET stock = stock - {caso} "
+        f"WHERE id_producto IN ({_marcadores(len(ids))}) AND stock >= {caso}",
+        pares + ids + pares
+    )
+    return cur.rowcount == len(ids)
+
+
+def _anotar(cur, filas):
+    """
+    Anota compras ya descontadas del stock: libro 'compras', totales de
+    'clientes_productos', resúmenes de ventas y el nuevo stock de cada producto
+    (eventos en vivo), con una sentencia cada uno.
+    'filas' es [(id_cliente, id_producto, cantidad, precio)].
+    """
+    # executemany agrupa todas las filas en un único INSERT multi-fila.
+    # Libro de compras: solo se agregan filas, nunca se reescribe el historial
+    cur.executemany(
+        "INSERT INTO compras (id_cliente, id_producto, cantidad, precio_unitario) VALUES (%s, %s, %s, %s)",
+        filas
+    )
+    # Totales acumulados por cliente y producto (en orden, para bloquear siempre igual)
+    cur.executemany(
+        """
+        INSERT INTO clientes_productos (id_cliente, id_producto, cantidad)
+        VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            cantidad = cantidad + VALUES(cantidad),
+            fecha_compra = CURRENT_TIMESTAMP
+        """,
+        sorted((id_cliente, id_producto, cantidad) for id_cliente, id_producto, cantidad, _ in filas)
+    )
+    # Resúmenes por producto, cliente y día en la misma transacción
+    acumular_lote(cur, filas)
+    # Stock que quedó en cada producto, para las páginas abiertas
+    anotar_productos(cur, {id_producto for _, id_producto, _, _ in filas})
+
+
+def procesar_carrito(conexion, id_cliente, lineas):
+    """
+    Aplica el carrito 'lineas' ({id_producto: cantidad}) al cliente 'id_cliente'.
+    Hace commit si todas las líneas son válidas y rollback en caso contrario.
+    Devuelve un ResultadoCompra. Los errores de la base de datos se propagan
+    después de hacer rollback.
+    """
+    if not lineas:
+        return ResultadoCompra(False, [], [{'id_producto': None, 'cantidad': None,
+                                            'motivo': 'El carrito está vacío.'}])
+
+    ids = sorted(lineas)
+    cur = conexion.cursor()
+    try:
+        cur.execute("SELECT id_cliente FROM clientes WHERE id_cliente = %s", (id_cliente,))
+        if cur.fetchone() is None:
+            conexion.rollback()
+            return ResultadoCompra(False, [], [{'id_producto': None, 'cantidad': None,
+                                                'motivo': 'Cliente no encontrado.'}])
+
+        cur.execute(
+            f"SELECT id_producto, nombre, precio, stock FROM productos "
+            f"WHERE id_producto IN ({_marcadores(len(ids))}) ORDER BY id_producto FOR UPDATE",
+            ids
+        )
+        productos = {p['id_producto']: p for p in cur.fetchall()}
+
+        aplicadas = []
+        errores = []
+        for id_producto in ids:
+            cantidad = lineas[id_producto]
+            producto = productos.get(id_producto)
+            if producto is None:
+                errores.append({'id_producto': id_producto, 'cantidad': cantidad,
+                                'motivo': 'Producto no encontrado.'})
+            elif producto['stock'] < cantidad:
+                errores.append({'id_producto': id_producto, 'cantidad': cantidad,
+                                'motivo': f'No hay suficiente stock para "{producto["nombre"]}". '
+                                          f'Stock actual: {producto["stock"]}.'})
+            else:
+                aplicadas.append({'id_producto': id_producto, 'nombre': producto['nombre'],
+                                  'cantidad': cantidad, 'precio': producto['precio']})
+
+        if errores:
+            conexion.rollback()
+            return ResultadoCompra(False, [], errores)
+
+        if not _descontar_stock(cur, {linea['id_producto']: linea['cantidad'] for linea in aplicadas}):
+            # No debería ocurrir con las filas bloqueadas, pero el UPDATE condicional es la garantía final
+            conexion.rollback()
+            return ResultadoCompra(False, [], [{'id_producto': None, 'cantidad': None,
+                                                'motivo': 'El stock cambió durante la compra. Inténtalo de nuevo.'}])
+
+        _anotar(cur, [(id_cliente, linea['id_producto'], linea['cantidad'], linea['precio']) for linea in aplicadas])
+
+        conexion.commit()
+        return ResultadoCompra(True, aplicadas, [])
+    except Exception:
+        conexion.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+# --- Lotes de la cola de compras (ver cola_compras.py) ---
+
+def procesar_lote(conexion, pedidos):
+    """
+    Aplica en una sola transacción varios carritos en orden de llegada.
+    'pedidos' es [(clave, id_cliente, {id_producto: cantidad})]. Cada carrito se
+    acepta o se rechaza completo, igual que en procesar_carrito, contra el stock
+    que le dejaron los anteriores del lote; pero cada producto se bloquea una
+    sola vez y se descuenta con un único UPDATE por el total del lote.
+    El resultado de cada pedido se guarda en 'pedidos_aplicados' en la misma
+    transacción, para saber después de una caída si el lote llegó a confirmarse.
+    Devuelve {clave: ResultadoCompra}. Si falla hace rollback y propaga el error.
+    """
+    if not pedidos:
+        return {}
+
+    ids_productos = sorted({id_producto for _, _, lineas in pedidos for id_producto in lineas})
+    ids_clientes = sorted({id_cliente for _, id_cliente, _ in pedidos})
+    cur = conexion.cursor()
+    try:
+        cur.execute(
+            f"SELECT id_cliente FROM clientes WHERE id_cliente IN ({_marcadores(len(ids_clientes))})",
+            ids_clientes
+        )
+        clientes = {fila['id_cliente'] for fila in cur.fetchall()}
+        productos = {}
+        if ids_productos:
+            cur.execute(
+                f"SELECT id_producto, nombre, precio, stock FROM productos "
+                f"WHERE id_producto IN ({_marcadores(len(ids_productos))}) ORDER BY id_producto FOR UPDATE",
+                ids_productos
+            )
+            productos = {p['id_producto']: p for p in cur.fetchall()}
+        stock = {id_producto: p['stock'] for id_producto, p in productos.items()}
+
+        resultados = {}
+        descuentos = {}
+        filas = []
+        for clave, id_cliente, lineas in pedidos:
+            if not lineas:
+                resultados[clave] = ResultadoCompra(False, [], [{'id_producto': None, 'cantidad': None,
+                                                                 'motivo': 'El carrito está vacío.'}])
+                continue
+            if id_cliente not in clientes:
+                resultados[clave] = ResultadoCompra(False, [], [{'id_producto': None, 'cantidad': None,
+                                                                 'motivo': 'Cliente no encontrado.'}])
+                continue
+            aplicadas = []
+            errores = []
+            for id_producto in sorted(lineas):
+                cantidad = lineas[id_producto]
+                producto = productos.get(id_producto)
+                if producto is None:
+                    errores.append({'id_producto': id_producto, 'cantidad': cantidad,
+                                    'motivo': 'Producto no encontrado.'})
+                elif stock[id_producto] < cantidad:
+                    errores.append({'id_producto': id_producto, 'cantidad': cantidad,
+                                    'motivo': f'No hay suficiente stock para "{producto["nombre"]}". '
+                                              f'Stock actual: {stock[id_producto]}.'})
+                else:
+                    aplicadas.append({'id_producto': id_producto, 'nombre': producto['nombre'],
+                                      'cantidad': cantidad, 'precio': producto['precio']})
+            if errores:
+                resultados[clave] = ResultadoCompra(False, [], errores)
+                continue
+            for linea in aplicadas:
+                stock[linea['id_producto']] -= linea['cantidad']
+                descuentos[linea['id_producto']] = descuentos.get(linea['id_producto'], 0) + linea['cantidad']
+                filas.append((id_cliente, linea['id_producto'], linea['cantidad'], linea['precio']))
+            resultados[clave] = ResultadoCompra(True, aplicadas, [])
+
+        if descuentos:
+            if not _descontar_stock(cur, descuentos):
+                # Imposible con las filas bloqueadas; el UPDATE condicional es la garantía final
+                raise RuntimeError("El stock cambió durante el lote; se deshace y se reintenta.")
+            _anotar(cur, filas)
+        cur.executemany(
+            "INSERT INTO pedidos_aplicados (clave, ok, resultado) VALUES (%s, %s, %s)",
+            [(clave, resultado.ok, json.dumps(resultado.como_dict(), default=str))
+             for clave, resultado in resultados.items()]
+        )
+        conexion.commit()
+        return resultados
+    except Exception:
+        conexion.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def resultados_aplicados(conexion, claves):
+    """{clave: resultado (dict)} de los pedidos de 'claves' que ya se confirmaron en MySQL."""
+    if not claves:
+        return {}
+    cur = conexion.cursor()
+    try:
+        cur.execute(
+            f"SELECT clave, resultado FROM pedidos_aplicados WHERE clave IN ({_marcadores(len(claves))})",
+            list(claves)
+        )
+        return {fila['clave']: json.loads(fila['resultado']) for fila in cur.fetchall()}
+    finally:
+        cur.close()
+
+
+def purgar_aplicados(conexion, segundos):
+    """Borra los registros de 'pedidos_aplicados' más antiguos que 'segundos'."""
+    cur = conexion.cursor()
+    try:
+        cur.execute("DELETE FROM pedidos_aplicados WHERE aplicado < NOW() - INTERVAL %s SECOND", (segundos,))
+        conexion.commit()
+        return cur.rowcount
+    finally:
+        cur.close()
@@ -0,0 +1,139 @@
+"""
+Hash y verificación de contraseñas fuera del hilo del request.
+
+generate_password_hash / check_password_hash son cálculos de CPU deliberadamente
+lentos. Aquí se ejecutan en un pool de procesos acotado por worker, con un
+límite de trabajos en espera y un tiempo máximo, para que una ráfaga de logins
+no acapare la CPU de los workers ni deje en cola al resto de las rutas: cuando
+el pool está lleno se rechaza de inmediato (ColaLlena) en lugar de esperar.
+
+El método y el costo del hash se configuran con HASH_METODO (formato de
+werkzeug, p. ej. 'pbkdf2:sha256', 'pbkdf2:sha256:1000000' o 'scrypt:32768:8:1';
+sin costo se usa el de la versión instalada de werkzeug). necesita_rehash()
+detecta los hashes guardados con otro algoritmo o con un costo menor al
+configurado para recalcularlos cuando el usuario inicia sesión; un hash con un
+costo mayor no se toca (nunca se rebaja la protección de uno ya guardado).
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturoTimeout
+
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+# Parámetros que werkzeug completa cuando el método no los indica
+SCRYPT_POR_DEFECTO = (2 ** 15, 8, 1)
+PBKDF2_HASH_POR_DEFECTO = 'sha256'
+
+
+class ColaLlena(Exception):
+    """Hay demasiados hashes pendientes; el cliente debe reintentar más tarde."""
+
+
+class TiempoAgotado(Exception):
+    """El hash no terminó dentro de HASH_TIMEOUT segundos."""
+
+
+class ServicioContrasenas:
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._cupos = None
+        self._metodo = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('HASH_METODO', 'pbkdf2:sha256')  # Costo por defecto de werkzeug
+        app.config.setdefault('HASH_PROCESOS', 1)    # Procesos de hash por worker de gunicorn
+        app.config.setdefault('HASH_COLA_MAX', 8)    # Hashes en curso + en espera antes de rechazar
+        app.config.setdefault('HASH_TIMEOUT', 10)    # Segundos máximos de espera por un hash
+        self._cupos = threading.BoundedSemaphore(app.config['HASH_COLA_MAX'])
+        # Se interpreta una vez aquí (sin calcular ningún hash): un método inválido falla al arrancar
+        self._metodo = parametros_metodo(app.config['HASH_METODO'])
+
+    # --- Pool de procesos (uno por worker, creado después del fork) ---
+
+    def _obtener_executor(self):
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    # 'spawn': los procesos hijos no heredan los sockets ni los hilos del worker
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.app.config['HASH_PROCESOS'],
+                        mp_context=multiprocessing.get_context('spawn'),
+                    )
+                    self._cupos = threading.BoundedSemaphore(self.app.config['HASH_COLA_MAX'])
+                    self._pid = os.getpid()
+        return self._executor
+
+    def calentar(self):
+        """Arranca los procesos del pool para que el primer login no pague el arranque."""
+        executor = self._obtener_executor()
+        for futuro in [executor.submit(os.getpid) for _ in range(self.app.config['HASH_PROCESOS'])]:
+            futuro.result()
+
+    def _ejecutar(self, funcion, *args):
+        executor = self._obtener_executor()
+        cupos = self._cupos
+        if not cupos.acquire(blocking=False):
+            raise ColaLlena('Hay demasiadas solicitudes de autenticación en curso.')
+        try:
+            futuro = executor.submit(funcion, *args)
+        except Exception:
+            cupos.release()
+            raise
+        # El cupo se libera cuando el proceso termina de verdad, no cuando nos
+        # cansamos de esperar: así el límite refleja el trabajo real del pool
+        futuro.add_done_callback(lambda _: cupos.release())
+        try:
+            return futuro.result(timeout=self.app.config['HASH_TIMEOUT'])
+        except FuturoTimeout:
+            futuro.cancel()
+            raise TiempoAgotado('El cálculo del hash tardó demasiado.')
+
+    # --- Operaciones ---
+
+    def generar(self, password):
+        return self._ejecutar(generate_password_hash, password, self.app.config['HASH_METODO'])
+
+    def verificar(self, hash_guardado, password):
+        return self._ejecutar(check_password_hash, hash_guardado, password)
+
+    def necesita_rehash(self, hash_guardado):
+        """True si el hash usa otro algoritmo que HASH_METODO o alguno de sus costos es menor."""
+        try:
+            algoritmo, costos = parametros_metodo(hash_guardado.split('$', 1)[0])
+        except ValueError:
+            return True  # Formato desconocido o antiguo
+        algoritmo_actual, costos_actuales = self._metodo
+        if algoritmo != algoritmo_actual:
+            return True
+        return any(guardado < actual for guardado, actual in zip(costos, costos_actuales))
+
+
+def parametros_metodo(metodo):
+    """
+    (algoritmo, costos) de un método de werkzeug, con los valores por defecto
+    completados: 'pbkdf2:sha256' -> (('pbkdf2', 'sha256'), (1000000,)) con werkzeug 3.1.
+    Lanza ValueError si el método no es válido.
+    """
+    nombre, *argumentos = metodo.split(':')
+    if nombre == 'scrypt':
+        if argumentos and len(argumentos) != 3:
+            raise ValueError("'scrypt' lleva 3 parámetros (n:r:p).")
+        return ('scrypt',), tuple(map(int, argumentos)) if argumentos else SCRYPT_POR_DEFECTO
+    if nombre == 'pbkdf2':
+        if len(argumentos) > 2:
+            raise ValueError("'pbkdf2' lleva como mucho 2 parámetros (hash:iteraciones).")
+        hash_nombre = argumentos[0] if argumentos else PBKDF2_HASH_POR_DEFECTO
+        iteraciones = int(argumentos[1]) if len(argumentos) == 2 else DEFAULT_PBKDF2_ITERATIONS
+        return ('pbkdf2', hash_nombre), (iteraciones,)
+    raise ValueError(f"Método de hash desconocido: '{nombre}'.")
+
+
+# Instancia única; se inicializa en app.py con contrasenas.init_app(app)
+contrasenas = ServicioContrasenas()
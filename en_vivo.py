@@ -0,0 +1,357 @@
+"""
+Stock y precios en vivo con Server-Sent Events (ruta /productos/eventos).
+
+Cada escritura que cambia productos anota, en su misma transacción, un evento
+por producto en 'eventos_productos' con el estado que quedó confirmado
+(anotar_productos, anotar_eliminados, anotar_recarga): compras (también las de
+la cola), crear, editar, eliminar y las operaciones masivas. Si la transacción
+se deshace, el evento tampoco existe.
+
+Cada worker tiene un solo Difusor: un hilo que, mientras haya navegadores
+conectados, lee los eventos nuevos cada EVENTOS_INTERVALO segundos con una
+sola consulta por la clave primaria, los guarda en memoria (los últimos
+EVENTOS_MEMORIA) y despierta a todas las conexiones del worker. El mensaje de
+cada lote se arma una sola vez y se envía igual a todas. Sin conexiones, no
+consulta nada.
+
+El id de cada mensaje es el id del último evento que contiene. Al reconectar,
+el navegador envía Last-Event-ID (o ?ultimo= si reconecta el script) y recibe
+lo que se perdió desde la memoria del worker; si es más viejo que eso, recibe
+un evento 'recargar'. Las páginas incluyen el último id al momento de
+renderizar (plantilla: ultimo_evento()), así que tampoco se pierde lo que pasa
+entre el render y la conexión.
+
+Con gthread cada conexión abierta ocupa un hilo del worker mientras dura: se
+limitan a EVENTOS_MAX_CONEXIONES por worker (el resto recibe 503 y reintenta) y
+se cierran cada EVENTOS_DURACION segundos (el navegador reconecta solo y
+retoma desde su último id).
+
+Con EVENTOS_ACTIVOS en False las escrituras no anotan nada. Los eventos más
+viejos que EVENTOS_RETENCION se borran cada PURGA_CADA segundos desde el hilo
+del Difusor, que arranca con el worker (gunicorn.conf.py) y purga aunque no
+haya nadie conectado; sin workers web (o con el stream apagado y filas viejas),
+'flask purgar-eventos' hace lo mismo desde cron.
+
+Formato de cada mensaje ('data' es una lista JSON de entradas):
+    ["c", id_evento, id_producto, stock, "precio", nombre o null]   cambio
+    ["n", id_evento, id_producto, stock, "precio", nombre]          producto nuevo
+    ["e", id_evento, id_producto]                                   eliminado
+    ["r", id_evento]                                                cambio masivo: recargar
+"""
+import collections
+import json
+import os
+import threading
+import time
+
+from flask import Response, request
+
+TIPOS = {'cambio': 'c', 'nuevo': 'n', 'eliminado': 'e', 'recargar': 'r'}
+MAX_HUECOS = 1000  # Ids faltantes que se vigilan por lote (más que eso: se dan por perdidos)
+PURGA_CADA = 60     # Segundos entre purgas de eventos viejos
+PURGA_LOTE = 10000  # Filas por DELETE de la purga (se repite hasta borrar menos)
+
+SQL_EVENTOS = ("SELECT id_evento, tipo, id_producto, nombre, precio, stock FROM eventos_productos")
+
+
+def _marcadores(n):
+    return ", ".join(["%s"] * n)
+
+
+# --- Anotar eventos (dentro de la transacción que cambia los productos) ---
+
+def _activos():
+    # Sin app inicializada (scripts sueltos) o con el stream apagado no se anota nada
+    return difusor.app is not None and difusor.app.config['EVENTOS_ACTIVOS']
+
+
+def anotar_productos(cur, ids, tipo='cambio', con_nombre=False):
+    """Un evento por producto de 'ids' con su stock y precio actuales (y el nombre, si se pide)."""
+    if not ids or not _activos():
+        return
+    ids = sorted(ids)
+    nombre = "nombre" if con_nombre or tipo == 'nuevo' else "NULL"
+    cur.execute(
+        f"INSERT INTO eventos_productos (tipo, id_producto, nombre, precio, stock) "
+        f"SELECT %s, id_producto, {nombre}, precio, stock FROM productos "
+        f"WHERE id_producto IN ({_marcadores(len(ids))}) ORDER BY id_producto",
+        [tipo] + ids
+    )
+
+
+def anotar_eliminados(cur, ids):
+    if ids and _activos():
+        cur.executemany("INSERT INTO eventos_productos (tipo, id_producto) VALUES ('eliminado', %s)",
+                        [(id_producto,) for id_producto in sorted(ids)])
+
+
+def anotar_recarga(cur):
+    """Un solo evento para cambios que tocan demasiados productos como para enviarlos uno a uno."""
+    if _activos():
+        cur.execute("INSERT INTO eventos_productos (tipo) VALUES ('recargar')")
+
+
+def publicar_recarga(conexion):
+    """anotar_recarga en su propia transacción, después de una escritura ya confirmada."""
+    if not _activos():
+        return
+    cur = conexion.cursor()
+    try:
+        anotar_recarga(cur)
+        conexion.commit()
+    except Exception:
+        conexion.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def purgar(conexion, retencion):
+    """
+    Borra los eventos de más de 'retencion' segundos, de a PURGA_LOTE filas por
+    transacción, hasta que un DELETE borra menos. Devuelve cuántos borró.
+    """
+    borrados = 0
+    cur = conexion.cursor()
+    try:
+        while True:
+            cur.execute("DELETE FROM eventos_productos WHERE creado < NOW() - INTERVAL %s SECOND LIMIT %s",
+                        (retencion, PURGA_LOTE))
+            filas = cur.rowcount
+            conexion.commit()
+            borrados += filas
+            if filas < PURGA_LOTE:
+                return borrados
+    finally:
+        cur.close()
+
+
+# --- Difusión por worker ---
+
+def _entrada(fila):
+    letra = TIPOS[fila['tipo']]
+    if letra == 'r':
+        return [letra, fila['id_evento']]
+    if letra == 'e':
+        return [letra, fila['id_evento'], fila['id_producto']]
+    return [letra, fila['id_evento'], fila['id_producto'], fila['stock'],
+            str(fila['precio']) if fila['precio'] is not None else None, fila['nombre']]
+
+
+def _mensaje(entradas):
+    ultimo = max(entrada[1] for entrada in entradas)
+    datos = json.dumps(entradas, separators=(',', ':'), ensure_ascii=False)
+    return f"id: {ultimo}\nevent: productos\ndata: {datos}\n\n"
+
+
+class Difusor:
+    def __init__(self, app=None, mysql=None):
+        self.app = None
+        self.mysql = mysql
+        self._condicion = threading.Condition()
+        self._eventos = collections.deque()  # (n, id_evento, entrada); n crece de a uno por evento recibido
+        self._n = 0
+        self._desde = None      # Están en memoria todos los eventos con id > _desde (None: sin leer todavía)
+        self._ultimo = 0        # Mayor id leído
+        self._huecos = {}       # Ids faltantes por debajo de _ultimo -> momento en que se vieron
+        self._lote = (0, 0, '')  # (n inicial, n final, texto) del último lote: se envía tal cual
+        self._conexiones = 0
+        self._hilo = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.enviados = 0
+        self.rechazadas = 0
+        if app is not None:
+            self.init_app(app, mysql)
+
+    def init_app(self, app, mysql):
+        self.app = app
+        self.mysql = mysql
+        app.config.setdefault('EVENTOS_ACTIVOS', True)
+        app.config.setdefault('EVENTOS_INTERVALO', 0.5)         # Segundos entre lecturas con conexiones abiertas
+        app.config.setdefault('EVENTOS_MEMORIA', 5000)          # Eventos recientes para retomar
+        app.config.setdefault('EVENTOS_LATIDO', 15)             # Segundos sin eventos antes de un comentario
+        app.config.setdefault('EVENTOS_DURACION', 300)          # Segundos por conexión antes de cerrarla
+        app.config.setdefault('EVENTOS_MAX_CONEXIONES', 6)      # Conexiones abiertas por worker (cada una, un hilo)
+        app.config.setdefault('EVENTOS_RETENCION', 3600)        # Segundos que se guardan los eventos en MySQL
+        app.config.setdefault('EVENTOS_HUECO_SEG', 5)           # Espera por eventos de transacciones aún abiertas
+        app.add_template_global(self.ultimo_evento, 'ultimo_evento')
+
+    # --- Lado del request ---
+
+    def ultimo_evento(self):
+        """Id del último evento confirmado: las páginas lo usan como punto de partida del stream."""
+        if not self.app.config['EVENTOS_ACTIVOS']:
+            return 0
+        cur = self.mysql.lectura.cursor()
+        try:
+            cur.execute("SELECT COALESCE(MAX(id_evento), 0) AS ultimo FROM eventos_productos")
+            return cur.fetchone()['ultimo']
+        finally:
+            cur.close()
+
+    def respuesta(self):
+        """Respuesta text/event-stream para la conexión actual (o 503 si el worker ya tiene el máximo)."""
+        with self._condicion:
+            if self._conexiones >= self.app.config['EVENTOS_MAX_CONEXIONES']:
+                self.rechazadas += 1
+                return Response("Demasiadas conexiones en vivo; se reintenta en unos segundos.\n", 503,
+                                {'Retry-After': '10'}, content_type='text/plain; charset=utf-8')
+        self.arrancar()
+
+        ultimo = request.headers.get('Last-Event-ID') or request.args.get('ultimo')
+        try:
+            ultimo = int(ultimo) if ultimo not in (None, '') else None
+        except ValueError:
+            ultimo = None
+        # Sin stream_with_context: el generador no usa la base ni el request, y así la
+        # conexión del pool y el resto del contexto se liberan en cuanto empieza el envío
+        respuesta = Response(self._transmitir(ultimo), content_type='text/event-stream; charset=utf-8')
+        respuesta.headers['Cache-Control'] = 'no-cache'
+        respuesta.headers['X-Accel-Buffering'] = 'no'  # Que nginx no acumule los eventos
+        return respuesta
+
+    def _transmitir(self, ultimo):
+        config = self.app.config
+        fin = time.monotonic() + config['EVENTOS_DURACION']
+        # La conexión se cuenta aquí y no en respuesta(): si el generador nunca
+        # arranca, tampoco llega al finally que la descuenta
+        with self._condicion:
+            self._conexiones += 1
+            self._condicion.notify_all()  # Despierta al lector si estaba sin conexiones
+        try:
+            yield "retry: 3000\n\n"
+            with self._condicion:
+                # Espera la primera lectura del worker (lector recién arrancado)
+                self._condicion.wait_for(lambda: self._desde is not None, timeout=config['EVENTOS_LATIDO'])
+                posicion = self._n
+                pendientes = []
+                if ultimo is not None and self._desde is not None:
+                    if ultimo < self._desde:
+                        pendientes = [['r', self._ultimo]]
+                    else:
+                        pendientes = [entrada for _, id_evento, entrada in self._eventos if id_evento > ultimo]
+            if pendientes:
+                yield _mensaje(pendientes)
+
+            while time.monotonic() < fin:
+                with self._condicion:
+                    if self._n == posicion:
+                        self._condicion.wait(min(config['EVENTOS_LATIDO'], max(0, fin - time.monotonic())))
+                    if self._n == posicion:
+                        texto = ": latido\n\n"
+                    elif self._lote[0] == posicion and self._lote[1] == self._n:
+                        texto = self._lote[2]
+                    elif not self._eventos or self._eventos[0][0] > posicion + 1:
+                        # Esta conexión se atrasó más que la memoria del worker
+                        texto = _mensaje([['r', self._ultimo]])
+                    else:
+                        texto = _mensaje([entrada for n, _, entrada in self._eventos if n > posicion])
+                    posicion = self._n
+                yield texto
+                self.enviados += 1
+        finally:
+            with self._condicion:
+                self._conexiones -= 1
+
+    # --- Lector (un hilo por worker) ---
+
+    def arrancar(self):
+        """Arranca el hilo del worker si no está corriendo (gunicorn.conf.py lo llama al iniciar el worker)."""
+        if self._hilo is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._hilo is not None and self._pid == os.getpid():
+                return
+            # Después de un fork el hilo del padre no existe en el hijo: se crea uno nuevo
+            self._pid = os.getpid()
+            self._hilo = threading.Thread(target=self._leer_siempre, name='eventos-productos', daemon=True)
+            self._hilo.start()
+
+    def _leer_siempre(self):
+        proxima_purga = 0
+        while True:
+            with self._condicion:
+                # Sin conexiones no se lee nada, pero la purga se sigue haciendo a su hora
+                self._condicion.wait_for(lambda: self._conexiones > 0,
+                                         timeout=max(0, proxima_purga - time.monotonic()))
+                con_conexiones = self._conexiones > 0
+            try:
+                with self.app.app_context():
+                    if con_conexiones:
+                        self._leer()
+                    if time.monotonic() >= proxima_purga:
+                        proxima_purga = time.monotonic() + PURGA_CADA
+                        purgar(self.mysql.connection, self.app.config['EVENTOS_RETENCION'])
+            except Exception as e:
+                self.app.logger.warning(f"Eventos de productos: no se pudieron leer o purgar: {e}")
+                time.sleep(1)
+            if con_conexiones:
+                time.sleep(self.app.config['EVENTOS_INTERVALO'])
+
+    def _leer(self):
+        memoria = self.app.config['EVENTOS_MEMORIA']
+        cur = self.mysql.connection.cursor()
+        try:
+            if self._desde is None:
+                # Arranque: se cargan los eventos recientes para poder retomar desde ellos
+                cur.execute("SELECT COALESCE(MAX(id_evento), 0) AS ultimo FROM eventos_productos")
+                inicio = max(0, cur.fetchone()['ultimo'] - memoria)
+                with self._condicion:
+                    self._desde = self._ultimo = inicio
+
+            huecos = sorted(self._huecos)
+            condicion = "id_evento > %s"
+            if huecos:
+                condicion += f" OR id_evento IN ({_marcadores(len(huecos))})"
+            cur.execute(f"{SQL_EVENTOS} WHERE {condicion} ORDER BY id_evento LIMIT %s",
+                        [self._ultimo] + huecos + [memoria + 1])
+            filas = cur.fetchall()
+        finally:
+            cur.close()
+
+        ahora = time.monotonic()
+        espera = self.app.config['EVENTOS_HUECO_SEG']
+        self._huecos = {id_evento: visto for id_evento, visto in self._huecos.items() if ahora - visto < espera}
+        if len(filas) > memoria:
+            # Muy atrasado (p. ej. el worker estuvo sin conexiones): se empieza desde aquí y
+            # las conexiones abiertas, que se perdieron eventos, reciben 'recargar'
+            with self._condicion:
+                self._eventos.clear()
+                self._desde = self._ultimo = filas[-1]['id_evento']
+                self._huecos = {}
+                self._n += 1
+                self._condicion.notify_all()
+            return
+
+        nuevas = []
+        for fila in filas:
+            id_evento = fila['id_evento']
+            if self._huecos.pop(id_evento, None) is None and id_evento > self._ultimo + 1:
+                # Ids salteados: transacciones que aún no confirman (o que se deshicieron)
+                if id_evento - self._ultimo - 1 <= MAX_HUECOS:
+                    self._huecos.update(dict.fromkeys(range(self._ultimo + 1, id_evento), ahora))
+            self._ultimo = max(self._ultimo, id_evento)
+            nuevas.append((id_evento, _entrada(fila)))
+        if not nuevas:
+            return
+
+        with self._condicion:
+            inicio = self._n
+            for id_evento, entrada in nuevas:
+                self._n += 1
+                self._eventos.append((self._n, id_evento, entrada))
+            while len(self._eventos) > memoria:
+                _, id_evento, _ = self._eventos.popleft()
+                self._desde = max(self._desde, id_evento)
+            self._lote = (inicio, self._n, _mensaje([entrada for _, entrada in nuevas]))
+            self._condicion.notify_all()
+
+    def estado(self):
+        with self._condicion:
+            return {'conexiones': self._conexiones, 'en_memoria': len(self._eventos), 'ultimo': self._ultimo,
+                    'enviados': self.enviados, 'rechazadas': self.rechazadas}
+
+
+# Instancia única; se inicializa en app.py con difusor.init_app(app, mysql)
+difusor = Difusor()
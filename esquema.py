@@ -0,0 +1,195 @@
+"""
+Migraciones del esquema: archivos SQL versionados en migraciones/, aplicados con 'flask migrar'.
+
+Cada archivo se llama NNNN_descripcion.sql y se aplica una sola vez, en orden de
+versión. La tabla 'migraciones_aplicadas' guarda cuáles se aplicaron y la suma
+SHA-256 de su contenido: si un archivo ya aplicado cambia, 'flask
+estado-migraciones' lo muestra y 'flask migrar' no sigue (los cambios van en
+una migración nueva).
+
+MySQL confirma cada sentencia DDL por separado, así que una migración no se
+puede deshacer a medias; en cambio, cada sentencia tiene que poder repetirse:
+CREATE TABLE IF NOT EXISTS, INSERT ... WHERE NOT EXISTS, y los errores "ya
+existe" de ALTER TABLE / CREATE INDEX (YA_EXISTE) se toman como aplicados. Si
+una migración falla, se corrige la causa y se vuelve a correr 'flask migrar',
+que la repite desde su primera sentencia.
+
+Un candado con nombre de MySQL (GET_LOCK) evita que dos despliegues migren a la vez.
+"""
+import hashlib
+import os
+import re
+
+import MySQLdb
+
+DIRECTORIO = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migraciones')
+CANDADO = 'migraciones_esquema'
+ESPERA_CANDADO = 60  # Segundos esperando a otro 'flask migrar'
+
+# Códigos de error de MySQL que significan que la sentencia ya estaba aplicada
+YA_EXISTE = {
+    1050: 'la tabla ya existe',
+    1060: 'la columna ya existe',
+    1061: 'el índice ya existe',
+    1068: 'la clave primaria ya existe',
+    1826: 'la clave foránea ya existe',
+}
+
+SQL_TABLA = """
+    CREATE TABLE IF NOT EXISTS migraciones_aplicadas (
+        version INT PRIMARY KEY,
+        nombre VARCHAR(255) NOT NULL,
+        suma CHAR(64) NOT NULL,
+        aplicada TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+_RE_ARCHIVO = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+
+class Migracion:
+    __slots__ = ('version', 'nombre', 'ruta', 'suma')
+
+    def __init__(self, version, nombre, ruta, suma):
+        self.version = version
+        self.nombre = nombre
+        self.ruta = ruta
+        self.suma = suma
+
+    def sentencias(self):
+        with open(self.ruta, encoding='utf-8') as archivo:
+            return dividir_sentencias(archivo.read())
+
+
+def listar(directorio=DIRECTORIO):
+    """Migraciones del directorio ordenadas por versión."""
+    migraciones = []
+    for archivo in sorted(os.listdir(directorio)):
+        coincidencia = _RE_ARCHIVO.match(archivo)
+        if coincidencia is None:
+            continue
+        ruta = os.path.join(directorio, archivo)
+        with open(ruta, 'rb') as contenido:
+            suma = hashlib.sha256(contenido.read()).hexdigest()
+        migraciones.append(Migracion(int(coincidencia.group(1)), coincidencia.group(2), ruta, suma))
+    versiones = [m.version for m in migraciones]
+    if len(set(versiones)) != len(versiones):
+        raise ValueError(f"Hay dos migraciones con la misma versión en {directorio}.")
+    return migraciones
+
+
+def dividir_sentencias(texto):
+    """
+    Separa un script SQL en sentencias por ';', sin cortar dentro de cadenas
+    ('...', "...", `...`) y descartando los comentarios (-- y /* */).
+    """
+    sentencias = []
+    actual = []
+    i = 0
+    n = len(texto)
+    while i < n:
+        c = texto[i]
+        if c in "'\"`":
+            fin = i + 1
+            while fin < n and texto[fin] != c:
+                fin += 2 if texto[fin] == '\\' else 1
+            actual.append(texto[i:fin + 1])
+            i = fin + 1
+        elif texto.startswith('--', i):
+            fin = texto.find('\n', i)
+            i = n if fin == -1 else fin
+        elif texto.startswith('/*', i):
+            fin = texto.find('*/', i + 2)
+            i = n if fin == -1 else fin + 2
+        elif c == ';':
+            sentencias.append(''.join(actual).strip())
+            actual = []
+            i += 1
+        else:
+            actual.append(c)
+            i += 1
+    sentencias.append(''.join(actual).strip())
+    return [s for s in sentencias if s]
+
+
+def aplicadas(conexion):
+    """{version: {'nombre', 'suma', 'aplicada'}} de las migraciones ya registradas."""
+    cur = conexion.cursor()
+    try:
+        cur.execute(SQL_TABLA)
+        cur.execute("SELECT version, nombre, suma, aplicada FROM migraciones_aplicadas ORDER BY version")
+        return {fila['version']: fila for fila in cur.fetchall()}
+    finally:
+        cur.close()
+
+
+def estado(conexion, directorio=DIRECTORIO):
+    """
+    Lista de (version, nombre, situacion) con situacion 'aplicada', 'pendiente',
+    'modificada' (el archivo cambió después de aplicarse) o 'sin archivo'.
+    """
+    registradas = aplicadas(conexion)
+    filas = []
+    for migracion in listar(directorio):
+        registrada = registradas.pop(migracion.version, None)
+        if registrada is None:
+            situacion = 'pendiente'
+        elif registrada['suma'] != migracion.suma:
+            situacion = 'modificada'
+        else:
+            situacion = 'aplicada'
+        filas.append((migracion.version, migracion.nombre, situacion))
+    filas.extend((version, fila['nombre'], 'sin archivo') for version, fila in registradas.items())
+    return sorted(filas)
+
+
+def migrar(conexion, hasta=None, simular=False, echo=print, directorio=DIRECTORIO):
+    """
+    Aplica en orden las migraciones pendientes (hasta la versión 'hasta', si se
+    indica). Con simular=True solo informa cuáles se aplicarían. Devuelve la
+    lista de versiones aplicadas.
+    """
+    cur = conexion.cursor()
+    try:
+        cur.execute("SELECT GET_LOCK(%s, %s) AS obtenido", (CANDADO, ESPERA_CANDADO))
+        if not cur.fetchone()['obtenido']:
+            raise RuntimeError("Otro proceso está aplicando migraciones; se esperó demasiado el candado.")
+        try:
+            registradas = aplicadas(conexion)
+            modificadas = [m for m in listar(directorio)
+                           if m.version in registradas and registradas[m.version]['suma'] != m.suma]
+            if modificadas:
+                raise RuntimeError("Migraciones ya aplicadas cuyo archivo cambió: "
+                                   + ", ".join(f"{m.version:04d}_{m.nombre}" for m in modificadas)
+                                   + ". Los cambios van en una migración nueva.")
+            pendientes = [m for m in listar(directorio)
+                          if m.version not in registradas and (hasta is None or m.version <= hasta)]
+            for migracion in pendientes:
+                echo(f"{migracion.version:04d}_{migracion.nombre}")
+                if simular:
+                    continue
+                for sentencia in migracion.sentencias():
+                    try:
+                        cur.execute(sentencia)
+                    except (MySQLdb.OperationalError, MySQLdb.ProgrammingError) as e:
+                        if e.args[0] not in YA_EXISTE:
+                            conexion.rollback()
+                            raise
+                        echo(f"  ya aplicada ({YA_EXISTE[e.args[0]]}): {_resumen(sentencia)}")
+                cur.execute(
+                    "INSERT INTO migraciones_aplicadas (version, nombre, suma) VALUES (%s, %s, %s)",
+                    (migracion.version, migracion.nombre, migracion.suma)
+                )
+                # Las sentencias DML de la migración y su registro se confirman juntas
+                conexion.commit()
+            return [m.version for m in pendientes]
+        finally:
+            cur.execute("SELECT RELEASE_LOCK(%s)", (CANDADO,))
+            cur.fetchall()
+    finally:
+        cur.close()
+
+
+def _resumen(sentencia, largo=70):
+    texto = " ".join(sentencia.split())
+    return texto if len(texto) <= largo else texto[:largo - 3] + "..."
@@ -0,0 +1,163 @@
+"""
+Exportación completa de productos, clientes y compras en CSV o NDJSON.
+
+Las filas se leen con un cursor del lado del servidor (SSCursor, sin buffer):
+MySQL las envía a medida que se consumen, en lugar de que fetchall() las
+materialice todas en el worker. Cada bloque de filas se convierte a texto y se
+entrega al generador de la respuesta, así que la memoria usada no depende del
+tamaño de la tabla.
+
+Las exportaciones se ordenan por la clave primaria; con 'despues_id' se puede
+retomar una exportación interrumpida a partir del último id recibido.
+"""
+import csv
+import datetime
+import json
+
+import MySQLdb
+import MySQLdb.cursors
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+# nombre -> (consulta sin WHERE, columna de id, columna de fecha o None)
+EXPORTACIONES = {
+    'productos': (
+        "SELECT id_producto, nombre, precio, stock FROM productos",
+        'id_producto', None,
+    ),
+    'clientes': (
+        "SELECT id_cliente, nombre, email, telefono FROM clientes",
+        'id_cliente', None,
+    ),
+    'compras': (
+        """
+        SELECT co.id_compra, co.id_cliente, c.nombre AS nombre_cliente,
+               co.id_producto, p.nombre AS nombre_producto,
+               co.cantidad, co.precio_unitario, co.fecha_compra
+        FROM compras co
+        JOIN clientes c ON c.id_cliente = co.id_cliente
+        JOIN productos p ON p.id_producto = co.id_producto
+        """,
+        'co.id_compra', 'co.fecha_compra',
+    ),
+}
+
+TAM_BLOQUE = 1000  # Filas que se piden al servidor y se envían juntas
+
+
+class FiltroInvalido(ValueError):
+    pass
+
+
+def _entero(args, nombre):
+    valor = args.get(nombre)
+    if valor in (None, ''):
+        return None
+    try:
+        return int(valor)
+    except ValueError:
+        raise FiltroInvalido(f"'{nombre}' debe ser un número entero.")
+
+
+def _fecha(args, nombre):
+    valor = args.get(nombre)
+    if valor in (None, ''):
+        return None
+    try:
+        return datetime.datetime.fromisoformat(valor)
+    except ValueError:
+        raise FiltroInvalido(f"'{nombre}' debe ser una fecha AAAA-MM-DD o AAAA-MM-DDTHH:MM:SS.")
+
+
+def construir_consulta(nombre, args):
+    """
+    Arma la consulta de la exportación 'nombre' con los filtros opcionales de
+    request.args: despues_id (exclusivo), hasta_id, desde y hasta (fechas, solo compras).
+    """
+    consulta, columna_id, columna_fecha = EXPORTACIONES[nombre]
+    filtros = []
+    parametros = []
+
+    despues_id = _entero(args, 'despues_id')
+    if despues_id is not None:
+        filtros.append(f"{columna_id} > %s")
+        parametros.append(despues_id)
+    hasta_id = _entero(args, 'hasta_id')
+    if hasta_id is not None:
+        filtros.append(f"{columna_id} <= %s")
+        parametros.append(hasta_id)
+
+    if columna_fecha:
+        desde = _fecha(args, 'desde')
+        if desde is not None:
+            filtros.append(f"{columna_fecha} >= %s")
+            parametros.append(desde)
+        hasta = _fecha(args, 'hasta')
+        if hasta is not None:
+            filtros.append(f"{columna_fecha} < %s")
+            parametros.append(hasta)
+        id_cliente = _entero(args, 'id_cliente')
+        if id_cliente is not None:
+            filtros.append("co.id_cliente = %s")
+            parametros.append(id_cliente)
+
+    if filtros:
+        consulta += " WHERE " + " AND ".join(filtros)
+    consulta += f" ORDER BY {columna_id}"
+    return consulta, parametros
+
+
+class _Eco:
+    """Objeto tipo archivo que devuelve lo escrito: permite usar csv.writer sin buffer."""
+    def write(self, valor):
+        return valor
+
+
+def _valor_json(valor):
+    if isinstance(valor, (datetime.datetime, datetime.date)):
+        return valor.isoformat()
+    return str(valor)
+
+
+def generar(conexion, consulta, parametros, formato):
+    """
+    Generador que produce la exportación por bloques de texto. Si el cliente
+    corta la descarga, se cierra la conexión (en lugar de leer el resto del
+    resultado para poder reutilizarla) y el pool la descarta.
+    """
+    cur = conexion.cursor(MySQLdb.cursors.SSCursor)
+    completa = False
+    try:
+        cur.execute(consulta, parametros)
+        columnas = [d[0] for d in cur.description]
+
+        if formato == 'csv':
+            escritor = csv.writer(_Eco())
+            yield escritor.writerow(columnas)
+            while True:
+                filas = cur.fetchmany(TAM_BLOQUE)
+                if not filas:
+                    break
+                yield "".join(escritor.writerow(fila) for fila in filas)
+        else:
+            while True:
+                filas = cur.fetchmany(TAM_BLOQUE)
+                if not filas:
+                    break
+                yield "".join(
+                    json.dumps(dict(zip(columnas, fila)), ensure_ascii=False,
+                               separators=(',', ':'), default=_valor_json) + "\n"
+                    for fila in filas
+                )
+        completa = True
+    finally:
+        if completa:
+            cur.close()
+        else:
+            try:
+                conexion.close()
+            except MySQLdb.Error:
+                pass
@@ -0,0 +1,58 @@
+# Configuración de gunicorn. Se carga automáticamente al ejecutar `gunicorn app:app`
+# (ver Procfile) porque está en el directorio de trabajo.
+import os
+
+# Varios hilos por worker (gthread): mientras un hilo espera un hash de contraseña
+# en el pool de procesos o a MySQL, los demás siguen atendiendo requests.
+# Los hilos se reparten entre los cupos de las clases de admision.py (ADMISION_CLASES:
+# 1 + 2 + 2 + 4 = 9), las conexiones de stock en vivo, que ocupan un hilo mientras
+# están abiertas pero no un cupo (EVENTOS_MAX_CONEXIONES = 6), y uno libre para las
+# rutas exentas (salud, métricas). Si se cambia alguno, post_worker_init avisa.
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+
+
+def post_worker_init(worker):
+    # Sin static/dist/manifest.json las páginas saldrían con los estáticos sin huella
+    # ni caché: mejor que el worker no arranque (gunicorn se detiene con "Worker
+    # failed to boot") a que el problema pase inadvertido en producción
+    from activos import activos
+    if activos.app is not None and activos.app.config['ACTIVOS_OBLIGATORIOS'] and not activos.manifest:
+        raise RuntimeError(f"No hay manifest de estáticos en {activos.app.config['ACTIVOS_DESTINO']}: "
+                           f"correr 'flask --app app construir-activos' al construir el despliegue "
+                           f"(o FLASK_ACTIVOS_OBLIGATORIOS=false para arrancar sin él)")
+
+    # Abrir las conexiones mínimas del pool en cada worker, ya después del fork,
+    # para que el primer request no pague el handshake TCP + autenticación de MySQL.
+    from Conexion.conexion import mysql
+    if mysql.app is not None:
+        mysql.calentar()
+
+    # Arrancar los procesos de hash de contraseñas del worker
+    from contrasenas import contrasenas
+    if contrasenas.app is not None:
+        contrasenas.calentar()
+
+    # Hilo de stock en vivo del worker: lee eventos para las conexiones y purga los viejos
+    from en_vivo import difusor
+    if difusor.app is not None and difusor.app.config['EVENTOS_ACTIVOS']:
+        difusor.arrancar()
+
+    # Cupos de admisión + conexiones en vivo + uno para las rutas exentas: si no entran
+    # en los hilos, una clase saturada o los streams dejan sin hilo a las demás
+    from admision import admision
+    if admision.app is not None:
+        config = admision.app.config
+        necesarios = 1 + (config['EVENTOS_MAX_CONEXIONES'] if config.get('EVENTOS_ACTIVOS') else 0)
+        if config['ADMISION_ACTIVA']:
+            necesarios += sum(clase['concurrencia'] for clase in config['ADMISION_CLASES'].values())
+        if necesarios > worker.cfg.threads:
+            worker.log.warning(f"threads={worker.cfg.threads} es menos que los {necesarios} hilos que "
+                               f"suman ADMISION_CLASES, EVENTOS_MAX_CONEXIONES y las rutas exentas")
+
+
+def worker_exit(server, worker):
+    # Sumar las métricas del worker que termina (reciclado o reinicio) al archivo de
+    # terminados y borrar su volcado, para que /metrics no lo siga sumando aparte
+    from metricas import metricas
+    if metricas.app is not None and metricas.app.config['METRICAS_DIR']:
+        metricas.archivar()
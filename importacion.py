@@ -0,0 +1,226 @@
+"""
+Importación masiva de productos y clientes desde CSV, JSON o NDJSON.
+
+El archivo se lee fila por fila (nunca se carga completo en memoria), cada fila
+se valida con las mismas reglas de los formularios (validaciones.py) y las filas
+válidas se insertan por lotes con executemany, que MySQLdb convierte en un único
+INSERT multi-fila por lote. Se hace commit cada cierto número de filas.
+
+Si el registro ya existe se actualiza (upsert) usando la clave natural:
+el nombre para productos y el email para clientes (índices UNIQUE).
+"""
+import csv
+import io
+import json
+
+from validaciones import validar_producto, validar_cliente
+
+# Tamaño máximo (caracteres) de un elemento de un arreglo JSON: un elemento mal
+# formado no se puede decodificar nunca y, sin este límite, se seguiría leyendo
+# el resto del archivo en memoria esperando que se complete
+ELEMENTO_JSON_MAXIMO = 4 * 1024 * 1024
+
+# tabla -> (columnas del archivo, función de validación, sentencia de upsert)
+TABLAS = {
+    'productos': (
+        ('nombre', 'precio', 'stock'),
+        validar_producto,
+        """
+        INSERT INTO productos (nombre, precio, stock) VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE precio = VALUES(precio), stock = VALUES(stock)
+        """,
+    ),
+    'clientes': (
+        ('nombre', 'email', 'telefono'),
+        validar_cliente,
+        """
+        INSERT INTO clientes (nombre, email, telefono) VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE nombre = VALUES(nombre), telefono = VALUES(telefono)
+        """,
+    ),
+}
+
+FORMATOS = ('csv', 'json', 'ndjson')
+MAX_ERRORES_INFORME = 1000  # Se cuentan todos, pero solo se guarda el detalle de los primeros
+
+
+class InformeImportacion:
+    __slots__ = ('tabla', 'procesadas', 'validas', 'rechazadas', 'errores', 'abortada')
+
+    def __init__(self, tabla):
+        self.tabla = tabla
+        self.procesadas = 0   # Filas leídas del archivo
+        self.validas = 0      # Filas insertadas o actualizadas
+        self.rechazadas = 0   # Filas con errores de validación o de formato
+        self.errores = []     # [(numero_fila, motivo)] (máximo MAX_ERRORES_INFORME)
+        self.abortada = None  # Motivo si la importación se detuvo antes del final (archivo mal formado o error de la BD)
+
+    def registrar_error(self, numero_fila, motivo):
+        self.rechazadas += 1
+        if len(self.errores) < MAX_ERRORES_INFORME:
+            self.errores.append((numero_fila, motivo))
+
+
+# --- Lectura en streaming ---
+
+def detectar_formato(nombre_archivo):
+    extension = nombre_archivo.rsplit('.', 1)[-1].lower() if '.' in nombre_archivo else ''
+    if extension in ('jsonl', 'ndjson'):
+        return 'ndjson'
+    return extension if extension in FORMATOS else None
+
+
+def _filas_csv(texto):
+    lector = csv.DictReader(texto)
+    for fila in lector:
+        yield fila
+
+
+def _filas_ndjson(texto):
+    for linea in texto:
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            yield json.loads(linea)
+        except ValueError as e:
+            yield ValueError(f'JSON inválido: {e}')
+
+
+def _filas_json(texto, tam_bloque=65536, maximo=ELEMENTO_JSON_MAXIMO):
+    """
+    Recorre un arreglo JSON ([{...}, {...}]) elemento por elemento leyendo el
+    archivo por bloques, sin cargarlo entero (json.load necesitaría todo el archivo).
+    Un elemento de más de 'maximo' caracteres se trata como archivo mal formado.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    fin = False
+
+    def leer_mas():
+        nonlocal buffer, pos, fin
+        bloque = texto.read(tam_bloque)
+        if not bloque:
+            fin = True
+        buffer = buffer[pos:] + bloque
+        pos = 0
+
+    def saltar_espacios():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer) or fin:
+                return
+            leer_mas()
+
+    saltar_espacios()
+    if pos >= len(buffer) or buffer[pos] != '[':
+        raise ValueError('El archivo JSON debe contener un arreglo de objetos.')
+    pos += 1
+
+    primero = True
+    while True:
+        saltar_espacios()
+        if pos >= len(buffer):
+            raise ValueError('El arreglo JSON está incompleto.')
+        if buffer[pos] == ']':
+            return
+        if not primero:
+            if buffer[pos] != ',':
+                raise ValueError('Se esperaba una coma entre los elementos del arreglo JSON.')
+            pos += 1
+            saltar_espacios()
+        primero = False
+        while True:
+            try:
+                objeto, pos = decoder.raw_decode(buffer, pos)
+                break
+            except ValueError:
+                # El elemento puede estar partido entre dos bloques: leer más y reintentar
+                if fin:
+                    raise ValueError('El arreglo JSON está incompleto o mal formado.')
+                if len(buffer) - pos > maximo:
+                    raise ValueError(f'Un elemento del arreglo JSON supera {maximo} caracteres '
+                                     f'o está mal formado.')
+                leer_mas()
+        yield objeto
+
+
+def leer_filas(binario, formato):
+    """Genera los registros de un archivo abierto en modo binario."""
+    texto = io.TextIOWrapper(binario, encoding='utf-8-sig', newline='')
+    if formato == 'csv':
+        return _filas_csv(texto)
+    if formato == 'ndjson':
+        return _filas_ndjson(texto)
+    if formato == 'json':
+        return _filas_json(texto)
+    raise ValueError(f'Formato no soportado: {formato}')
+
+
+# --- Carga por lotes ---
+
+def importar(conexion, tabla, filas, tam_lote=1000, commit_cada=10000):
+    """
+    Valida e inserta 'filas' (iterable de dicts) en 'tabla' por lotes.
+    Devuelve un InformeImportacion. Los errores de validación se anotan y la
+    importación continúa; un error de la base de datos deshace el lote en curso
+    (lo ya confirmado se conserva) y detiene la importación.
+    """
+    columnas, validar, sentencia = TABLAS[tabla]
+    informe = InformeImportacion(tabla)
+    lote = []
+    pendientes = 0  # Filas escritas desde el último commit
+
+    cur = conexion.cursor()
+
+    def escribir_lote():
+        nonlocal lote, pendientes
+        if lote:
+            cur.executemany(sentencia, lote)
+            pendientes += len(lote)
+            lote = []
+
+    def confirmar():
+        nonlocal pendientes
+        conexion.commit()
+        informe.validas += pendientes
+        pendientes = 0
+
+    try:
+        try:
+            # Los registros se numeran desde 1 (en CSV, sin contar la cabecera)
+            for numero, fila in enumerate(filas, start=1):
+                informe.procesadas += 1
+                if isinstance(fila, Exception):
+                    informe.registrar_error(numero, str(fila))
+                    continue
+                if not isinstance(fila, dict):
+                    informe.registrar_error(numero, 'Cada registro debe ser un objeto con campos.')
+                    continue
+
+                datos, error = validar(*(fila.get(c) for c in columnas))
+                if error:
+                    informe.registrar_error(numero, error)
+                    continue
+                lote.append(datos)
+
+                if len(lote) >= tam_lote:
+                    escribir_lote()
+                    if pendientes >= commit_cada:
+                        confirmar()
+        except (ValueError, csv.Error) as e:
+            # Archivo mal formado (JSON incompleto, codificación inválida, campo
+            # CSV por encima de csv.field_size_limit()...):
+            # se conserva lo leído hasta ese punto y se informa el motivo
+            informe.abortada = str(e)
+        escribir_lote()
+        confirmar()
+    except Exception as e:
+        conexion.rollback()
+        informe.abortada = f'Error de la base de datos: {e}'
+    finally:
+        cur.close()
+    return informe
@@ -0,0 +1,454 @@
+"""
+Instrumentación de requests y de SQL con exposición en formato Prometheus.
+
+- Cada cursor que entrega `mysql.connection.cursor()` se envuelve en un
+  CursorInstrumentado que mide cada sentencia (agrupada por su texto
+  normalizado), cuenta las filas leídas y acumula los totales del request.
+- Al terminar cada request se registran la duración total, el número de
+  consultas y de filas por ruta (endpoint).
+- Las sentencias que superan METRICAS_SQL_LENTO_MS se escriben en el log
+  'sql_lento' con la ruta que las ejecutó.
+- La ruta /metrics (ver app.py) devuelve los histogramas en formato de texto
+  de Prometheus.
+- Si se configura METRICAS_MUESTRAS_SQL (ruta de un archivo), la primera vez
+  que el proceso ejecuta cada sentencia se anota con sus parámetros, para que
+  el asesor de índices la pase por EXPLAIN (ver asesor_indices.py).
+
+Cada worker de gunicorn tiene su propio registro. Si se configura METRICAS_DIR,
+cada worker vuelca su registro a ese directorio cada pocos segundos y /metrics
+suma los de todos los workers, sin importar cuál atienda la petición. Cuando un
+worker termina (gunicorn lo recicla o se reinicia), su volcado se suma a
+'metricas-terminados.json' y se borra: al salir (worker_exit en
+gunicorn.conf.py) o, si murió sin avisar, en el siguiente /metrics que note que
+su pid ya no existe. Así los contadores no se cuentan dos veces ni retroceden.
+
+El costo por sentencia es un perf_counter() y una búsqueda en un dict; no hay
+hilos ni E/S en el camino del request salvo el volcado periódico opcional.
+"""
+import functools
+import glob
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: un solo proceso, no hace falta candado
+    fcntl = None
+
+from flask import g, has_app_context, has_request_context, request
+
+BUCKETS_DURACION = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_CONSULTAS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+BUCKETS_FILAS = (0, 1, 10, 100, 1000, 10000, 100000)
+VOLCADO_TERMINADOS = 'metricas-terminados.json'  # Suma de los workers que ya no existen
+MAX_SENTENCIAS = 500  # Límite de textos SQL distintos como etiqueta (el resto va a 'otras')
+
+log_sql_lento = logging.getLogger('sql_lento')
+
+
+# --- Normalización de SQL ---
+
+_RE_ESPACIOS = re.compile(r"\s+")
+_RE_CADENA = re.compile(r"'(?:[^'\\]|\\.)*'")
+_RE_NUMERO = re.compile(r"(?<![\w.])\d+(?:\.\d+)?\b")
+_RE_LISTA = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_RE_CASE = re.compile(r"(?:WHEN \? THEN \? ?){2,}", re.IGNORECASE)
+_RE_FILAS = re.compile(r"(\(\?(?:, \?)*\))(?:\s*,\s*\(\?(?:, \?)*\))+")
+
+
+@functools.lru_cache(maxsize=2048)
+def normalizar_sql(sql):
+    """
+    Texto de la sentencia sin valores concretos, para agrupar sus métricas:
+    'SELECT ... WHERE id IN (%s, %s, %s)' -> 'SELECT ... WHERE id IN (?+)'.
+    """
+    if isinstance(sql, bytes):
+        sql = sql.decode('utf-8', 'replace')
+    texto = _RE_ESPACIOS.sub(' ', sql).strip()
+    texto = texto.replace('%s', '?')
+    texto = _RE_CADENA.sub('?', texto)
+    texto = _RE_NUMERO.sub('?', texto)
+    texto = _RE_CASE.sub('WHEN ? THEN ? ... ', texto)
+    texto = _RE_FILAS.sub(r'\1, ...', texto)
+    texto = _RE_LISTA.sub('(?+)', texto)
+    return texto
+
+
+# --- Registro de métricas ---
+
+class Registro:
+    """Contadores e histogramas con etiquetas, seguros entre hilos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metricas = {}  # nombre -> {'tipo', 'ayuda', 'buckets', 'etiquetas', 'valores'}
+
+    def definir(self, nombre, tipo, ayuda, etiquetas, buckets=None):
+        self._metricas[nombre] = {'tipo': tipo, 'ayuda': ayuda, 'etiquetas': tuple(etiquetas),
+                                  'buckets': buckets, 'valores': {}}
+
+    def incrementar(self, nombre, valores_etiquetas, cantidad=1):
+        metrica = self._metricas[nombre]
+        with self._lock:
+            metrica['valores'][valores_etiquetas] = metrica['valores'].get(valores_etiquetas, 0) + cantidad
+
+    def observar(self, nombre, valores_etiquetas, valor):
+        metrica = self._metricas[nombre]
+        buckets = metrica['buckets']
+        with self._lock:
+            serie = metrica['valores'].get(valores_etiquetas)
+            if serie is None:
+                serie = metrica['valores'][valores_etiquetas] = [[0] * len(buckets), 0.0, 0]
+            for i, limite in enumerate(buckets):
+                if valor <= limite:
+                    serie[0][i] += 1
+                    break
+            serie[1] += valor
+            serie[2] += 1
+
+    def exportar(self):
+        """Copia serializable (JSON) de todos los valores."""
+        with self._lock:
+            return {nombre: [[list(k), v if not isinstance(v, list) else [list(v[0]), v[1], v[2]]]
+                             for k, v in m['valores'].items()]
+                    for nombre, m in self._metricas.items()}
+
+    @staticmethod
+    def serializar(valores):
+        """Un resultado de sumar() en el formato de exportar(), para volver a guardarlo."""
+        return {nombre: [[list(k), v] for k, v in series.items()] for nombre, series in valores.items()}
+
+    def sumar(self, exportados):
+        """Combina varios exportar() (uno por worker) en un solo diccionario de valores."""
+        total = {}
+        for datos in exportados:
+            for nombre, series in datos.items():
+                if nombre not in self._metricas:
+                    continue
+                destino = total.setdefault(nombre, {})
+                for etiquetas, valor in series:
+                    clave = tuple(etiquetas)
+                    if isinstance(valor, list):
+                        actual = destino.get(clave)
+                        if actual is None:
+                            destino[clave] = [list(valor[0]), valor[1], valor[2]]
+                        else:
+                            actual[0] = [a + b for a, b in zip(actual[0], valor[0])]
+                            actual[1] += valor[1]
+                            actual[2] += valor[2]
+                    else:
+                        destino[clave] = destino.get(clave, 0) + valor
+        return total
+
+    def texto_prometheus(self, valores, extras=()):
+        lineas = []
+        for nombre, metrica in self._metricas.items():
+            lineas.append(f"# HELP {nombre} {metrica['ayuda']}")
+            lineas.append(f"# TYPE {nombre} {metrica['tipo']}")
+            for clave, valor in sorted(valores.get(nombre, {}).items()):
+                etiquetas = ",".join(f'{e}="{_escapar(v)}"' for e, v in zip(metrica['etiquetas'], clave))
+                if metrica['tipo'] == 'histogram':
+                    acumulado = 0
+                    for limite, n in zip(metrica['buckets'], valor[0]):
+                        acumulado += n
+                        lineas.append(f'{nombre}_bucket{{{etiquetas},le="{limite}"}} {acumulado}')
+                    lineas.append(f'{nombre}_bucket{{{etiquetas},le="+Inf"}} {valor[2]}')
+                    lineas.append(f"{nombre}_sum{{{etiquetas}}} {valor[1]}")
+                    lineas.append(f"{nombre}_count{{{etiquetas}}} {valor[2]}")
+                else:
+                    lineas.append(f"{nombre}{{{etiquetas}}} {valor}")
+        lineas.extend(extras)
+        return "\n".join(lineas) + "\n"
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# --- Envolturas de conexión y cursor ---
+
+class CursorInstrumentado:
+    __slots__ = ('_cursor', '_metricas')
+
+    def __init__(self, cursor, metricas):
+        self._cursor = cursor
+        self._metricas = metricas
+
+    def _medir(self, metodo, sql, args, muestra):
+        inicio = time.perf_counter()
+        try:
+            return metodo(sql, args)
+        finally:
+            self._metricas.registrar_sentencia(sql, time.perf_counter() - inicio, muestra)
+
+    def execute(self, sql, args=None):
+        return self._medir(self._cursor.execute, sql, args, args)
+
+    def executemany(self, sql, args):
+        # Como muestra basta la primera fila: el INSERT de una fila tiene el mismo plan
+        muestra = args[0] if isinstance(args, (list, tuple)) and args else None
+        return self._medir(self._cursor.executemany, sql, args, muestra)
+
+    def fetchone(self):
+        fila = self._cursor.fetchone()
+        if fila is not None:
+            self._metricas.registrar_filas(1)
+        return fila
+
+    def fetchmany(self, size=None):
+        filas = self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany()
+        self._metricas.registrar_filas(len(filas))
+        return filas
+
+    def fetchall(self):
+        filas = self._cursor.fetchall()
+        self._metricas.registrar_filas(len(filas))
+        return filas
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+
+class ConexionInstrumentada:
+    __slots__ = ('_conexion', '_metricas')
+
+    def __init__(self, conexion, metricas):
+        self._conexion = conexion
+        self._metricas = metricas
+
+    def cursor(self, *args, **kwargs):
+        return CursorInstrumentado(self._conexion.cursor(*args, **kwargs), self._metricas)
+
+    def __getattr__(self, nombre):
+        return getattr(self._conexion, nombre)
+
+
+# --- Integración con Flask ---
+
+class Metricas:
+    def __init__(self, app=None, mysql=None):
+        self.app = None
+        self.registro = Registro()
+        self._sentencias = set()
+        self._muestreadas = set()  # Sentencias ya anotadas en METRICAS_MUESTRAS_SQL
+        self._lock_muestras = threading.Lock()
+        self._ultimo_volcado = 0.0
+        self._archivado = False  # Tras archivar() este worker ya no vuelca (se contaría dos veces)
+        self._fuentes = []  # Funciones que devuelven líneas extra (estado del pool, caché, ...)
+        if app is not None:
+            self.init_app(app, mysql)
+
+    def init_app(self, app, mysql):
+        self.app = app
+        app.config.setdefault('METRICAS_ACTIVAS', True)
+        app.config.setdefault('METRICAS_SQL_LENTO_MS', 200)
+        app.config.setdefault('METRICAS_TOKEN', None)     # Bearer token para el scraper de Prometheus
+        app.config.setdefault('METRICAS_DIR', None)       # Directorio compartido entre workers
+        app.config.setdefault('METRICAS_VOLCADO_SEG', 5)
+        app.config.setdefault('METRICAS_MUESTRAS_SQL', None)  # Archivo de muestras para el asesor de índices
+
+        r = self.registro
+        r.definir('app_http_request_duration_seconds', 'histogram',
+                  'Duración total del request por ruta.', ('endpoint', 'method'), BUCKETS_DURACION)
+        r.definir('app_http_requests_total', 'counter',
+                  'Requests atendidos por ruta y código de estado.', ('endpoint', 'status'))
+        r.definir('app_http_errors_total', 'counter',
+                  'Excepciones no controladas por ruta.', ('endpoint',))
+        r.definir('app_sql_queries_per_request', 'histogram',
+                  'Sentencias SQL ejecutadas por request.', ('endpoint',), BUCKETS_CONSULTAS)
+        r.definir('app_sql_rows_per_request', 'histogram',
+                  'Filas leídas de MySQL por request.', ('endpoint',), BUCKETS_FILAS)
+        r.definir('app_sql_time_per_request_seconds', 'histogram',
+                  'Tiempo total en SQL por request.', ('endpoint',), BUCKETS_DURACION)
+        r.definir('app_sql_statement_duration_seconds', 'histogram',
+                  'Duración de cada sentencia SQL (texto normalizado).', ('sql',), BUCKETS_DURACION)
+        r.definir('app_sql_slow_total', 'counter',
+                  'Sentencias que superaron METRICAS_SQL_LENTO_MS.', ('endpoint',))
+
+        if app.config['METRICAS_ACTIVAS']:
+            mysql.envoltura = lambda conexion: ConexionInstrumentada(conexion, self)
+            app.before_request(self._inicio_request)
+            app.after_request(self._registrar_estado)
+            app.teardown_request(self._fin_request)
+
+    def agregar_fuente(self, funcion):
+        """Registra una función que devuelve líneas Prometheus adicionales (gauges)."""
+        self._fuentes.append(funcion)
+        return funcion
+
+    # --- Registro por sentencia y por request ---
+
+    def registrar_sentencia(self, sql, duracion, muestra=None):
+        texto = normalizar_sql(sql)
+        if self.app.config['METRICAS_MUESTRAS_SQL'] and texto not in self._muestreadas:
+            self._guardar_muestra(texto, sql, muestra)
+        if texto not in self._sentencias:
+            if len(self._sentencias) >= MAX_SENTENCIAS:
+                texto = 'otras'
+            else:
+                self._sentencias.add(texto)
+        self.registro.observar('app_sql_statement_duration_seconds', (texto,), duracion)
+
+        endpoint = 'fuera_de_request'
+        if has_app_context():
+            datos = g.get('_metricas')
+            if datos is not None:
+                datos[0] += 1
+                datos[2] += duracion
+                endpoint = request.endpoint or 'desconocido'
+
+        if duracion * 1000 >= self.app.config['METRICAS_SQL_LENTO_MS']:
+            self.registro.incrementar('app_sql_slow_total', (endpoint,))
+            log_sql_lento.warning(f"{duracion * 1000:.1f} ms en {endpoint}: {texto}")
+
+    def _guardar_muestra(self, texto, sql, muestra):
+        """Anota una línea JSON {sql, args, endpoint} la primera vez que este proceso ve la sentencia."""
+        with self._lock_muestras:
+            if texto in self._muestreadas:
+                return
+            self._muestreadas.add(texto)
+        if isinstance(sql, bytes):
+            sql = sql.decode('utf-8', 'replace')
+        endpoint = request.endpoint if has_request_context() else None
+        linea = json.dumps({'sql': sql, 'args': muestra, 'endpoint': endpoint}, default=str, ensure_ascii=False)
+        try:
+            with open(self.app.config['METRICAS_MUESTRAS_SQL'], 'a', encoding='utf-8') as archivo:
+                archivo.write(linea + "\n")
+        except OSError as e:
+            self.app.logger.warning(f"No se pudo anotar la muestra de SQL: {e}")
+
+    def registrar_filas(self, n):
+        if has_app_context():
+            datos = g.get('_metricas')
+            if datos is not None:
+                datos[1] += n
+
+    def _inicio_request(self):
+        # [consultas, filas, tiempo_sql, inicio]
+        g._metricas = [0, 0, 0.0, time.perf_counter()]
+
+    def _fin_request(self, exception):
+        datos = g.pop('_metricas', None)
+        if datos is None:
+            return
+        endpoint = request.endpoint or 'desconocido'
+        r = self.registro
+        r.observar('app_http_request_duration_seconds', (endpoint, request.method),
+                   time.perf_counter() - datos[3])
+        r.observar('app_sql_queries_per_request', (endpoint,), datos[0])
+        r.observar('app_sql_rows_per_request', (endpoint,), datos[1])
+        r.observar('app_sql_time_per_request_seconds', (endpoint,), datos[2])
+        if exception is not None:
+            r.incrementar('app_http_errors_total', (endpoint,))
+        self._volcar_si_toca()
+
+    def _registrar_estado(self, respuesta):
+        """after_request: cuenta el código de estado de la respuesta."""
+        self.registro.incrementar('app_http_requests_total',
+                                  (request.endpoint or 'desconocido', str(respuesta.status_code)))
+        return respuesta
+
+    # --- Volcado entre workers ---
+
+    def _ruta_volcado(self, pid=None):
+        return os.path.join(self.app.config['METRICAS_DIR'], f"metricas-{pid or os.getpid()}.json")
+
+    def _volcar_si_toca(self, forzar=False):
+        directorio = self.app.config['METRICAS_DIR']
+        ahora = time.monotonic()
+        if not directorio or self._archivado or (not forzar and ahora - self._ultimo_volcado < self.app.config['METRICAS_VOLCADO_SEG']):
+            return
+        self._ultimo_volcado = ahora
+        try:
+            os.makedirs(directorio, exist_ok=True)
+            temporal = self._ruta_volcado() + '.tmp'
+            with open(temporal, 'w', encoding='utf-8') as archivo:
+                json.dump(self.registro.exportar(), archivo)
+            os.replace(temporal, self._ruta_volcado())  # Reemplazo atómico
+        except OSError as e:
+            self.app.logger.warning(f"No se pudieron volcar las métricas: {e}")
+
+    def archivar(self, pid=None):
+        """
+        Suma el volcado del worker 'pid' a VOLCADO_TERMINADOS y lo borra. Sin
+        'pid', el de este worker con su registro en vivo (al terminar, worker_exit).
+        """
+        directorio = self.app.config['METRICAS_DIR']
+        if not directorio:
+            return
+        ruta = self._ruta_volcado(pid)
+        terminados = os.path.join(directorio, VOLCADO_TERMINADOS)
+        try:
+            os.makedirs(directorio, exist_ok=True)
+            with open(os.path.join(directorio, 'metricas.candado'), 'a') as candado:
+                if fcntl is not None:
+                    fcntl.flock(candado, fcntl.LOCK_EX)
+                # Dentro del candado: si otro proceso ya lo archivó, el volcado no existe
+                if pid is None:
+                    self._archivado = True
+                    datos = self.registro.exportar()
+                elif os.path.exists(ruta):
+                    with open(ruta, encoding='utf-8') as archivo:
+                        datos = json.load(archivo)
+                else:
+                    return
+                previos = {}
+                if os.path.exists(terminados):
+                    with open(terminados, encoding='utf-8') as archivo:
+                        previos = json.load(archivo)
+                temporal = terminados + f'.{os.getpid()}.tmp'
+                with open(temporal, 'w', encoding='utf-8') as archivo:
+                    json.dump(self.registro.serializar(self.registro.sumar([previos, datos])), archivo)
+                os.replace(temporal, terminados)
+                if os.path.exists(ruta):
+                    os.remove(ruta)
+        except (OSError, ValueError) as e:
+            self.app.logger.warning(f"No se pudieron archivar las métricas del worker {pid or os.getpid()}: {e}")
+
+    def _archivar_terminados(self, directorio):
+        """Archiva los volcados de workers cuyo proceso ya no existe (murieron sin worker_exit)."""
+        for ruta in glob.glob(os.path.join(directorio, 'metricas-*.json')):
+            pid = os.path.basename(ruta)[len('metricas-'):-len('.json')]
+            if pid.isdigit() and int(pid) != os.getpid() and not _proceso_vivo(int(pid)):
+                self.archivar(int(pid))
+
+    def texto(self):
+        """Cuerpo de /metrics: este worker en vivo más los volcados de los demás y de los terminados."""
+        exportados = [self.registro.exportar()]
+        directorio = self.app.config['METRICAS_DIR']
+        if directorio:
+            self._archivar_terminados(directorio)
+            propio = self._ruta_volcado()
+            for ruta in glob.glob(os.path.join(directorio, 'metricas-*.json')):
+                if ruta == propio:
+                    continue
+                try:
+                    with open(ruta, encoding='utf-8') as archivo:
+                        exportados.append(json.load(archivo))
+                except (OSError, ValueError):
+                    continue
+        extras = []
+        for fuente in self._fuentes:
+            extras.extend(fuente())
+        return self.registro.texto_prometheus(self.registro.sumar(exportados), extras)
+
+
+def _proceso_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Existe, pero es de otro usuario
+    return True
+
+
+# Instancia única; se inicializa en app.py con metricas.init_app(app, mysql)
+metricas = Metricas()
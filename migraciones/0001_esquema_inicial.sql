@@ -0,0 +1,110 @@
+-- Esquema inicial de la base desarrollo_web (tablas 1 a 8 de
+-- 'Base de datos desarrollo_web;.txt'). En una base creada a mano antes de
+-- las migraciones estas sentencias no cambian nada; lo que le falte lo agrega
+-- 0002_bases_anteriores.sql.
+
+-- 1. TABLA USERS (para autenticación)
+CREATE TABLE IF NOT EXISTS users (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    username VARCHAR(80) UNIQUE NOT NULL,
+    password VARCHAR(255) NOT NULL,
+    version_sesion INT NOT NULL DEFAULT 0 -- Se incrementa al cerrar sesión o cambiar la contraseña
+);
+
+-- 2. TABLA PRODUCTOS (para el inventario)
+CREATE TABLE IF NOT EXISTS productos (
+    id_producto INT AUTO_INCREMENT PRIMARY KEY,
+    nombre VARCHAR(255) NOT NULL,
+    precio DECIMAL(10,2) NOT NULL,
+    stock INT NOT NULL,
+    UNIQUE KEY uq_productos_nombre (nombre) -- Clave natural para la importación (upsert)
+);
+
+-- 3. TABLA CLIENTES (para gestión de clientes)
+CREATE TABLE IF NOT EXISTS clientes (
+    id_cliente INT AUTO_INCREMENT PRIMARY KEY,
+    nombre VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    telefono VARCHAR(20),
+    UNIQUE KEY uq_clientes_email (email), -- Clave natural para la importación (upsert)
+    INDEX idx_clientes_nombre (nombre) -- Búsqueda por prefijo del autocompletado
+);
+
+-- 4. TABLA PIVOTE CLIENTES_PRODUCTOS (para las compras/relaciones)
+CREATE TABLE IF NOT EXISTS clientes_productos (
+    id_cliente INT,
+    id_producto INT,
+    cantidad INT NOT NULL,
+    fecha_compra TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id_cliente, id_producto),
+    FOREIGN KEY (id_cliente) REFERENCES clientes(id_cliente) ON DELETE CASCADE,
+    FOREIGN KEY (id_producto) REFERENCES productos(id_producto) ON DELETE CASCADE
+);
+
+-- 5. LIBRO DE COMPRAS (historial: solo se insertan filas, una por compra)
+-- clientes_productos guarda el total acumulado por cliente y producto; aquí queda
+-- cada compra con su fecha. El índice (id_cliente, fecha_compra) sirve el
+-- historial paginado de ver_compras (InnoDB le agrega id_compra al final).
+CREATE TABLE IF NOT EXISTS compras (
+    id_compra BIGINT AUTO_INCREMENT PRIMARY KEY,
+    id_cliente INT NOT NULL,
+    id_producto INT NOT NULL,
+    cantidad INT NOT NULL,
+    precio_unitario DECIMAL(10,2) NULL, -- Precio al momento de la compra (NULL en filas migradas)
+    fecha_compra TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_compras_cliente_fecha (id_cliente, fecha_compra),
+    FOREIGN KEY (id_cliente) REFERENCES clientes(id_cliente) ON DELETE CASCADE,
+    FOREIGN KEY (id_producto) REFERENCES productos(id_producto) ON DELETE CASCADE
+);
+
+-- 6. VERSIONES POR TABLA (caché de páginas con ETag, ver cache_respuestas.py)
+-- Las rutas de escritura incrementan la versión de la tabla que modifican.
+CREATE TABLE IF NOT EXISTS versiones_tabla (
+    tabla VARCHAR(64) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+INSERT IGNORE INTO versiones_tabla (tabla, version)
+VALUES ('productos', 0), ('clientes', 0), ('compras', 0);
+
+-- 7. RESÚMENES DE VENTAS (tablero /reportes, ver resumenes.py)
+-- Se actualizan en la misma transacción que cada compra; el tablero lee solo
+-- estas tablas y nunca agrupa el libro de compras completo.
+CREATE TABLE IF NOT EXISTS ventas_producto (
+    id_producto INT PRIMARY KEY,
+    unidades BIGINT NOT NULL DEFAULT 0,
+    ingresos DECIMAL(16,2) NOT NULL DEFAULT 0,
+    compras BIGINT NOT NULL DEFAULT 0, -- Líneas de compra
+    INDEX idx_ventas_producto_unidades (unidades), -- Productos más vendidos
+    FOREIGN KEY (id_producto) REFERENCES productos(id_producto) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS ventas_cliente (
+    id_cliente INT PRIMARY KEY,
+    unidades BIGINT NOT NULL DEFAULT 0,
+    ingresos DECIMAL(16,2) NOT NULL DEFAULT 0,
+    compras BIGINT NOT NULL DEFAULT 0,
+    INDEX idx_ventas_cliente_ingresos (ingresos), -- Clientes con más ingresos
+    FOREIGN KEY (id_cliente) REFERENCES clientes(id_cliente) ON DELETE CASCADE
+);
+
+-- Varias filas por día (ranura = id_cliente % 8) para que las compras
+-- simultáneas no esperen todas por el bloqueo de una sola fila
+CREATE TABLE IF NOT EXISTS ventas_dia (
+    fecha DATE NOT NULL,
+    ranura TINYINT NOT NULL,
+    unidades BIGINT NOT NULL DEFAULT 0,
+    ingresos DECIMAL(16,2) NOT NULL DEFAULT 0,
+    compras BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (fecha, ranura)
+);
+
+-- 8. PEDIDOS APLICADOS POR LA COLA DE COMPRAS (ver cola_compras.py)
+-- Se escribe en la misma transacción que cada lote: si el procesador cae después
+-- del commit, al reiniciar sabe qué pedidos ya se aplicaron y no los repite.
+CREATE TABLE IF NOT EXISTS pedidos_aplicados (
+    clave CHAR(32) PRIMARY KEY,
+    ok BOOLEAN NOT NULL,
+    resultado TEXT NOT NULL, -- JSON con las líneas aplicadas o los motivos del rechazo
+    aplicado TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_pedidos_aplicados_fecha (aplicado) -- Purga de los registros viejos
+);
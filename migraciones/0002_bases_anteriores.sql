@@ -0,0 +1,26 @@
+-- Cambios para las bases creadas a mano antes de algunas tablas y columnas
+-- (la sección "CAMBIOS PARA BASES DE DATOS YA CREADAS" del archivo de esquema).
+-- En una base recién creada con 0001 ninguna sentencia cambia nada: los
+-- ALTER e índices terminan en "ya existe" y el INSERT no encuentra filas.
+
+-- Versión de sesión de los usuarios (caché de usuarios autenticados)
+ALTER TABLE users ADD COLUMN version_sesion INT NOT NULL DEFAULT 0;
+
+-- Libro de compras: se carga con el historial de clientes_productos, que solo
+-- conserva el total y la última fecha de cada par, así que cada par se migra
+-- como una compra. Solo si el libro está vacío, para no duplicar filas.
+INSERT INTO compras (id_cliente, id_producto, cantidad, fecha_compra)
+SELECT cp.id_cliente, cp.id_producto, cp.cantidad, COALESCE(cp.fecha_compra, CURRENT_TIMESTAMP)
+FROM clientes_productos cp
+WHERE NOT EXISTS (SELECT 1 FROM compras);
+
+-- Claves naturales para la importación masiva (upsert por nombre / email).
+-- Si ya hay duplicados, estos ALTER fallan: hay que unificarlos y volver a migrar.
+ALTER TABLE productos ADD UNIQUE KEY uq_productos_nombre (nombre);
+ALTER TABLE clientes ADD UNIQUE KEY uq_clientes_email (email);
+
+-- Autocompletado de clientes: búsqueda por prefijo del nombre
+CREATE INDEX idx_clientes_nombre ON clientes (nombre);
+
+-- Los resúmenes de ventas (tablas ventas_*) se cargan desde el libro de compras
+-- con 'flask reconstruir-resumenes' después de migrar.
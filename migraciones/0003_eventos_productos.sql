@@ -0,0 +1,14 @@
+-- Eventos de stock y precio para las páginas abiertas (ver en_vivo.py).
+-- Cada escritura de productos agrega filas en su misma transacción; cada worker
+-- las lee por la clave primaria y las envía por Server-Sent Events. Sin clave
+-- foránea: el evento de un producto eliminado tiene que sobrevivirle.
+CREATE TABLE IF NOT EXISTS eventos_productos (
+    id_evento BIGINT AUTO_INCREMENT PRIMARY KEY,
+    tipo ENUM('cambio', 'nuevo', 'eliminado', 'recargar') NOT NULL,
+    id_producto INT NULL, -- NULL en 'recargar' (cambio masivo)
+    nombre VARCHAR(255) NULL, -- Solo si cambió (producto nuevo o editado)
+    precio DECIMAL(10,2) NULL,
+    stock INT NULL,
+    creado TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_eventos_productos_creado (creado) -- Purga de los eventos viejos
+);
@@ -1,7 +1,40 @@
-from flask_login import UserMixin
+class User:
+    """
+    Identidad del usuario autenticado que usa Flask-Login.
 
-class User(UserMixin):
-    def __init__(self, id, username, password):
+    Es un objeto mínimo (__slots__, sin __dict__) y no guarda el hash de la
+    contraseña: solo se necesita para saber quién es el usuario. El id de sesión
+    incluye la versión de sesión, así que al incrementarla (logout, cambio de
+    contraseña) las sesiones anteriores dejan de ser válidas.
+    """
+    __slots__ = ('id', 'username', 'version_sesion')
+
+    # Atributos que Flask-Login espera (lo mismo que aportaba UserMixin)
+    is_authenticated = True
+    is_active = True
+    is_anonymous = False
+
+    def __init__(self, id, username, version_sesion=0):
         self.id = id
         self.username = username
-        self.password = password
\ No newline at end of file
+        self.version_sesion = version_sesion
+
+    def get_id(self):
+        return f"{self.id}:{self.version_sesion}"
+
+    def __eq__(self, other):
+        if isinstance(other, User):
+            return self.get_id() == other.get_id()
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.get_id())
+
+
+def separar_id_sesion(id_sesion):
+    """'7:3' -> (7, 3). Devuelve None si el id no tiene el formato esperado."""
+    try:
+        user_id, version = id_sesion.split(':')
+        return int(user_id), int(version)
+    except (AttributeError, ValueError):
+        return None
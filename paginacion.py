@@ -0,0 +1,175 @@
+"""
+Paginación por cursor (keyset) para los listados de la aplicación.
+
+En lugar de OFFSET, cada página se pide a partir del último valor de la clave
+de ordenación que se mostró, de modo que MySQL entra directamente por el índice
+y el costo de una página es el mismo sin importar el tamaño de la tabla.
+"""
+import base64
+import binascii
+import datetime
+import functools
+import json
+
+POR_PAGINA_MAXIMO = 500
+
+
+class Pagina:
+    """Resultado de una consulta paginada."""
+    __slots__ = ('items', 'siguiente', 'anterior', 'por_pagina', 'total_aproximado')
+
+    def __init__(self, items, siguiente, anterior, por_pagina, total_aproximado=None):
+        self.items = items
+        self.siguiente = siguiente          # Cursor para la página siguiente (más antigua) o None
+        self.anterior = anterior            # Cursor para la página anterior (más reciente) o None
+        self.por_pagina = por_pagina
+        self.total_aproximado = total_aproximado
+
+
+def codificar_cursor(valores):
+    """Convierte los valores de la clave en un texto opaco apto para la URL."""
+    serializables = [v.isoformat(' ') if isinstance(v, datetime.datetime) else v for v in valores]
+    texto = json.dumps(serializables, separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(texto.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decodificar_cursor(texto, num_claves):
+    """
+    Devuelve la lista de valores del cursor o None si el cursor no es válido.
+    Cada valor debe ser un escalar (texto, número o null): el cursor llega de
+    la URL y sus valores van directo a los parámetros de la consulta.
+    """
+    if not texto:
+        return None
+    try:
+        relleno = '=' * (-len(texto) % 4)
+        valores = json.loads(base64.urlsafe_b64decode(texto + relleno).decode('utf-8'))
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+    if not isinstance(valores, list) or len(valores) != num_claves:
+        return None
+    if not all(v is None or isinstance(v, (str, int, float)) for v in valores):
+        return None
+    return valores
+
+
+def leer_por_pagina(args, por_defecto, maximo=POR_PAGINA_MAXIMO):
+    """Lee 'por_pagina' de la query string respetando el máximo permitido."""
+    try:
+        por_pagina = int(args.get('por_pagina', por_defecto))
+    except (TypeError, ValueError):
+        por_pagina = por_defecto
+    return max(1, min(por_pagina, maximo))
+
+
+def _condicion_keyset(claves, operador):
+    """
+    Construye la comparación lexicográfica (c1, c2) < (v1, v2) expandida,
+    que MySQL sí sabe resolver como rango sobre el índice.
+    """
+    partes = []
+    for i, clave in enumerate(claves):
+        iguales = [f"{c} = %s" for c in claves[:i]]
+        partes.append("(" + " AND ".join(iguales + [f"{clave} {operador} %s"]) + ")")
+    return "(" + " OR ".join(partes) + ")"
+
+
+def _parametros_keyset(valores):
+    parametros = []
+    for i in range(len(valores)):
+        parametros.extend(valores[:i + 1])
+    return parametros
+
+
+def _nombre_columna(clave):
+    # 'cp.fecha_compra' -> 'fecha_compra' (así aparece la columna en el DictCursor)
+    return clave.rsplit('.', 1)[-1]
+
+
+def _valor(fila, columna):
+    # Filas de DictCursor (dict) o filas con nombre (namedtuple, ver repositorios.py)
+    return fila[columna] if isinstance(fila, dict) else getattr(fila, columna)
+
+
+@functools.lru_cache(maxsize=256)
+def _sql_pagina(consulta, claves, filtros, direccion):
+    """
+    Texto completo de la consulta de una página. Solo depende de la forma de la
+    consulta (no de los valores), así que se arma una vez y se reutiliza.
+    """
+    filtros = list(filtros)
+    if direccion == 'antes':
+        filtros.append(_condicion_keyset(claves, '>'))
+        orden = ", ".join(f"{c} ASC" for c in claves)
+    else:
+        if direccion == 'despues':
+            filtros.append(_condicion_keyset(claves, '<'))
+        orden = ", ".join(f"{c} DESC" for c in claves)
+    sql = consulta
+    if filtros:
+        sql += " WHERE " + " AND ".join(filtros)
+    return sql + f" ORDER BY {orden} LIMIT %s"
+
+
+def paginar(cur, consulta, claves, args, por_pagina, filtros=None, parametros=None, clase=None):
+    """
+    Ejecuta 'consulta' (un SELECT ... FROM ... sin WHERE ni ORDER BY) paginando
+    en orden descendente por las columnas de 'claves'.
+
+    - 'args' es request.args: se usan 'despues' (avanzar) y 'antes' (retroceder).
+    - 'filtros' es una lista de condiciones SQL adicionales con sus 'parametros'.
+    - 'clase' (opcional) es un namedtuple con las columnas del SELECT, en orden:
+      cada fila se construye con clase._make() en lugar de un dict.
+    Se pide una fila de más para saber si existe otra página sin contar la tabla.
+    """
+    parametros = list(parametros or [])
+
+    cursor_despues = decodificar_cursor(args.get('despues'), len(claves))
+    cursor_antes = None if cursor_despues else decodificar_cursor(args.get('antes'), len(claves))
+
+    if cursor_antes is not None:
+        direccion = 'antes'
+        parametros.extend(_parametros_keyset(cursor_antes))
+    elif cursor_despues is not None:
+        direccion = 'despues'
+        parametros.extend(_parametros_keyset(cursor_despues))
+    else:
+        direccion = 'primera'
+    parametros.append(por_pagina + 1)
+
+    cur.execute(_sql_pagina(consulta, tuple(claves), tuple(filtros or ()), direccion), parametros)
+    filas = list(map(clase._make, cur.fetchall())) if clase is not None else list(cur.fetchall())
+    hay_mas = len(filas) > por_pagina
+    filas = filas[:por_pagina]
+
+    columnas = [_nombre_columna(c) for c in claves]
+
+    def cursor_de(fila):
+        return codificar_cursor([_valor(fila, c) for c in columnas])
+
+    if cursor_antes is not None:
+        # Al retroceder se leyó en orden ascendente: se invierte para mostrar igual
+        filas.reverse()
+        anterior = cursor_de(filas[0]) if hay_mas and filas else None
+        siguiente = cursor_de(filas[-1]) if filas else None
+    else:
+        siguiente = cursor_de(filas[-1]) if hay_mas else None
+        anterior = cursor_de(filas[0]) if cursor_despues is not None and filas else None
+
+    return Pagina(filas, siguiente, anterior, por_pagina)
+
+
+def total_aproximado(cur, tabla):
+    """
+    Número aproximado de filas de la tabla según las estadísticas de InnoDB.
+    Es instantáneo (no recorre la tabla) a cambio de no ser exacto.
+    """
+    cur.execute(
+        "SELECT TABLE_ROWS AS total FROM information_schema.TABLES "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        (tabla,)
+    )
+    fila = cur.fetchone()
+    if not fila:
+        return None
+    return fila['total'] if isinstance(fila, dict) else fila[0]
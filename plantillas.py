@@ -0,0 +1,88 @@
+"""
+Renderizado de plantillas en streaming y caché de bytecode de Jinja.
+
+transmitir('productos.html', ...) devuelve una respuesta que se envía mientras
+la plantilla se renderiza, en lugar de esperar al HTML completo:
+
+- El encabezado y la barra de navegación salen antes de consultar la base: la
+  vista pasa la consulta como una función (p. ej. cargar_pagina) y la plantilla
+  la llama después de {{ vaciar() }}, que fuerza el envío de lo acumulado.
+- El resto (filas de la tabla, paginación) sale en bloques de PLANTILLAS_BLOQUE
+  bytes, para no escribir en el socket un trozo por cada expresión de Jinja.
+- Los mensajes flash se sacan de la sesión antes de empezar y llegan a la
+  plantilla como 'mensajes_flash' ([(categoría, mensaje)]).
+
+Las plantillas compiladas se guardan en PLANTILLAS_CACHE_DIR (caché de bytecode
+compartida entre los workers y entre reinicios): solo el primer proceso compila
+cada plantilla; los demás cargan el bytecode. Con PLANTILLAS_PRECOMPILAR se
+cargan todas al iniciar, así el primer request de cada worker no paga la compilación.
+"""
+from flask import Response, g, get_flashed_messages, stream_template, current_app
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+
+# Comentario HTML que {{ vaciar() }} escribe y que transmitir() reemplaza por un envío
+MARCA_VACIAR = '<!--vaciar-->'
+
+
+class Plantillas:
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('PLANTILLAS_BLOQUE', 16 * 1024)
+        app.config.setdefault('PLANTILLAS_CACHE_DIR', None)  # None: directorio temporal por usuario de Jinja
+        app.config.setdefault('PLANTILLAS_PRECOMPILAR', True)
+        # Debe asignarse antes de cargar cualquier plantilla
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['PLANTILLAS_CACHE_DIR'])
+        app.add_template_global(self.vaciar, 'vaciar')
+        if app.config['PLANTILLAS_PRECOMPILAR']:
+            self.precompilar()
+
+    def precompilar(self):
+        """Carga (y compila si hace falta) todas las plantillas. Devuelve cuántas."""
+        nombres = self.app.jinja_env.list_templates(extensions=('html',))
+        for nombre in nombres:
+            self.app.jinja_env.get_template(nombre)
+        return len(nombres)
+
+    @staticmethod
+    def vaciar():
+        # Fuera de transmitir() (render_template normal) no escribe nada
+        return Markup(MARCA_VACIAR) if g.get('_plantilla_transmitida') else Markup('')
+
+    # --- Respuesta en streaming ---
+
+    def transmitir(self, nombre, **contexto):
+        g._plantilla_transmitida = True
+        # Los mensajes flash se leen aquí y no desde la plantilla: cuando el cuerpo
+        # se genera, la cookie de sesión ya se envió y no se podrían quitar de ella
+        contexto.setdefault('mensajes_flash', get_flashed_messages(with_categories=True))
+        partes = stream_template(nombre, **contexto)  # Ya envuelto en stream_with_context
+        return Response(self._en_bloques(partes, current_app.config['PLANTILLAS_BLOQUE']),
+                        content_type='text/html; charset=utf-8')
+
+    @staticmethod
+    def _en_bloques(partes, tamano_bloque):
+        pendientes = []
+        acumulado = 0
+        for parte in partes:
+            if parte == MARCA_VACIAR:
+                if pendientes:
+                    yield ''.join(pendientes)
+                    pendientes, acumulado = [], 0
+                continue
+            pendientes.append(parte)
+            acumulado += len(parte)
+            if acumulado >= tamano_bloque:
+                yield ''.join(pendientes)
+                pendientes, acumulado = [], 0
+        if pendientes:
+            yield ''.join(pendientes)
+
+
+# Instancia única; se inicializa en app.py con plantillas.init_app(app)
+plantillas = Plantillas()
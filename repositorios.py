@@ -0,0 +1,294 @@
+"""
+Acceso a datos de productos, clientes y compras.
+
+Las rutas de app.py llaman a estas funciones en lugar de escribir SQL:
+
+- Cada consulta pide solo las columnas que usa la vista (nada de SELECT *).
+- Las filas se leen con un cursor de tuplas y se convierten a namedtuple:
+  sin un dict por fila, con acceso por atributo igual que en las plantillas
+  ({{ producto.nombre }}). En listados grandes esto ahorra memoria y CPU.
+- El texto de cada sentencia es una constante del módulo (y las consultas
+  paginadas se arman una sola vez, ver paginacion._sql_pagina).
+
+Las funciones reciben la conexión (mysql.connection) como procesar_carrito en
+compras.py; las de escritura confirman la transacción y la deshacen si falla.
+
+Las operaciones masivas (eliminar_productos, eliminar_clientes, ajustar_productos)
+hacen una sola transacción con una sentencia por conjunto de hasta 'tam_bloque'
+filas, nunca una sentencia por fila, y devuelven cuántas filas tocaron.
+
+Las escrituras de productos anotan en la misma transacción el evento que ven
+las páginas abiertas (stock y precio en vivo, ver en_vivo.py).
+"""
+import collections
+
+import MySQLdb.cursors
+
+from paginacion import paginar, total_aproximado
+from resumenes import descontar_productos, descontar_clientes
+from en_vivo import anotar_productos, anotar_eliminados, anotar_recarga
+
+# --- Filas ---
+
+Producto = collections.namedtuple('Producto', 'id_producto nombre precio stock')
+Cliente = collections.namedtuple('Cliente', 'id_cliente nombre email telefono')
+ClienteResumen = collections.namedtuple('ClienteResumen', 'id_cliente nombre')
+CompraHistorial = collections.namedtuple('CompraHistorial', 'id_compra nombre_producto cantidad fecha_compra')
+
+# --- Sentencias ---
+
+SQL_PRODUCTOS = "SELECT id_producto, nombre, precio, stock FROM productos"
+SQL_PRODUCTO_POR_ID = SQL_PRODUCTOS + " WHERE id_producto = %s"
+SQL_PRODUCTO_INSERTAR = "INSERT INTO productos (nombre, precio, stock) VALUES (%s, %s, %s)"
+SQL_PRODUCTO_ACTUALIZAR = "UPDATE productos SET nombre = %s, precio = %s, stock = %s WHERE id_producto = %s"
+
+SQL_CLIENTES = "SELECT id_cliente, nombre, email, telefono FROM clientes"
+SQL_CLIENTE_POR_ID = SQL_CLIENTES + " WHERE id_cliente = %s"
+SQL_CLIENTE_RESUMEN = "SELECT id_cliente, nombre FROM clientes WHERE id_cliente = %s"
+SQL_CLIENTE_INSERTAR = "INSERT INTO clientes (nombre, email, telefono) VALUES (%s, %s, %s)"
+SQL_CLIENTE_ACTUALIZAR = "UPDATE clientes SET nombre = %s, email = %s, telefono = %s WHERE id_cliente = %s"
+
+# Libro de compras por el índice (id_cliente, fecha_compra), ver ver_compras en app.py
+SQL_COMPRAS_HISTORIAL = (
+    "SELECT co.id_compra, p.nombre AS nombre_producto, co.cantidad, co.fecha_compra "
+    "FROM compras co JOIN productos p ON co.id_producto = p.id_producto"
+)
+CLAVES_COMPRAS_HISTORIAL = ('co.fecha_compra', 'co.id_compra')
+
+# Filas que se van con un producto o cliente (ON DELETE CASCADE). Se borran antes y
+# por conjunto: así se sabe cuántas eran y el CASCADE ya no tiene nada que recorrer
+HIJAS_PRODUCTO = ('compras', 'clientes_productos', 'ventas_producto')
+HIJAS_CLIENTE = ('compras', 'clientes_productos', 'ventas_cliente')
+
+# Ajustes masivos de productos: (campo, modo) -> asignación con el valor como parámetro.
+# El precio nunca baja de 0.01 ni el stock de 0 (mismas reglas que validar_producto)
+SQL_AJUSTES = {
+    ('precio', 'porcentaje'): "precio = GREATEST(ROUND(precio * (1 + %s / 100), 2), 0.01)",
+    ('precio', 'delta'): "precio = GREATEST(precio + %s, 0.01)",
+    ('stock', 'porcentaje'): "stock = GREATEST(ROUND(stock * (1 + %s / 100)), 0)",
+    ('stock', 'delta'): "stock = GREATEST(stock + %s, 0)",
+}
+
+
+# --- Utilidades ---
+
+def _cursor(conexion):
+    # Cursor de tuplas (no DictCursor): la fila se convierte directo a su namedtuple
+    return conexion.cursor(MySQLdb.cursors.Cursor)
+
+
+def _uno(conexion, clase, sql, parametros):
+    cur = _cursor(conexion)
+    try:
+        cur.execute(sql, parametros)
+        fila = cur.fetchone()
+    finally:
+        cur.close()
+    return clase._make(fila) if fila else None
+
+
+def _escribir(conexion, sql, parametros, despues=None):
+    """
+    Ejecuta una sentencia de escritura, confirma y devuelve las filas afectadas.
+    'despues(cur)' se llama antes del commit, en la misma transacción.
+    """
+    cur = conexion.cursor()
+    try:
+        cur.execute(sql, parametros)
+        filas = cur.rowcount
+        if despues is not None:
+            despues(cur)
+        conexion.commit()
+        return filas
+    except Exception:
+        conexion.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def _marcadores(n):
+    return ", ".join(["%s"] * n)
+
+
+def _eliminar(conexion, ids, tabla, columna, descontar, hijas, tam_bloque, anotar=None):
+    """
+    Borra los registros 'ids' de 'tabla' en una sola transacción, de a
+    'tam_bloque' ids por sentencia. Por cada bloque resta sus compras de los
+    resúmenes de ventas, borra sus filas hijas y después los registros (y
+    llama a 'anotar(cur, bloque)', si se da).
+    Devuelve {tabla: filas borradas} de la tabla y de cada hija.
+    """
+    ids = sorted(set(ids))  # En orden, para que dos borrados concurrentes bloqueen igual
+    afectadas = dict.fromkeys((tabla,) + hijas, 0)
+    cur = conexion.cursor()
+    try:
+        for inicio in range(0, len(ids), tam_bloque):
+            bloque = ids[inicio:inicio + tam_bloque]
+            descontar(cur, bloque)
+            for destino in hijas + (tabla,):
+                cur.execute(f"DELETE FROM {destino} WHERE {columna} IN ({_marcadores(len(bloque))})", bloque)
+                afectadas[destino] += cur.rowcount
+            if anotar is not None:
+                anotar(cur, bloque)
+        conexion.commit()
+        return afectadas
+    except Exception:
+        conexion.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def _listar(conexion, sql, clave, tabla, clase, args, por_pagina, con_total):
+    cur = _cursor(conexion)
+    try:
+        pagina = paginar(cur, sql, (clave,), args, por_pagina, clase=clase)
+        if con_total:
+            pagina.total_aproximado = total_aproximado(cur, tabla)
+    finally:
+        cur.close()
+    return pagina
+
+
+# --- Productos ---
+
+def listar_productos(conexion, args, por_pagina, con_total=False):
+    """Una página de productos (paginación keyset por id_producto)."""
+    return _listar(conexion, SQL_PRODUCTOS, 'id_producto', 'productos', Producto, args, por_pagina, con_total)
+
+
+def obtener_producto(conexion, id_producto):
+    return _uno(conexion, Producto, SQL_PRODUCTO_POR_ID, (id_producto,))
+
+
+def crear_producto(conexion, nombre, precio, stock):
+    return _escribir(conexion, SQL_PRODUCTO_INSERTAR, (nombre, precio, stock),
+                     lambda cur: anotar_productos(cur, [cur.lastrowid], 'nuevo'))
+
+
+def actualizar_producto(conexion, id_producto, nombre, precio, stock):
+    return _escribir(conexion, SQL_PRODUCTO_ACTUALIZAR, (nombre, precio, stock, id_producto),
+                     lambda cur: anotar_productos(cur, [id_producto], con_nombre=True))
+
+
+def eliminar_producto(conexion, id_producto):
+    """Devuelve True si el producto existía. También se borran sus compras."""
+    return eliminar_productos(conexion, [id_producto])['productos'] > 0
+
+
+def eliminar_productos(conexion, ids, tam_bloque=1000):
+    """Borra varios productos y sus compras en una transacción (ver _eliminar)."""
+    return _eliminar(conexion, ids, 'productos', 'id_producto', descontar_productos, HIJAS_PRODUCTO, tam_bloque,
+                     anotar=anotar_eliminados)
+
+
+def _rangos_productos(cur, tam_bloque):
+    """
+    Genera ("id_producto BETWEEN %s AND %s", [primero, último]) por cada tanda de
+    'tam_bloque' ids existentes, leídos por keyset sobre la clave primaria: con ids
+    dispersos (importaciones, borrados) no hay rangos vacíos ni una lista de
+    rangos armada de antemano.
+    """
+    ultimo = 0
+    while True:
+        cur.execute("SELECT id_producto FROM productos WHERE id_producto > %s ORDER BY id_producto LIMIT %s",
+                    (ultimo, tam_bloque))
+        ids_bloque = [fila['id_producto'] for fila in cur.fetchall()]
+        if not ids_bloque:
+            return
+        yield "id_producto BETWEEN %s AND %s", [ids_bloque[0], ids_bloque[-1]]
+        if len(ids_bloque) < tam_bloque:
+            return
+        ultimo = ids_bloque[-1]
+
+
+def ajustar_productos(conexion, campo, modo, valor, ids=None, filtros=None, tam_bloque=1000):
+    """
+    Ajusta el precio o el stock ('campo') por porcentaje o por suma ('modo') en una
+    sola transacción. Se aplica a los productos 'ids' o, si no se dan, a los que
+    cumplan 'filtros' (ver validaciones.validar_filtro_productos); en ese caso se
+    recorre la tabla por la clave primaria de a 'tam_bloque' productos existentes
+    (ver _rangos_productos).
+    Devuelve el número de productos que cambiaron (los que ya estaban en el
+    límite, p. ej. stock 0 al restar, no cuentan). Con 'ids' se anota un evento
+    por producto; con filtros, uno solo que pide recargar la página.
+    """
+    asignacion = SQL_AJUSTES[(campo, modo)]
+    condiciones = []
+    parametros = []
+    for columna, operador, limite in filtros or ():
+        condiciones.append(f"{columna} {operador} %s")
+        parametros.append(limite)
+    condicion = "".join(f" AND {c}" for c in condiciones)
+
+    modificados = 0
+    cur = conexion.cursor()
+    try:
+        if ids is not None:
+            ids = sorted(set(ids))
+            bloques = [(f"id_producto IN ({_marcadores(len(ids[i:i + tam_bloque]))})", ids[i:i + tam_bloque])
+                       for i in range(0, len(ids), tam_bloque)]
+        else:
+            bloques = _rangos_productos(cur, tam_bloque)
+        for filtro_bloque, parametros_bloque in bloques:
+            cur.execute(f"UPDATE productos SET {asignacion} WHERE {filtro_bloque}{condicion}",
+                        [valor] + parametros_bloque + parametros)
+            modificados += cur.rowcount
+            if ids is not None:
+                anotar_productos(cur, parametros_bloque)
+        if ids is None and modificados:
+            anotar_recarga(cur)
+        conexion.commit()
+        return modificados
+    except Exception:
+        conexion.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+# --- Clientes ---
+
+def listar_clientes(conexion, args, por_pagina, con_total=False):
+    """Una página de clientes (paginación keyset por id_cliente)."""
+    return _listar(conexion, SQL_CLIENTES, 'id_cliente', 'clientes', Cliente, args, por_pagina, con_total)
+
+
+def obtener_cliente(conexion, id_cliente):
+    return _uno(conexion, Cliente, SQL_CLIENTE_POR_ID, (id_cliente,))
+
+
+def obtener_cliente_resumen(conexion, id_cliente):
+    """Solo id y nombre (títulos de página, cliente preseleccionado del formulario de compra)."""
+    return _uno(conexion, ClienteResumen, SQL_CLIENTE_RESUMEN, (id_cliente,))
+
+
+def crear_cliente(conexion, nombre, email, telefono):
+    return _escribir(conexion, SQL_CLIENTE_INSERTAR, (nombre, email, telefono))
+
+
+def actualizar_cliente(conexion, id_cliente, nombre, email, telefono):
+    return _escribir(conexion, SQL_CLIENTE_ACTUALIZAR, (nombre, email, telefono, id_cliente))
+
+
+def eliminar_cliente(conexion, id_cliente):
+    """Devuelve True si el cliente existía. También se borran sus compras."""
+    return eliminar_clientes(conexion, [id_cliente])['clientes'] > 0
+
+
+def eliminar_clientes(conexion, ids, tam_bloque=1000):
+    """Borra varios clientes y sus compras en una transacción (ver _eliminar)."""
+    return _eliminar(conexion, ids, 'clientes', 'id_cliente', descontar_clientes, HIJAS_CLIENTE, tam_bloque)
+
+
+# --- Compras ---
+
+def historial_compras(conexion, id_cliente, args, por_pagina):
+    """Una página del historial del cliente, de la compra más reciente a la más antigua."""
+    cur = _cursor(conexion)
+    try:
+        return paginar(cur, SQL_COMPRAS_HISTORIAL, CLAVES_COMPRAS_HISTORIAL, args, por_pagina,
+                       filtros=('co.id_cliente = %s',), parametros=(id_cliente,), clase=CompraHistorial)
+    finally:
+        cur.close()
@@ -0,0 +1,225 @@
+"""
+Resúmenes de ventas por producto, por cliente y por día (tablero /reportes).
+
+Las tablas ventas_producto, ventas_cliente y ventas_dia se actualizan en la misma
+transacción que registra cada compra (ver procesar_carrito en compras.py) y que
+borra un producto o un cliente (ver repositorios.py), así que siempre coinciden
+con el libro 'compras'. El tablero solo lee estas tablas: unas decenas de filas
+por índice, sin importar cuántas compras haya en el historial.
+
+ventas_dia tiene RANURAS_DIA filas por día (ranura = id_cliente % RANURAS_DIA)
+para que las compras simultáneas no esperen todas por el bloqueo de la misma fila.
+
+El ingreso de cada compra es cantidad * precio_unitario; las filas migradas sin
+precio_unitario usan el precio actual del producto.
+"""
+import collections
+
+import MySQLdb.cursors
+
+RANURAS_DIA = 8
+
+ProductoVendido = collections.namedtuple('ProductoVendido', 'id_producto nombre unidades ingresos compras')
+ClienteVentas = collections.namedtuple('ClienteVentas', 'id_cliente nombre unidades ingresos compras')
+VentasDia = collections.namedtuple('VentasDia', 'fecha unidades ingresos compras')
+
+# Expresión del ingreso de una fila 'co' del libro (con 'p' = su producto)
+_INGRESO = "co.cantidad * COALESCE(co.precio_unitario, p.precio)"
+
+
+# --- Actualización incremental (dentro de la transacción de quien llama) ---
+
+def acumular_lote(cur, filas):
+    """
+    Suma a los tres resúmenes las compras ya aplicadas de 'filas'
+    ([(id_cliente, id_producto, cantidad, precio)], de uno o varios clientes;
+    ver compras._anotar y compras.procesar_lote). Agrupa en memoria y hace una
+    sola sentencia por resumen, sin importar cuántas compras traiga el lote.
+    Usa el cursor de la transacción en curso; no hace commit.
+    """
+    if not filas:
+        return
+    por_producto = {}
+    por_cliente = {}
+    por_ranura = {}
+    for id_cliente, id_producto, cantidad, precio in filas:
+        ingreso = cantidad * precio
+        for grupo, clave in ((por_producto, id_producto), (por_cliente, id_cliente),
+                             (por_ranura, id_cliente % RANURAS_DIA)):
+            unidades, ingresos, compras = grupo.get(clave, (0, 0, 0))
+            grupo[clave] = (unidades + cantidad, ingresos + ingreso, compras + 1)
+
+    # En orden de clave, para que dos lotes concurrentes bloqueen las filas en el mismo orden
+    cur.executemany(
+        """
+        INSERT INTO ventas_producto (id_producto, unidades, ingresos, compras)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            unidades = unidades + VALUES(unidades),
+            ingresos = ingresos + VALUES(ingresos),
+            compras = compras + VALUES(compras)
+        """,
+        [(clave,) + totales for clave, totales in sorted(por_producto.items())]
+    )
+    cur.executemany(
+        """
+        INSERT INTO ventas_cliente (id_cliente, unidades, ingresos, compras)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            unidades = unidades + VALUES(unidades),
+            ingresos = ingresos + VALUES(ingresos),
+            compras = compras + VALUES(compras)
+        """,
+        [(clave,) + totales for clave, totales in sorted(por_cliente.items())]
+    )
+    # Las filas del día van al final: son las más disputadas y así se bloquean lo menos posible
+    cur.executemany(
+        """
+        INSERT INTO ventas_dia (fecha, ranura, unidades, ingresos, compras)
+        VALUES (CURRENT_DATE, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            unidades = unidades + VALUES(unidades),
+            ingresos = ingresos + VALUES(ingresos),
+            compras = compras + VALUES(compras)
+        """,
+        [(clave,) + totales for clave, totales in sorted(por_ranura.items())]
+    )
+
+
+def _descontar(cur, columna, valores, otros):
+    """
+    Resta de los resúmenes las compras de los productos o clientes 'valores' que
+    se van a borrar (el borrado se lleva esas filas del libro). Sus propias filas
+    de ventas_producto / ventas_cliente se borran con ellos.
+    """
+    marcadores = ", ".join(["%s"] * len(valores))
+    cur.execute(
+        f"""
+        UPDATE ventas_{otros} v JOIN (
+            SELECT co.id_{otros} AS id, SUM(co.cantidad) AS unidades, SUM({_INGRESO}) AS ingresos, COUNT(*) AS compras
+            FROM compras co JOIN productos p ON p.id_producto = co.id_producto
+            WHERE co.{columna} IN ({marcadores})
+            GROUP BY co.id_{otros}
+        ) x ON x.id = v.id_{otros}
+        SET v.unidades = v.unidades - x.unidades,
+            v.ingresos = v.ingresos - x.ingresos,
+            v.compras = v.compras - x.compras
+        """,
+        list(valores)
+    )
+    cur.execute(
+        f"""
+        UPDATE ventas_dia v JOIN (
+            SELECT DATE(co.fecha_compra) AS fecha, MOD(co.id_cliente, {RANURAS_DIA}) AS ranura,
+                   SUM(co.cantidad) AS unidades, SUM({_INGRESO}) AS ingresos, COUNT(*) AS compras
+            FROM compras co JOIN productos p ON p.id_producto = co.id_producto
+            WHERE co.{columna} IN ({marcadores})
+            GROUP BY DATE(co.fecha_compra), MOD(co.id_cliente, {RANURAS_DIA})
+        ) x ON x.fecha = v.fecha AND x.ranura = v.ranura
+        SET v.unidades = v.unidades - x.unidades,
+            v.ingresos = v.ingresos - x.ingresos,
+            v.compras = v.compras - x.compras
+        """,
+        list(valores)
+    )
+
+
+def descontar_productos(cur, ids):
+    _descontar(cur, 'id_producto', ids, 'cliente')
+
+
+def descontar_clientes(cur, ids):
+    _descontar(cur, 'id_cliente', ids, 'producto')
+
+
+# --- Reconstrucción completa (flask reconstruir-resumenes) ---
+
+def reconstruir(conexion):
+    """
+    Vuelve a calcular los tres resúmenes desde el libro de compras en una sola
+    transacción. INSERT ... SELECT bloquea las filas leídas del libro, así que las
+    compras que lleguen mientras tanto esperan al commit y no se pierden.
+    Devuelve el número de filas de cada resumen.
+    """
+    cur = conexion.cursor()
+    try:
+        for tabla in ('ventas_producto', 'ventas_cliente', 'ventas_dia'):
+            cur.execute(f"DELETE FROM {tabla}")
+        totales = {}
+        cur.execute(
+            f"""
+            INSERT INTO ventas_producto (id_producto, unidades, ingresos, compras)
+            SELECT co.id_producto, SUM(co.cantidad), SUM({_INGRESO}), COUNT(*)
+            FROM compras co JOIN productos p ON p.id_producto = co.id_producto
+            GROUP BY co.id_producto
+            """
+        )
+        totales['ventas_producto'] = cur.rowcount
+        cur.execute(
+            f"""
+            INSERT INTO ventas_cliente (id_cliente, unidades, ingresos, compras)
+            SELECT co.id_cliente, SUM(co.cantidad), SUM({_INGRESO}), COUNT(*)
+            FROM compras co JOIN productos p ON p.id_producto = co.id_producto
+            GROUP BY co.id_cliente
+            """
+        )
+        totales['ventas_cliente'] = cur.rowcount
+        cur.execute(
+            f"""
+            INSERT INTO ventas_dia (fecha, ranura, unidades, ingresos, compras)
+            SELECT DATE(co.fecha_compra), MOD(co.id_cliente, {RANURAS_DIA}), SUM(co.cantidad), SUM({_INGRESO}), COUNT(*)
+            FROM compras co JOIN productos p ON p.id_producto = co.id_producto
+            GROUP BY DATE(co.fecha_compra), MOD(co.id_cliente, {RANURAS_DIA})
+            """
+        )
+        totales['ventas_dia'] = cur.rowcount
+        conexion.commit()
+        return totales
+    except Exception:
+        conexion.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+# --- Lectura para el tablero ---
+
+def tablero(conexion, limite=10, dias=30):
+    """
+    Datos del tablero: los 'limite' productos más vendidos (por unidades), los
+    'limite' clientes con más ingresos y las ventas de los últimos 'dias' días.
+    Cada consulta recorre como mucho limite (o dias * RANURAS_DIA) filas de índice.
+    """
+    cur = conexion.cursor(MySQLdb.cursors.Cursor)
+    try:
+        cur.execute(
+            "SELECT v.id_producto, p.nombre, v.unidades, v.ingresos, v.compras "
+            "FROM ventas_producto v JOIN productos p ON p.id_producto = v.id_producto "
+            "ORDER BY v.unidades DESC LIMIT %s",
+            (limite,)
+        )
+        productos = list(map(ProductoVendido._make, cur.fetchall()))
+        cur.execute(
+            "SELECT v.id_cliente, c.nombre, v.unidades, v.ingresos, v.compras "
+            "FROM ventas_cliente v JOIN clientes c ON c.id_cliente = v.id_cliente "
+            "ORDER BY v.ingresos DESC LIMIT %s",
+            (limite,)
+        )
+        clientes = list(map(ClienteVentas._make, cur.fetchall()))
+        cur.execute(
+            "SELECT fecha, SUM(unidades), SUM(ingresos), SUM(compras) FROM ventas_dia "
+            "WHERE fecha > CURRENT_DATE - INTERVAL %s DAY GROUP BY fecha ORDER BY fecha DESC",
+            (dias,)
+        )
+        por_dia = list(map(VentasDia._make, cur.fetchall()))
+    finally:
+        cur.close()
+    return {
+        'productos': productos,
+        'clientes': clientes,
+        'por_dia': por_dia,
+        'dias': dias,
+        'unidades': sum(d.unidades for d in por_dia),
+        'ingresos': sum(d.ingresos for d in por_dia),
+        'compras': sum(d.compras for d in por_dia),
+    }
@@ -0,0 +1,85 @@
+/* ------------------------------------------------------------------- */
+/* STOCK Y PRECIOS EN VIVO (SERVER-SENT EVENTS, ver en_vivo.py)        */
+/* Uso en la plantilla:                                                */
+/*   <div data-eventos-productos="/productos/eventos"                  */
+/*        data-eventos-desde="{{ ultimo_evento() }}"></div>            */
+/*   <span data-stock-de="ID">, <span data-precio-de="ID">             */
+/*   <tr data-fila-producto="ID">, <div data-aviso-en-vivo hidden>     */
+/* Cada cambio se anuncia también como evento 'productos:cambio' en    */
+/* document (detail: {tipo, id, stock, precio, nombre}).               */
+/* ------------------------------------------------------------------- */
+(function () {
+    var REINTENTO_MS = 10000;   // Espera antes de reconectar si el servidor cerró (503, 401...)
+    var origen = document.querySelector('[data-eventos-productos]');
+    if (!origen || !window.EventSource) { return; }
+
+    var ultimo = Number(origen.dataset.eventosDesde) || 0;
+    var aplicados = {};   // id_producto -> id del último evento aplicado
+
+    function claseStock(stock) {
+        return stock < 1 ? 'danger' : stock < 10 ? 'warning' : 'info';
+    }
+
+    function avisar(texto) {
+        document.querySelectorAll('[data-aviso-en-vivo]').forEach(function (aviso) {
+            var mensaje = aviso.querySelector('[data-aviso-texto]');
+            if (mensaje) { mensaje.textContent = texto; }
+            aviso.hidden = false;
+        });
+    }
+
+    function aplicar(cambio) {
+        if (cambio.tipo === 'e') {
+            document.querySelectorAll('[data-fila-producto="' + cambio.id + '"]').forEach(function (fila) {
+                fila.classList.add('text-decoration-line-through', 'opacity-50');
+                fila.querySelectorAll('button, a.btn, input').forEach(function (control) {
+                    control.disabled = true;
+                    control.classList.add('disabled');
+                });
+            });
+        } else {
+            document.querySelectorAll('[data-stock-de="' + cambio.id + '"]').forEach(function (insignia) {
+                insignia.textContent = cambio.stock + ' unidades';
+                insignia.classList.remove('bg-danger', 'bg-warning', 'bg-info');
+                insignia.classList.add('bg-' + claseStock(cambio.stock));
+            });
+            document.querySelectorAll('[data-precio-de="' + cambio.id + '"]').forEach(function (precio) {
+                precio.textContent = '$' + Number(cambio.precio).toFixed(2);
+            });
+            if (cambio.tipo === 'n') {
+                avisar('Hay productos nuevos.');
+            }
+        }
+        document.dispatchEvent(new CustomEvent('productos:cambio', { detail: cambio }));
+    }
+
+    function recibir(event) {
+        JSON.parse(event.data).forEach(function (entrada) {
+            var ev = entrada[1];
+            ultimo = Math.max(ultimo, ev);
+            if (entrada[0] === 'r') {
+                avisar('Se actualizaron muchos productos a la vez.');
+                return;
+            }
+            var id = entrada[2];
+            // Un lote retomado puede repetir o adelantar eventos ya aplicados: gana el más nuevo
+            if ((aplicados[id] || 0) >= ev) { return; }
+            aplicados[id] = ev;
+            aplicar({ tipo: entrada[0], id: id, stock: entrada[3], precio: entrada[4], nombre: entrada[5] });
+        });
+    }
+
+    function conectar() {
+        var fuente = new EventSource(origen.dataset.eventosProductos + '?ultimo=' + ultimo);
+        fuente.addEventListener('productos', recibir);
+        fuente.addEventListener('error', function () {
+            // Cortes normales: el navegador reconecta solo con Last-Event-ID.
+            // Si el servidor respondió con un error, EventSource se rinde: se reintenta aquí
+            if (fuente.readyState === EventSource.CLOSED) {
+                setTimeout(conectar, REINTENTO_MS);
+            }
+        });
+    }
+
+    conectar();
+})();
@@ -0,0 +1,137 @@
+/* ------------------------------------------------------------------- */
+/* AUTOCOMPLETADO (TYPEAHEAD) PARA CLIENTES Y PRODUCTOS                */
+/* Uso en la plantilla:                                                */
+/*   <div class="typeahead position-relative">                         */
+/*     <input type="text" data-typeahead="/api/buscar/productos">      */
+/*     <input type="hidden" name="id_producto">                        */
+/*   </div>                                                            */
+/* Funciona también con filas agregadas después (delegación de eventos) */
+/* ------------------------------------------------------------------- */
+(function () {
+    var ESPERA_MS = 200;   // Espera tras la última tecla antes de consultar
+    var temporizadores = new WeakMap();
+    var consultas = new WeakMap();
+
+    function partes(input) {
+        var contenedor = input.closest('.typeahead');
+        var lista = contenedor.querySelector('.typeahead-resultados');
+        if (!lista) {
+            lista = document.createElement('div');
+            lista.className = 'list-group position-absolute w-100 shadow typeahead-resultados';
+            lista.style.zIndex = 1000;
+            contenedor.appendChild(lista);
+        }
+        return { contenedor: contenedor, lista: lista, oculto: contenedor.querySelector('input[type=hidden]') };
+    }
+
+    function textoResultado(item) {
+        if ('id_producto' in item) {
+            return item.nombre + ' (Stock: ' + item.stock + ') - $' + Number(item.precio).toFixed(2);
+        }
+        return item.nombre + ' <' + item.email + '>';
+    }
+
+    function cerrar(lista) {
+        lista.innerHTML = '';
+    }
+
+    function mostrar(input, resultados) {
+        var p = partes(input);
+        cerrar(p.lista);
+        if (!resultados.length) {
+            var vacio = document.createElement('div');
+            vacio.className = 'list-group-item text-muted';
+            vacio.textContent = 'Sin resultados';
+            p.lista.appendChild(vacio);
+            return;
+        }
+        resultados.forEach(function (item) {
+            var boton = document.createElement('button');
+            boton.type = 'button';
+            boton.className = 'list-group-item list-group-item-action';
+            boton.textContent = textoResultado(item);  // textContent: nunca se interpreta como HTML
+            boton.dataset.id = item.id_producto !== undefined ? item.id_producto : item.id_cliente;
+            boton.dataset.nombre = item.nombre;
+            p.lista.appendChild(boton);
+        });
+    }
+
+    function seleccionar(input, boton) {
+        var p = partes(input);
+        p.oculto.value = boton.dataset.id;
+        input.value = boton.textContent;
+        input.classList.remove('is-invalid');
+        cerrar(p.lista);
+    }
+
+    function buscar(input) {
+        var texto = input.value.trim();
+        var p = partes(input);
+        if (!texto) {
+            cerrar(p.lista);
+            return;
+        }
+        // Cancela la consulta anterior de este campo si aún no terminó
+        var anterior = consultas.get(input);
+        if (anterior) { anterior.abort(); }
+        var control = new AbortController();
+        consultas.set(input, control);
+
+        var url = input.dataset.typeahead + '?q=' + encodeURIComponent(texto) + '&limite=10';
+        fetch(url, { signal: control.signal, headers: { 'Accept': 'application/json' } })
+            .then(function (respuesta) { return respuesta.ok ? respuesta.json() : []; })
+            .then(function (resultados) { mostrar(input, resultados); })
+            .catch(function () { /* Consulta cancelada o sin conexión: se ignora */ });
+    }
+
+    document.addEventListener('input', function (event) {
+        var input = event.target.closest('[data-typeahead]');
+        if (!input) { return; }
+        // Al escribir, la selección anterior deja de valer hasta elegir un resultado
+        partes(input).oculto.value = '';
+        clearTimeout(temporizadores.get(input));
+        temporizadores.set(input, setTimeout(function () { buscar(input); }, ESPERA_MS));
+    });
+
+    document.addEventListener('keydown', function (event) {
+        var input = event.target.closest('[data-typeahead]');
+        if (!input) { return; }
+        var lista = partes(input).lista;
+        var botones = Array.prototype.slice.call(lista.querySelectorAll('button'));
+        var actual = botones.indexOf(lista.querySelector('button.active'));
+        if (event.key === 'ArrowDown' || event.key === 'ArrowUp') {
+            event.preventDefault();
+            if (!botones.length) { return; }
+            if (actual >= 0) { botones[actual].classList.remove('active'); }
+            actual = event.key === 'ArrowDown' ? (actual + 1) % botones.length
+                                               : (actual - 1 + botones.length) % botones.length;
+            botones[actual].classList.add('active');
+        } else if (event.key === 'Enter' && actual >= 0) {
+            event.preventDefault();
+            seleccionar(input, botones[actual]);
+        } else if (event.key === 'Escape') {
+            cerrar(lista);
+        }
+    });
+
+    document.addEventListener('click', function (event) {
+        var boton = event.target.closest('.typeahead-resultados button');
+        if (boton) {
+            seleccionar(boton.closest('.typeahead').querySelector('[data-typeahead]'), boton);
+            return;
+        }
+        // Clic fuera: cerrar todas las listas abiertas
+        document.querySelectorAll('.typeahead-resultados').forEach(cerrar);
+    });
+
+    // No enviar el formulario si algún campo de autocompletado no tiene un valor elegido
+    document.addEventListener('submit', function (event) {
+        var faltantes = event.target.querySelectorAll('.typeahead input[type=hidden]');
+        Array.prototype.forEach.call(faltantes, function (oculto) {
+            if (!oculto.value) {
+                event.preventDefault();
+                oculto.closest('.typeahead').querySelector('[data-typeahead]').classList.add('is-invalid');
+            }
+        });
+    });
+})();
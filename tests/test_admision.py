@@ -0,0 +1,127 @@
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+import admision as modulo
+from admision import Admision, Compuerta, CubetasTokens
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    ahora = [1000.0]
+    monkeypatch.setattr(modulo.time, 'monotonic', lambda: ahora[0])
+    return ahora
+
+
+# --- Cubetas de tokens ---
+
+def test_rafaga_y_luego_rechazo(reloj):
+    cubetas = CubetasTokens(tasa=1, rafaga=3)
+    assert [cubetas.tomar('ip') for _ in range(3)] == [0, 0, 0]
+    assert cubetas.tomar('ip') == pytest.approx(1.0)
+    assert cubetas.tomar('otra') == 0  # Cada clave tiene su cubeta
+    assert cubetas.estado()['rechazadas'] == 1
+
+
+def test_relleno_por_tiempo_sin_pasar_la_rafaga(reloj):
+    cubetas = CubetasTokens(tasa=2, rafaga=2)
+    cubetas.tomar('ip')
+    cubetas.tomar('ip')
+    assert cubetas.tomar('ip') == pytest.approx(0.5)
+    reloj[0] += 0.5
+    assert cubetas.tomar('ip') == 0
+    reloj[0] += 60
+    assert [cubetas.tomar('ip') for _ in range(2)] == [0, 0]
+    assert cubetas.tomar('ip') > 0  # El tiempo sin uso no acumula más que la ráfaga
+
+
+def test_olvida_la_clave_mas_antigua(reloj):
+    cubetas = CubetasTokens(tasa=1, rafaga=1, max_claves=2)
+    cubetas.tomar('a')
+    cubetas.tomar('b')
+    cubetas.tomar('c')
+    assert cubetas.estado()['claves'] == 2
+    assert cubetas.tomar('a') == 0  # Volvió con la cubeta llena
+
+
+# --- Compuerta de concurrencia ---
+
+def test_compuerta_cola_llena():
+    compuerta = Compuerta(concurrencia=1, cola=0, espera=1)
+    assert compuerta.entrar() is None
+    assert compuerta.entrar() == 'cola'
+    compuerta.salir()
+    assert compuerta.entrar() is None
+    assert compuerta.estado()['rechazadas_cola'] == 1
+
+
+def test_compuerta_agota_la_espera():
+    compuerta = Compuerta(concurrencia=1, cola=1, espera=0.01)
+    compuerta.entrar()
+    assert compuerta.entrar() == 'espera'
+    assert compuerta.estado()['en_espera'] == 0
+
+
+def test_compuerta_despierta_al_que_espera():
+    compuerta = Compuerta(concurrencia=1, cola=1, espera=5)
+    compuerta.entrar()
+    resultado = []
+    hilo = threading.Thread(target=lambda: resultado.append(compuerta.entrar()))
+    hilo.start()
+    while compuerta.estado()['en_espera'] == 0:
+        time.sleep(0.001)
+    compuerta.salir()
+    hilo.join(5)
+    assert resultado == [None] and compuerta.estado()['en_curso'] == 1
+
+
+# --- Hooks del request ---
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.secret_key = 'pruebas'
+    app.config['ADMISION_CLASES'] = {'lectura': {'concurrencia': 1, 'cola': 0, 'espera': 0}}
+    for endpoint in ('activos', 'metrics', 'salud', 'salud_lista', 'pagina'):
+        app.add_url_rule(f'/{endpoint}', endpoint, lambda: 'ok')
+
+    @app.route('/falla')
+    def falla():
+        raise RuntimeError('fallo de la vista')
+
+    app.admision = Admision(app)
+    return app
+
+
+def test_libera_el_cupo_aunque_la_vista_falle(app):
+    cliente = app.test_client()
+    assert cliente.get('/falla').status_code == 500
+    assert app.admision.compuertas['lectura'].en_curso == 0
+    assert cliente.get('/pagina').status_code == 200
+
+
+def test_rechaza_lo_que_esperó_demasiado_en_el_proxy(app):
+    cliente = app.test_client()
+    viejo = {'X-Request-Start': f't={time.time() - 10:.3f}'}
+    respuesta = cliente.get('/pagina', headers=viejo)
+    assert respuesta.status_code == 503 and respuesta.headers['Retry-After'] == '1'
+    reciente = {'X-Request-Start': str(int(time.time() * 1000))}  # En milisegundos
+    assert cliente.get('/pagina', headers=reciente).status_code == 200
+    assert app.admision.rechazadas_espera_cola == 1
+
+
+@pytest.mark.parametrize('ruta', ['/activos', '/metrics', '/salud', '/salud_lista', '/static/no-existe.css'])
+def test_exentos_nunca_se_rechazan(app, ruta):
+    cliente = app.test_client()
+    viejo = {'X-Request-Start': f't={time.time() - 10:.3f}'}
+    app.admision.compuertas['lectura'].entrar()  # Sin cupos libres
+    for _ in range(60):  # Más que la ráfaga por IP
+        assert cliente.get(ruta, headers=viejo).status_code in (200, 404)
+
+
+def test_tasa_por_ip_responde_429(app):
+    app.admision.cubetas['ip'] = CubetasTokens(tasa=1, rafaga=2)
+    cliente = app.test_client()
+    assert [cliente.get('/pagina').status_code for _ in range(3)] == [200, 200, 429]
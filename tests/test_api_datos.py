@@ -0,0 +1,94 @@
+import gzip
+
+import pytest
+
+pytest.importorskip('MySQLdb')  # api_datos lo importa para los cursores
+
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import parse_accept_header
+from werkzeug.wrappers import Response
+
+from api_datos import ConsultaInvalida, comprimir, leer_campos, leer_forma, leer_ids
+from cache_respuestas import SUFIJO_GZIP
+
+GZIP = parse_accept_header('gzip, deflate')
+SIN_GZIP = parse_accept_header('identity')
+
+
+def _respuesta(cuerpo=b'{"items":[]}' * 100, etag=None, debil=False):
+    respuesta = Response(cuerpo, content_type='application/json')
+    if etag:
+        respuesta.set_etag(etag, weak=debil)
+    return respuesta
+
+
+# --- comprimir ---
+
+def test_comprime_y_cambia_el_etag_fuerte():
+    respuesta = comprimir(_respuesta(etag='abc'), GZIP, 100)
+    assert respuesta.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(respuesta.get_data()) == b'{"items":[]}' * 100
+    assert respuesta.get_etag() == ('abc' + SUFIJO_GZIP, False)
+    assert 'Accept-Encoding' in respuesta.vary
+
+
+def test_etag_debil_no_cambia():
+    respuesta = comprimir(_respuesta(etag='abc', debil=True), GZIP, 100)
+    assert respuesta.headers['Content-Encoding'] == 'gzip'
+    assert respuesta.get_etag() == ('abc', True)
+
+
+def test_cuerpo_bajo_el_minimo_no_se_comprime():
+    respuesta = comprimir(_respuesta(b'{}', etag='abc'), GZIP, 100)
+    assert 'Content-Encoding' not in respuesta.headers
+    assert respuesta.get_data() == b'{}' and respuesta.get_etag() == ('abc', False)
+
+
+def test_cliente_sin_gzip():
+    respuesta = comprimir(_respuesta(etag='abc'), SIN_GZIP, 100)
+    assert 'Content-Encoding' not in respuesta.headers
+    assert 'Accept-Encoding' in respuesta.vary  # La caché del proxy distingue las dos formas
+    assert respuesta.get_etag() == ('abc', False)
+
+
+def test_no_comprime_errores():
+    respuesta = _respuesta()
+    respuesta.status_code = 404
+    assert 'Content-Encoding' not in comprimir(respuesta, GZIP, 100).headers
+
+
+# --- Parámetros ---
+
+def test_campos_por_defecto_son_todos():
+    assert leer_campos('productos', MultiDict()) == ('id_producto', 'nombre', 'precio', 'stock')
+
+
+@pytest.mark.parametrize('recurso, pedidos, esperado', [
+    ('productos', 'stock', ('id_producto', 'stock')),
+    ('clientes', ' email , nombre,', ('id_cliente', 'nombre', 'email')),
+    ('compras', 'cantidad', ('id_compra', 'cantidad', 'fecha_compra')),
+    ('compras', 'nombre_producto,id_compra', ('id_compra', 'nombre_producto', 'fecha_compra')),
+])
+def test_campos_siempre_incluyen_los_obligatorios(recurso, pedidos, esperado):
+    assert leer_campos(recurso, MultiDict({'campos': pedidos})) == esperado
+
+
+def test_campos_desconocidos():
+    with pytest.raises(ConsultaInvalida, match='contrasena'):
+        leer_campos('clientes', MultiDict({'campos': 'nombre,contrasena'}))
+
+
+def test_ids():
+    assert leer_ids(MultiDict(), 10) is None
+    assert leer_ids(MultiDict({'ids': '3,1,,3'}), 10) == [1, 3]
+    with pytest.raises(ConsultaInvalida):
+        leer_ids(MultiDict({'ids': '1,x'}), 10)
+    with pytest.raises(ConsultaInvalida):
+        leer_ids(MultiDict({'ids': ','.join(map(str, range(1, 12)))}), 10)
+
+
+def test_forma():
+    assert leer_forma(MultiDict()) == 'objetos'
+    assert leer_forma(MultiDict({'forma': 'filas'})) == 'filas'
+    with pytest.raises(ConsultaInvalida):
+        leer_forma(MultiDict({'forma': 'csv'}))
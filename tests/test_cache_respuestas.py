@@ -0,0 +1,51 @@
+from cache_respuestas import CacheLRU
+
+
+def test_acierto_y_fallo():
+    cache = CacheLRU()
+    assert cache.obtener('a', 'v1') is None
+    cache.guardar('a', 'v1', b'cuerpo', 'text/html')
+    assert cache.obtener('a', 'v1')[:3] == ('v1', b'cuerpo', 'text/html')
+    assert cache.obtener('a', 'v2') is None  # Otra versión de los datos
+    estadisticas = cache.estadisticas()
+    assert (estadisticas['aciertos'], estadisticas['fallos'], estadisticas['entradas']) == (1, 2, 1)
+
+
+def test_expulsa_la_menos_usada():
+    cache = CacheLRU(max_bytes=40)
+    cache.guardar('a', 'v', b'x' * 10, 't')
+    cache.guardar('b', 'v', b'x' * 10, 't')
+    cache.guardar('c', 'v', b'x' * 10, 't')
+    cache.obtener('a', 'v')  # 'a' pasa a ser la más reciente
+    cache.guardar('d', 'v', b'x' * 10, 't')
+    cache.guardar('e', 'v', b'x' * 10, 't')
+    assert cache.obtener('b', 'v') is None
+    assert cache.obtener('a', 'v') is not None
+    assert cache.estadisticas()['expulsiones'] == 1
+    assert cache.estadisticas()['bytes'] == 40
+
+
+def test_reemplazar_no_duplica_bytes():
+    cache = CacheLRU(max_bytes=100)
+    cache.guardar('a', 'v1', b'x' * 20, 't')
+    cache.guardar('a', 'v2', b'x' * 5, 't')
+    assert cache.estadisticas()['bytes'] == 5
+    assert cache.estadisticas()['entradas'] == 1
+
+
+def test_no_guarda_cuerpos_grandes():
+    cache = CacheLRU(max_bytes=100)
+    cache.guardar('a', 'v', b'x' * 26, 't')
+    assert cache.obtener('a', 'v') is None
+
+
+def test_expira_por_ttl(monkeypatch):
+    import cache_respuestas
+    ahora = [1000.0]
+    monkeypatch.setattr(cache_respuestas.time, 'monotonic', lambda: ahora[0])
+    cache = CacheLRU(ttl=10)
+    cache.guardar('a', 'v', b'x', 't')
+    ahora[0] += 9
+    assert cache.obtener('a', 'v') is not None
+    ahora[0] += 2
+    assert cache.obtener('a', 'v') is None
@@ -0,0 +1,71 @@
+import pytest
+
+MySQLdb = pytest.importorskip('MySQLdb')  # cola_compras lo usa para los errores de la BD
+
+from flask import Flask
+
+import cola_compras as modulo
+from cola_compras import ColaCompras
+
+
+class _MySQLFalso:
+    connection = object()
+
+
+@pytest.fixture
+def cola(tmp_path):
+    app = Flask(__name__)
+    app.config.update(COLA_COMPRAS_ACTIVA=True, COLA_COMPRAS_HILO=False,
+                      COLA_COMPRAS_RUTA=str(tmp_path / 'cola.sqlite3'))
+    return ColaCompras(app, _MySQLFalso())
+
+
+def _estados(cola):
+    return dict(cola._conexion().execute("SELECT clave, estado FROM pedidos"))
+
+
+def test_conexion_perdida_en_el_lote_queda_para_recuperar(cola, monkeypatch):
+    aplicada = cola.encolar(1, {'1': 2})
+    no_aplicada = cola.encolar(2, {'1': 1})
+
+    def perder_conexion(conexion, pedidos):
+        raise MySQLdb.OperationalError(2013, 'Lost connection to MySQL server during query')
+
+    monkeypatch.setattr(modulo, 'procesar_lote', perder_conexion)
+    with pytest.raises(MySQLdb.OperationalError):
+        cola.procesar_lote()
+    # No se sabe si el COMMIT llegó: ni 'pendiente' ni 'error'
+    assert _estados(cola) == {aplicada: 'procesando', no_aplicada: 'procesando'}
+    assert cola._revisar
+
+    resultado = {'ok': True, 'lineas': [], 'errores': []}
+    monkeypatch.setattr(modulo, 'resultados_aplicados', lambda conexion, claves: {aplicada: resultado})
+    cola._recuperar()
+    assert _estados(cola) == {aplicada: 'aplicada', no_aplicada: 'pendiente'}
+    assert cola.consultar(aplicada)['resultado'] == resultado
+
+
+def test_pedido_ya_aplicado_no_termina_en_error(cola, monkeypatch):
+    clave = cola.encolar(1, {'1': 2})
+
+    def duplicado(conexion, pedidos):
+        raise MySQLdb.IntegrityError(1062, f"Duplicate entry '{pedidos[0][0]}' for key 'PRIMARY'")
+
+    monkeypatch.setattr(modulo, 'procesar_lote', duplicado)
+    assert cola.procesar_lote() == 1
+    assert _estados(cola) == {clave: 'procesando'}
+    assert cola._revisar
+
+
+def test_deadlock_devuelve_el_lote_y_cuenta_el_intento(cola, monkeypatch):
+    clave = cola.encolar(1, {'1': 2})
+
+    def deadlock(conexion, pedidos):
+        raise MySQLdb.OperationalError(1213, 'Deadlock found when trying to get lock')
+
+    monkeypatch.setattr(modulo, 'procesar_lote', deadlock)
+    with pytest.raises(MySQLdb.OperationalError):
+        cola.procesar_lote()
+    intentos, estado = cola._conexion().execute("SELECT intentos, estado FROM pedidos").fetchone()
+    assert (estado, intentos) == ('pendiente', 1)
+    assert not cola._revisar
@@ -0,0 +1,55 @@
+import pytest
+from flask import Flask
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS
+
+from contrasenas import SCRYPT_POR_DEFECTO, ServicioContrasenas, parametros_metodo
+
+
+@pytest.mark.parametrize('metodo, esperado', [
+    ('scrypt', (('scrypt',), SCRYPT_POR_DEFECTO)),
+    ('scrypt:16384:8:2', (('scrypt',), (16384, 8, 2))),
+    ('pbkdf2', (('pbkdf2', 'sha256'), (DEFAULT_PBKDF2_ITERATIONS,))),
+    ('pbkdf2:sha512', (('pbkdf2', 'sha512'), (DEFAULT_PBKDF2_ITERATIONS,))),
+    ('pbkdf2:sha256:600000', (('pbkdf2', 'sha256'), (600000,))),
+])
+def test_parametros_metodo(metodo, esperado):
+    assert parametros_metodo(metodo) == esperado
+
+
+@pytest.mark.parametrize('metodo', ['md5', 'sha256', 'scrypt:1:2', 'pbkdf2:sha256:1:2', 'pbkdf2:sha256:mucho', ''])
+def test_parametros_metodo_invalido(metodo):
+    with pytest.raises(ValueError):
+        parametros_metodo(metodo)
+
+
+def _servicio(metodo):
+    app = Flask(__name__)
+    app.config['HASH_METODO'] = metodo
+    return ServicioContrasenas(app)
+
+
+@pytest.mark.parametrize('metodo, hash_guardado, necesita', [
+    # Mismo método y costo
+    ('pbkdf2:sha256:600000', 'pbkdf2:sha256:600000$sal$h', False),
+    ('scrypt', 'scrypt:32768:8:1$sal$h', False),
+    # Costo guardado mayor que el configurado: nunca se rebaja
+    ('pbkdf2:sha256:600000', 'pbkdf2:sha256:1000000$sal$h', False),
+    ('scrypt:16384:8:1', 'scrypt:32768:8:1$sal$h', False),
+    # Costo guardado menor
+    ('pbkdf2:sha256:600000', 'pbkdf2:sha256:260000$sal$h', True),
+    ('scrypt', 'scrypt:16384:8:1$sal$h', True),
+    # Otro algoritmo
+    ('scrypt', 'pbkdf2:sha256:1000000$sal$h', True),
+    ('pbkdf2:sha512', 'pbkdf2:sha256$sal$h', True),
+    # Métodos desconocidos o antiguos
+    ('pbkdf2:sha256', 'sha1$sal$h', True),
+    ('pbkdf2:sha256', 'md5$sal$h', True),
+    ('pbkdf2:sha256', 'texto-plano', True),
+])
+def test_necesita_rehash(metodo, hash_guardado, necesita):
+    assert _servicio(metodo).necesita_rehash(hash_guardado) is necesita
+
+
+def test_metodo_invalido_falla_al_iniciar():
+    with pytest.raises(ValueError):
+        _servicio('bcrypt')
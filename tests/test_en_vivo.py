@@ -0,0 +1,189 @@
+import json
+
+import pytest
+from flask import Flask
+
+import en_vivo
+from en_vivo import Difusor
+
+
+class _CursorFalso:
+    """Devuelve en orden los resultados preparados y anota lo ejecutado."""
+
+    def __init__(self, conexion):
+        self.conexion = conexion
+        self.rowcount = 0
+
+    def execute(self, sql, parametros=None):
+        self.conexion.ejecutadas.append((sql, parametros))
+        self.resultado = self.conexion.resultados.pop(0) if self.conexion.resultados else []
+        if isinstance(self.resultado, int):
+            self.rowcount = self.resultado
+
+    def fetchone(self):
+        return self.resultado[0]
+
+    def fetchall(self):
+        return self.resultado
+
+    def close(self):
+        pass
+
+
+class _ConexionFalsa:
+    def __init__(self, *resultados):
+        self.resultados = list(resultados)
+        self.ejecutadas = []
+        self.commits = 0
+
+    def cursor(self):
+        return _CursorFalso(self)
+
+    def commit(self):
+        self.commits += 1
+
+
+class _MySQLFalso:
+    def __init__(self, conexion):
+        self.connection = conexion
+
+
+def _evento(id_evento, id_producto=1, stock=5, tipo='cambio'):
+    return {'id_evento': id_evento, 'tipo': tipo, 'id_producto': id_producto, 'nombre': None,
+            'precio': '2.50', 'stock': stock}
+
+
+def _datos(mensaje):
+    lineas = dict(linea.split(': ', 1) for linea in mensaje.strip().split('\n'))
+    return int(lineas['id']), json.loads(lineas['data'])
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    ahora = [1000.0]
+    monkeypatch.setattr(en_vivo.time, 'monotonic', lambda: ahora[0])
+    return ahora
+
+
+@pytest.fixture
+def difusor(monkeypatch):
+    app = Flask(__name__)
+    app.config.update(EVENTOS_MEMORIA=100, EVENTOS_LATIDO=0.01, EVENTOS_HUECO_SEG=5)
+    difusor = Difusor(app, _MySQLFalso(_ConexionFalsa()))
+    monkeypatch.setattr(difusor, 'arrancar', lambda: None)  # Sin hilo lector: _leer se llama a mano
+    return difusor
+
+
+def _leer(difusor, *resultados):
+    difusor.mysql.connection = _ConexionFalsa(*resultados)
+    difusor._leer()
+    return difusor.mysql.connection.ejecutadas
+
+
+# --- Formato ---
+
+def test_formato_de_las_entradas():
+    assert en_vivo._entrada(_evento(7, 3, 9)) == ['c', 7, 3, 9, '2.50', None]
+    assert en_vivo._entrada(_evento(8, 3, tipo='eliminado')) == ['e', 8, 3]
+    assert en_vivo._entrada({'id_evento': 9, 'tipo': 'recargar'}) == ['r', 9]
+
+
+def test_mensaje_sse_lleva_el_mayor_id():
+    texto = en_vivo._mensaje([['c', 4, 1, 5, '1', None], ['e', 6, 2]])
+    assert texto.endswith('\n\n')
+    assert _datos(texto) == (6, [['c', 4, 1, 5, '1', None], ['e', 6, 2]])
+
+
+# --- Lectura y huecos ---
+
+def test_arranque_desde_los_eventos_recientes(difusor):
+    ejecutadas = _leer(difusor, [{'ultimo': 250}], [_evento(251)])
+    assert difusor._desde == 150  # 250 - EVENTOS_MEMORIA
+    assert ejecutadas[1][1] == [150, 101]
+    assert difusor._ultimo == 251
+
+
+def test_hueco_se_vigila_y_se_completa(difusor, reloj):
+    _leer(difusor, [{'ultimo': 0}], [_evento(1), _evento(2), _evento(4)])
+    assert set(difusor._huecos) == {3}
+
+    ejecutadas = _leer(difusor, [_evento(3)])
+    sql, parametros = ejecutadas[0]
+    assert 'id_evento IN (%s)' in sql and parametros == [4, 3, 101]
+    assert difusor._huecos == {}
+    assert [id_evento for _, id_evento, _ in difusor._eventos] == [1, 2, 4, 3]
+    assert difusor._ultimo == 4
+
+
+def test_hueco_se_abandona_despues_de_la_espera(difusor, reloj):
+    _leer(difusor, [{'ultimo': 0}], [_evento(1), _evento(3)])
+    reloj[0] += 6  # Más que EVENTOS_HUECO_SEG: la transacción se deshizo
+    assert _leer(difusor, [])[0][1] == [3, 2, 101]  # Se consulta una última vez
+    assert difusor._huecos == {}
+    assert 'IN' not in _leer(difusor, [])[0][0]
+
+
+def test_demasiados_eventos_reinicia_la_memoria(difusor):
+    _leer(difusor, [{'ultimo': 0}], [_evento(i) for i in range(1, 103)])
+    assert not difusor._eventos and difusor._desde == difusor._ultimo == 102
+
+
+# --- Conexiones: retomar y agrupar ---
+
+def _abrir(difusor, ultimo=None):
+    with difusor.app.test_request_context(headers={'Last-Event-ID': str(ultimo)} if ultimo is not None else {}):
+        respuesta = difusor.respuesta()
+    partes = iter(respuesta.response)
+    assert next(partes) == 'retry: 3000\n\n'
+    return partes
+
+
+def test_retoma_desde_last_event_id(difusor):
+    _leer(difusor, [{'ultimo': 0}], [_evento(1), _evento(2, 2), _evento(3, 3)])
+    partes = _abrir(difusor, ultimo=1)
+    assert _datos(next(partes)) == (3, [['c', 2, 2, 5, '2.50', None], ['c', 3, 3, 5, '2.50', None]])
+
+
+def test_last_event_id_fuera_de_la_memoria_pide_recargar(difusor):
+    _leer(difusor, [{'ultimo': 150}], [_evento(151)])
+    partes = _abrir(difusor, ultimo=10)
+    assert _datos(next(partes)) == (151, [['r', 151]])
+
+
+def test_conexion_atrasada_recibe_los_lotes_juntos(difusor):
+    _leer(difusor, [{'ultimo': 0}], [_evento(1)])
+    partes = _abrir(difusor)
+    assert next(partes) == ': latido\n\n'  # La conexión ya tomó su posición
+    _leer(difusor, [_evento(2)])
+    _leer(difusor, [_evento(3, stock=4), _evento(4, tipo='eliminado')])
+    ultimo, entradas = _datos(next(partes))
+    assert ultimo == 4 and [entrada[1] for entrada in entradas] == [2, 3, 4]
+    assert next(partes) == ': latido\n\n'
+
+
+def test_conexion_al_dia_recibe_el_texto_del_lote(difusor):
+    _leer(difusor, [{'ultimo': 0}], [_evento(1)])
+    partes = _abrir(difusor)
+    assert next(partes) == ': latido\n\n'
+    _leer(difusor, [_evento(2)])
+    assert next(partes) is difusor._lote[2]
+
+
+def test_rechaza_por_encima_del_maximo(difusor):
+    difusor.app.config['EVENTOS_MAX_CONEXIONES'] = 1
+    _leer(difusor, [{'ultimo': 0}], [])
+    abierta = _abrir(difusor)
+    with difusor.app.test_request_context():
+        assert difusor.respuesta().status_code == 503
+    abierta.close()  # Al cerrarse libera su lugar
+    assert difusor.estado()['conexiones'] == 0
+
+
+# --- Purga ---
+
+def test_purga_por_lotes_hasta_borrar_menos(monkeypatch):
+    monkeypatch.setattr(en_vivo, 'PURGA_LOTE', 10)
+    conexion = _ConexionFalsa(10, 10, 3)
+    assert en_vivo.purgar(conexion, 3600) == 23
+    assert conexion.commits == 3
+    assert all(parametros == (3600, 10) for _, parametros in conexion.ejecutadas)
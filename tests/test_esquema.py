@@ -0,0 +1,74 @@
+import pytest
+
+pytest.importorskip('MySQLdb')  # esquema.py lo importa para los errores de la BD
+
+import esquema
+
+
+def test_separa_por_punto_y_coma():
+    assert esquema.dividir_sentencias("SELECT 1; SELECT 2;\n") == ['SELECT 1', 'SELECT 2']
+
+
+def test_ultima_sentencia_sin_punto_y_coma():
+    assert esquema.dividir_sentencias("SELECT 1;\nSELECT 2") == ['SELECT 1', 'SELECT 2']
+
+
+def test_descarta_sentencias_vacias():
+    assert esquema.dividir_sentencias(";;\n  ;SELECT 1;;") == ['SELECT 1']
+
+
+@pytest.mark.parametrize('cadena', ["'a;b'", '"a;b"', '`a;b`'])
+def test_punto_y_coma_dentro_de_cadenas(cadena):
+    assert esquema.dividir_sentencias(f"SELECT {cadena}; SELECT 2") == [f'SELECT {cadena}', 'SELECT 2']
+
+
+def test_comillas_escapadas():
+    texto = r"INSERT INTO t VALUES ('it\'s; ok'); SELECT 2"
+    assert esquema.dividir_sentencias(texto) == [r"INSERT INTO t VALUES ('it\'s; ok')", 'SELECT 2']
+
+
+def test_comillas_de_otro_tipo_dentro_de_una_cadena():
+    assert esquema.dividir_sentencias("""SELECT "a ' b; c"; SELECT 2""") == ['SELECT "a \' b; c"', 'SELECT 2']
+
+
+def test_descarta_comentarios_de_linea():
+    texto = "-- primera; con punto y coma\nSELECT 1; -- al final;\nSELECT 2"
+    assert esquema.dividir_sentencias(texto) == ['SELECT 1', 'SELECT 2']
+
+
+def test_descarta_comentarios_de_bloque():
+    texto = "/* uno;\n dos; */ SELECT 1 /* ; */; SELECT 2"
+    assert esquema.dividir_sentencias(texto) == ['SELECT 1', 'SELECT 2']
+
+
+def test_comentarios_dentro_de_cadenas_se_conservan():
+    assert esquema.dividir_sentencias("SELECT '-- no; /* es */'") == ["SELECT '-- no; /* es */'"]
+
+
+def test_comentario_sin_cerrar_llega_al_final():
+    assert esquema.dividir_sentencias("SELECT 1; /* sin cerrar; SELECT 2") == ['SELECT 1']
+
+
+def test_migraciones_del_repositorio():
+    migraciones = esquema.listar()
+    assert [m.version for m in migraciones] == list(range(1, len(migraciones) + 1))
+    for migracion in migraciones:
+        sentencias = migracion.sentencias()
+        assert sentencias, migracion.nombre
+        for sentencia in sentencias:
+            assert sentencia.split(None, 1)[0].upper() in ('CREATE', 'ALTER', 'INSERT', 'UPDATE'), sentencia
+            assert '--' not in sentencia and '/*' not in sentencia
+
+
+@pytest.mark.parametrize('version, cantidad', [(1, 11), (2, 5), (3, 1)])
+def test_cantidad_de_sentencias_por_migracion(version, cantidad):
+    migracion = next(m for m in esquema.listar() if m.version == version)
+    assert len(migracion.sentencias()) == cantidad
+
+
+def test_listar_rechaza_versiones_repetidas(tmp_path):
+    (tmp_path / '0001_uno.sql').write_text('SELECT 1;')
+    (tmp_path / '0001_otro.sql').write_text('SELECT 2;')
+    (tmp_path / 'notas.txt').write_text('no es una migración')
+    with pytest.raises(ValueError):
+        esquema.listar(str(tmp_path))
@@ -0,0 +1,102 @@
+import io
+import json
+
+import pytest
+
+from importacion import _filas_json, detectar_formato, importar, leer_filas
+
+
+def _leer(texto, formato):
+    return list(leer_filas(io.BytesIO(texto.encode('utf-8')), formato))
+
+
+@pytest.mark.parametrize('nombre, formato', [
+    ('productos.csv', 'csv'), ('DATOS.JSON', 'json'), ('a.ndjson', 'ndjson'), ('a.jsonl', 'ndjson'),
+    ('a.xlsx', None), ('sin_extension', None),
+])
+def test_detectar_formato(nombre, formato):
+    assert detectar_formato(nombre) == formato
+
+
+def test_csv():
+    filas = _leer('nombre,precio,stock\r\nCafé,1.5,3\r\n"Té, verde",2,4\r\n', 'csv')
+    assert filas == [{'nombre': 'Café', 'precio': '1.5', 'stock': '3'},
+                     {'nombre': 'Té, verde', 'precio': '2', 'stock': '4'}]
+
+
+def test_csv_con_bom():
+    assert _leer('\ufeffnombre,precio\nA,1\n', 'csv') == [{'nombre': 'A', 'precio': '1'}]
+
+
+def test_ndjson_salta_lineas_vacias_y_marca_las_invalidas():
+    filas = _leer('{"nombre": "A"}\n\n  \n{mal}\n{"nombre": "B"}\n', 'ndjson')
+    assert filas[0] == {'nombre': 'A'} and filas[2] == {'nombre': 'B'}
+    assert isinstance(filas[1], ValueError)
+
+
+def test_json():
+    registros = [{'nombre': f'P{i}', 'precio': i + 0.5, 'stock': i} for i in range(5)]
+    assert _leer(json.dumps(registros, indent=2), 'json') == registros
+
+
+def test_json_vacio():
+    assert _leer('  [ ]  ', 'json') == []
+
+
+def test_json_con_elementos_partidos_entre_bloques():
+    registros = [{'nombre': 'x' * 30, 'texto': 'con ] y , dentro'} for _ in range(20)]
+    texto = io.StringIO(json.dumps(registros))
+    assert list(_filas_json(texto, tam_bloque=7)) == registros
+
+
+@pytest.mark.parametrize('texto', ['{"nombre": "A"}', '', '[{"a": 1} {"b": 2}]', '[{"a": 1},', '[{"a": '])
+def test_json_mal_formado(texto):
+    with pytest.raises(ValueError):
+        _leer(texto, 'json')
+
+
+def test_json_con_elemento_mal_formado_en_medio_no_lee_todo_el_archivo():
+    registros = [json.dumps({'nombre': f'P{i}', 'precio': 1, 'stock': 1}) for i in range(2000)]
+    registros[10] = '{"nombre": "roto",, "precio": 1}'
+    texto = io.StringIO('[' + ','.join(registros) + ']')
+    filas = []
+    with pytest.raises(ValueError, match='mal formado'):
+        for fila in _filas_json(texto, tam_bloque=256, maximo=1024):
+            filas.append(fila)
+    assert len(filas) == 10
+    assert texto.tell() < len(texto.getvalue()) // 10
+
+
+def test_formato_no_soportado():
+    with pytest.raises(ValueError):
+        leer_filas(io.BytesIO(b''), 'xml')
+
+
+class _ConexionFalsa:
+    def __init__(self):
+        self.filas = []
+        self.commits = self.rollbacks = 0
+
+    def cursor(self):
+        return self
+
+    def executemany(self, sentencia, lote):
+        self.filas.extend(lote)
+
+    def close(self):
+        pass
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+def test_csv_con_campo_demasiado_largo_conserva_lo_leido():
+    texto = 'nombre,precio,stock\nA,1,1\n"' + 'x' * 200000 + '",1,1\nB,1,1\n'
+    conexion = _ConexionFalsa()
+    informe = importar(conexion, 'productos', leer_filas(io.BytesIO(texto.encode('utf-8')), 'csv'))
+    assert conexion.filas == [('A', 1.0, 1)] and conexion.rollbacks == 0
+    assert informe.validas == 1
+    assert informe.abortada and 'base de datos' not in informe.abortada
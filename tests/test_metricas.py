@@ -0,0 +1,97 @@
+import json
+import os
+
+import pytest
+from flask import Flask
+
+from metricas import VOLCADO_TERMINADOS, Metricas, Registro, normalizar_sql
+
+
+@pytest.mark.parametrize('sql, esperado', [
+    ("SELECT * FROM productos WHERE id_producto = %s", "SELECT * FROM productos WHERE id_producto = ?"),
+    ("SELECT *\n  FROM clientes\n WHERE email = 'ana@x.com' AND id_cliente > 42",
+     "SELECT * FROM clientes WHERE email = ? AND id_cliente > ?"),
+    ("SELECT 'it\\'s', 1.5", "SELECT ?, ?"),
+    ("SELECT id_producto FROM productos", "SELECT id_producto FROM productos"),  # Números dentro de nombres
+    ("SELECT * FROM t WHERE id IN (%s, %s, %s)", "SELECT * FROM t WHERE id IN (?+)"),
+    ("SELECT * FROM t WHERE id IN (1,2,3,4,5)", "SELECT * FROM t WHERE id IN (?+)"),
+    ("INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s), (%s, %s)", "INSERT INTO t (a, b) VALUES (?+), ..."),
+    ("UPDATE t SET a = CASE id WHEN 1 THEN 2 WHEN 3 THEN 4 WHEN 5 THEN 6 END",
+     "UPDATE t SET a = CASE id WHEN ? THEN ? ... END"),
+    (b"SELECT %s", "SELECT ?"),
+])
+def test_normalizar_sql(sql, esperado):
+    assert normalizar_sql(sql) == esperado
+
+
+def test_listas_de_distinto_largo_se_agrupan():
+    assert normalizar_sql("SELECT * FROM t WHERE id IN (%s, %s)") == normalizar_sql(
+        "SELECT * FROM t WHERE id IN (%s, %s, %s, %s, %s)")
+
+
+def _registro():
+    registro = Registro()
+    registro.definir('requests', 'counter', 'Requests.', ('endpoint',))
+    registro.definir('duracion', 'histogram', 'Duración.', ('endpoint',), (0.1, 1.0))
+    return registro
+
+
+def test_sumar_volcados_de_dos_workers():
+    uno, dos = _registro(), _registro()
+    uno.incrementar('requests', ('productos',), 3)
+    dos.incrementar('requests', ('productos',), 2)
+    dos.incrementar('requests', ('clientes',))
+    uno.observar('duracion', ('productos',), 0.05)
+    dos.observar('duracion', ('productos',), 0.5)
+    dos.observar('duracion', ('productos',), 5)
+    # Como lo leería /metrics: cada volcado pasó por JSON
+    exportados = [json.loads(json.dumps(r.exportar())) for r in (uno, dos)]
+    exportados.append({'metrica_de_otra_version': [[['x'], 1]]})
+    total = uno.sumar(exportados)
+    assert total['requests'] == {('productos',): 5, ('clientes',): 1}
+    assert total['duracion'] == {('productos',): [[1, 1], 5.55, 3]}
+    assert 'metrica_de_otra_version' not in total
+    assert uno.sumar([uno.serializar(total)]) == total  # serializar() vuelve al formato de exportar()
+
+
+def test_texto_prometheus_acumula_los_buckets():
+    registro = _registro()
+    registro.observar('duracion', ('productos',), 0.05)
+    registro.observar('duracion', ('productos',), 0.5)
+    texto = registro.texto_prometheus(registro.sumar([registro.exportar()]))
+    assert 'duracion_bucket{endpoint="productos",le="1.0"} 2' in texto
+    assert 'duracion_bucket{endpoint="productos",le="+Inf"} 2' in texto
+
+
+@pytest.fixture
+def metricas(tmp_path):
+    app = Flask(__name__)
+    app.config.update(METRICAS_ACTIVAS=False, METRICAS_DIR=str(tmp_path))
+    return Metricas(app)
+
+
+def _volcado(metricas, pid, cantidad):
+    otro = _registro()
+    otro.definir('app_http_requests_total', 'counter', '', ('endpoint', 'status'))
+    otro.incrementar('app_http_requests_total', ('productos', '200'), cantidad)
+    with open(metricas._ruta_volcado(pid), 'w', encoding='utf-8') as archivo:
+        json.dump(otro.exportar(), archivo)
+
+
+def test_texto_suma_los_volcados_de_los_demas_workers(metricas, monkeypatch):
+    monkeypatch.setattr('metricas._proceso_vivo', lambda pid: True)
+    metricas.registro.incrementar('app_http_requests_total', ('productos', '200'), 2)
+    _volcado(metricas, 999991, 3)
+    _volcado(metricas, 999992, 4)
+    assert 'app_http_requests_total{endpoint="productos",status="200"} 9' in metricas.texto()
+
+
+def test_volcado_de_un_worker_terminado_se_archiva_una_vez(metricas, monkeypatch):
+    monkeypatch.setattr('metricas._proceso_vivo', lambda pid: pid != 999991)
+    _volcado(metricas, 999991, 3)
+    _volcado(metricas, 999992, 4)
+    for _ in range(2):  # El segundo /metrics no lo vuelve a sumar
+        assert 'app_http_requests_total{endpoint="productos",status="200"} 7' in metricas.texto()
+    directorio = metricas.app.config['METRICAS_DIR']
+    assert not os.path.exists(metricas._ruta_volcado(999991))
+    assert os.path.exists(os.path.join(directorio, VOLCADO_TERMINADOS))
@@ -0,0 +1,62 @@
+import base64
+import datetime
+import json
+
+import pytest
+
+from paginacion import POR_PAGINA_MAXIMO, codificar_cursor, decodificar_cursor, leer_por_pagina
+
+
+@pytest.mark.parametrize('valores', [
+    [42],
+    ['2024-05-01 10:30:00', 7],
+    ['ñandú; "comillas"', 3],
+    [None, 1],
+])
+def test_cursor_ida_y_vuelta(valores):
+    assert decodificar_cursor(codificar_cursor(valores), len(valores)) == valores
+
+
+def test_cursor_con_fecha():
+    fecha = datetime.datetime(2024, 5, 1, 10, 30, 0)
+    assert decodificar_cursor(codificar_cursor([fecha, 9]), 2) == ['2024-05-01 10:30:00', 9]
+
+
+def test_cursor_sin_relleno_y_apto_para_url():
+    texto = codificar_cursor(['a' * 10, 1])
+    assert '=' not in texto and '+' not in texto and '/' not in texto
+
+
+@pytest.mark.parametrize('texto', [None, '', '!!!', 'no es base64', base64.urlsafe_b64encode(b'{"a":1}').decode()])
+def test_cursor_invalido(texto):
+    assert decodificar_cursor(texto, 1) is None
+
+
+def test_cursor_con_otra_cantidad_de_claves():
+    assert decodificar_cursor(codificar_cursor([1, 2]), 1) is None
+
+
+@pytest.mark.parametrize('valores', [[[1], 2], [{'a': 1}, 2], [1, [2, 3]]])
+def test_cursor_con_valores_no_escalares(valores):
+    texto = base64.urlsafe_b64encode(json.dumps(valores).encode()).decode()
+    assert decodificar_cursor(texto, 2) is None
+
+
+def test_cursor_con_utf8_invalido():
+    assert decodificar_cursor(base64.urlsafe_b64encode(b'\xff\xfe').decode(), 1) is None
+
+
+@pytest.mark.parametrize('args, esperado', [
+    ({}, 20),
+    ({'por_pagina': '50'}, 50),
+    ({'por_pagina': 'abc'}, 20),
+    ({'por_pagina': '0'}, 1),
+    ({'por_pagina': '-5'}, 1),
+    ({'por_pagina': '100000'}, POR_PAGINA_MAXIMO),
+])
+def test_leer_por_pagina(args, esperado):
+    assert leer_por_pagina(args, 20) == esperado
+
+
+def test_leer_por_pagina_con_maximo():
+    assert leer_por_pagina({'por_pagina': '900'}, 20, maximo=100) == 100
@@ -0,0 +1,43 @@
+import pytest
+from flask import Flask, flash, redirect
+from jinja2 import DictLoader
+
+from plantillas import Plantillas
+
+
+@pytest.fixture
+def cliente(tmp_path):
+    app = Flask(__name__)
+    app.secret_key = 'pruebas'
+    app.config.update(PLANTILLAS_CACHE_DIR=str(tmp_path), PLANTILLAS_PRECOMPILAR=False, PLANTILLAS_BLOQUE=1)
+    app.jinja_loader = DictLoader({
+        'lista.html': "<h1>Lista</h1>{{ vaciar() }}"
+                      "{% for categoria, mensaje in mensajes_flash %}[{{ categoria }}:{{ mensaje }}]{% endfor %}",
+    })
+    plantillas = Plantillas(app)
+
+    @app.route('/crear')
+    def crear():
+        flash('Producto creado', 'success')
+        return redirect('/lista')
+
+    @app.route('/lista')
+    def lista():
+        return plantillas.transmitir('lista.html')
+
+    return app.test_client()
+
+
+def test_flash_en_pagina_transmitida_se_muestra_una_vez(cliente):
+    cliente.get('/crear')
+    primera = cliente.get('/lista')
+    assert primera.is_streamed
+    assert '[success:Producto creado]' in primera.get_data(as_text=True)
+    assert 'Producto creado' not in cliente.get('/lista').get_data(as_text=True)
+    with cliente.session_transaction() as sesion:
+        assert '_flashes' not in sesion
+
+
+def test_bloques_y_vaciar():
+    partes = ['a', 'b', '<!--vaciar-->', 'ccc', 'd']
+    assert list(Plantillas._en_bloques(partes, 3)) == ['ab', 'ccc', 'd']
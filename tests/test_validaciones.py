@@ -0,0 +1,107 @@
+import pytest
+
+from validaciones import (validar_ajuste, validar_cliente, validar_filtro_productos, validar_ids,
+                          validar_producto)
+
+
+# --- Productos y clientes ---
+
+def test_producto_valido():
+    assert validar_producto('  Café ', '12.50', '3') == (('Café', 12.5, 3), None)
+
+
+@pytest.mark.parametrize('nombre, precio, stock', [
+    ('', '1', '1'), (None, '1', '1'), ('A', '', '1'), ('A', None, '1'), ('A', '1', ''),
+])
+def test_producto_campos_obligatorios(nombre, precio, stock):
+    assert validar_producto(nombre, precio, stock) == (None, 'Todos los campos son obligatorios.')
+
+
+@pytest.mark.parametrize('precio, stock', [
+    ('abc', '1'), ('1', '1.5'), ('1', 'x'), ('nan', '1'), ('inf', '1'), ('-Infinity', '1'), ('NaN', '1'),
+])
+def test_producto_numeros_invalidos(precio, stock):
+    datos, error = validar_producto('A', precio, stock)
+    assert datos is None and error
+
+
+@pytest.mark.parametrize('precio, stock', [('0', '1'), ('-1', '1'), ('1', '-1')])
+def test_producto_fuera_de_rango(precio, stock):
+    datos, error = validar_producto('A', precio, stock)
+    assert datos is None and 'positivo' in error
+
+
+def test_producto_stock_cero():
+    assert validar_producto('A', 1, 0) == (('A', 1.0, 0), None)
+
+
+def test_producto_stock_de_json():
+    assert validar_producto('A', 1.5, 5.0) == (('A', 1.5, 5), None)
+    for stock in (5.7, float('inf'), float('nan')):
+        datos, error = validar_producto('A', 1.5, stock)
+        assert datos is None and 'entero' in error
+
+
+def test_cliente_valido():
+    assert validar_cliente(' Ana ', ' ana@x.com ', ' 123 ') == (('Ana', 'ana@x.com', '123'), None)
+
+
+@pytest.mark.parametrize('datos', [('', 'a@x.com', '1'), ('Ana', '', '1'), ('Ana', 'a@x.com', None)])
+def test_cliente_campos_obligatorios(datos):
+    assert validar_cliente(*datos)[0] is None
+
+
+# --- Operaciones masivas ---
+
+def test_ids_ordenados_y_sin_repetir():
+    assert validar_ids(['3', '1', '3', 2], 10) == ([1, 2, 3], None)
+
+
+@pytest.mark.parametrize('valores', [[], None, ['a'], ['0'], ['-1', '2'], ['1.5']])
+def test_ids_invalidos(valores):
+    assert validar_ids(valores, 10)[0] is None
+
+
+def test_ids_por_encima_del_maximo():
+    ids, error = validar_ids([str(i) for i in range(1, 12)], 10)
+    assert ids is None and '10' in error
+
+
+@pytest.mark.parametrize('campo, modo, valor, esperado', [
+    ('precio', 'porcentaje', '10', ('precio', 'porcentaje', 10.0)),
+    ('precio', 'delta', '-2.5', ('precio', 'delta', -2.5)),
+    ('stock', 'delta', '5', ('stock', 'delta', 5)),
+    ('stock', 'porcentaje', '-50', ('stock', 'porcentaje', -50.0)),
+])
+def test_ajuste_valido(campo, modo, valor, esperado):
+    assert validar_ajuste(campo, modo, valor) == (esperado, None)
+
+
+@pytest.mark.parametrize('campo, modo, valor', [
+    ('nombre', 'delta', '1'), ('precio', 'multiplicar', '1'),
+    ('precio', 'delta', 'x'), ('stock', 'delta', '1.5'), ('precio', 'delta', '0'),
+    ('precio', 'porcentaje', '-100'), ('precio', 'porcentaje', '-150'),
+    ('precio', 'delta', 'nan'), ('precio', 'porcentaje', 'inf'), ('stock', 'porcentaje', '-inf'),
+])
+def test_ajuste_invalido(campo, modo, valor):
+    datos, error = validar_ajuste(campo, modo, valor)
+    assert datos is None and error
+
+
+def test_filtro_productos():
+    filtros, error = validar_filtro_productos({'nombre': ' 50%_off\\ ', 'precio_min': '1.5', 'stock_max': '10',
+                                               'precio_max': ''})
+    assert error is None
+    assert filtros == [('nombre', 'LIKE', '50\\%\\_off\\\\%'), ('precio', '>=', 1.5), ('stock', '<=', 10)]
+
+
+def test_filtro_vacio():
+    assert validar_filtro_productos({}) == ([], None)
+
+
+@pytest.mark.parametrize('campo, valor', [
+    ('precio_min', 'x'), ('stock_min', '1.5'), ('precio_max', 'nan'), ('precio_min', 'inf'),
+])
+def test_filtro_invalido(campo, valor):
+    filtros, error = validar_filtro_productos({campo: valor})
+    assert filtros is None and campo in error
@@ -0,0 +1,102 @@
+"""
+Reglas de validación de productos y clientes.
+
+Las usan los formularios (crear/editar) y la importación masiva, para que un
+registro que entra por archivo cumpla exactamente las mismas reglas que uno
+que entra por el formulario. Cada función devuelve (datos, None) si el registro
+es válido o (None, mensaje) con el mismo texto que se muestra en el formulario.
+
+float() acepta 'nan', 'inf' e 'infinity': los números se comprueban con
+math.isfinite, porque nan pasa cualquier comparación (nan <= 0 es False) y
+MySQL no los puede guardar en una columna DECIMAL.
+"""
+import math
+
+
+def validar_producto(nombre, precio, stock):
+    if not nombre or precio in (None, '') or stock in (None, ''):
+        return None, 'Todos los campos son obligatorios.'
+    try:
+        precio_float = float(precio)
+        stock_int = int(stock)
+    except (TypeError, ValueError, OverflowError):  # OverflowError: int(float('inf'))
+        return None, 'El precio debe ser un número decimal y el stock un entero.'
+    # int() trunca los números de JSON/NDJSON (5.7 -> 5): solo se aceptan enteros exactos
+    if not math.isfinite(precio_float) or (isinstance(stock, float) and not stock.is_integer()):
+        return None, 'El precio debe ser un número decimal y el stock un entero.'
+    if precio_float <= 0 or stock_int < 0:
+        return None, 'El precio debe ser positivo y el stock no puede ser negativo.'
+    return (str(nombre).strip(), precio_float, stock_int), None
+
+
+def validar_cliente(nombre, email, telefono):
+    if not nombre or not email or not telefono:
+        return None, 'Todos los campos del cliente son obligatorios.'
+    return (str(nombre).strip(), str(email).strip(), str(telefono).strip()), None
+
+
+# --- Operaciones masivas ---
+
+def validar_ids(valores, maximo):
+    """Lista de ids enteros positivos, sin repetir y como mucho 'maximo'."""
+    if not valores:
+        return None, 'Selecciona al menos un registro.'
+    try:
+        ids = sorted({int(valor) for valor in valores})
+    except (TypeError, ValueError):
+        return None, 'Los ids deben ser números enteros.'
+    if ids[0] <= 0:
+        return None, 'Los ids deben ser números enteros positivos.'
+    if len(ids) > maximo:
+        return None, f'Se pueden procesar como mucho {maximo} registros por vez.'
+    return ids, None
+
+
+def validar_ajuste(campo, modo, valor):
+    """Ajuste masivo de productos: campo 'precio' o 'stock', modo 'porcentaje' o 'delta'."""
+    if campo not in ('precio', 'stock') or modo not in ('porcentaje', 'delta'):
+        return None, 'Elige si se ajusta el precio o el stock, y si es por porcentaje o por cantidad.'
+    try:
+        numero = float(valor) if campo == 'precio' or modo == 'porcentaje' else int(valor)
+    except (TypeError, ValueError):
+        return None, 'El valor del ajuste debe ser un número.'
+    if not math.isfinite(numero):
+        return None, 'El valor del ajuste debe ser un número.'
+    if numero == 0:
+        return None, 'El valor del ajuste no puede ser cero.'
+    if modo == 'porcentaje' and numero <= -100:
+        return None, 'Un porcentaje de -100 o menos dejaría el valor en cero o negativo.'
+    return (campo, modo, numero), None
+
+
+# Campos del filtro de ajuste -> (columna, operador, conversión)
+FILTROS_PRODUCTOS = {
+    'nombre': ('nombre', 'LIKE', str),
+    'precio_min': ('precio', '>=', float),
+    'precio_max': ('precio', '<=', float),
+    'stock_min': ('stock', '>=', int),
+    'stock_max': ('stock', '<=', int),
+}
+
+
+def validar_filtro_productos(datos):
+    """
+    Filtro de un ajuste masivo a partir de los campos de FILTROS_PRODUCTOS que
+    vengan con valor: lista de (columna, operador, valor). 'nombre' es un prefijo.
+    """
+    filtros = []
+    for campo, (columna, operador, convertir) in FILTROS_PRODUCTOS.items():
+        valor = datos.get(campo)
+        if valor in (None, ''):
+            continue
+        try:
+            valor = convertir(valor)
+        except (TypeError, ValueError):
+            return None, f'El filtro "{campo}" no es válido.'
+        if isinstance(valor, float) and not math.isfinite(valor):
+            return None, f'El filtro "{campo}" no es válido.'
+        if operador == 'LIKE':
+            # Prefijo literal: se escapan los comodines de LIKE que traiga el texto
+            valor = valor.strip().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        filtros.append((columna, operador, valor))
+    return filtros, None